@@ -12,8 +12,12 @@ from pathlib import Path
 # 내부 모듈
 from video_streams import gen_warped_frames, gen_original_frames, gen_edges_frames
 from piece_auto_update import update_chess_pieces
-# find_green_corners 시그니처가 버전에 따라 다를 수 있으므로 HSV 범위도 함께 import
-from warp_cam_picam2_v2 import find_green_corners, warp_chessboard, Hmin, Hmax, Smin, Smax, Vmin, Vmax
+from board_stats import bgr_grid_to_lab, cell_diff_norms, cell_means
+from file_capture import capture_from_env
+from stream_hub import MULTIPART_MIMETYPE, StreamHub
+from jpeg_encoder import get_encoder
+from marker_detection import find_green_corners
+from warp_cam_picam2_v2 import warp_chessboard, Hmin, Hmax, Smin, Smax, Vmin, Vmax
 
 # ==== 경로(절대) ====
 BASE_DIR = Path(__file__).resolve().parent
@@ -25,11 +29,12 @@ PKLPATH = str(BASE_DIR / "chess_pieces.pkl")
 # =======================
 USE_PICAM2 = True  # CSI 카메라인 경우 True
 
+# CHESS_REPLAY=<영상|이미지 폴더|npz> 이면 카메라 대신 녹화 프레임을 재생
 if USE_PICAM2:
     from piece_recognition import PiCam2Capture
-    cap = PiCam2Capture()
+    cap = capture_from_env(PiCam2Capture)
 else:
-    cap = cv2.VideoCapture(0, cv2.CAP_V4L2)
+    cap = capture_from_env(lambda: cv2.VideoCapture(0, cv2.CAP_V4L2))
 
 latest_frame = None
 
@@ -99,37 +104,19 @@ def _is_color_piece(code, color):  # code: 'WP','BP',..., color: 'white'/'black'
 # =======================
 # 노이즈 억제 도우미 (LAB + 다중 프레임 평균)
 # =======================
-def _mean_lab_board_from_warp(warp):
+def _mean_lab_board_from_warp(warp, out=None):
     """와핑된 400x400 보드에서 8x8 칸 평균을 LAB 공간(mean)으로 반환 (float32, shape=(8,8,3))"""
-    h, w = warp.shape[:2]
-    cell_h = h // 8
-    cell_w = w // 8
     lab = cv2.cvtColor(warp, cv2.COLOR_BGR2LAB)
-    out = np.zeros((8, 8, 3), np.float32)
-    for i in range(8):
-        for j in range(8):
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            x1, x2 = j * cell_w, (j + 1) * cell_w
-            cell = lab[y1:y2, x1:x2]
-            out[i, j] = cell.reshape(-1, 3).mean(axis=0)
-    return out
+    return cell_means(lab, out=out)
 
 def _safe_find_corners(frame):
     """
-    find_green_corners 시그니처 차이를 흡수하고,
+    warp_cam_picam2_v2 의 HSV 범위로 마커를 찾고,
     반환된 4점을 TL, TR, BR, BL 순서로 강제 정렬해서 돌려준다.
     """
-    import numpy as np
-
-    corners = None
-    try:
-        lower = np.array([Hmin, Smin, Vmin], dtype=np.uint8)
-        upper = np.array([Hmax, Smax, Vmax], dtype=np.uint8)
-        # 일부 버전은 (frame, lower, upper, min_area=...) 시그니처
-        corners = find_green_corners(frame, lower, upper, min_area=60)
-    except TypeError:
-        # 다른 버전은 (frame)만 받는 시그니처
-        corners = find_green_corners(frame)
+    lower = np.array([Hmin, Smin, Vmin], dtype=np.uint8)
+    upper = np.array([Hmax, Smax, Vmax], dtype=np.uint8)
+    corners = find_green_corners(frame, lower, upper, min_area=60)
 
     if corners is not None and len(corners) == 4:
         try:
@@ -143,6 +130,7 @@ def _safe_find_corners(frame):
 def _capture_avg_lab_board(cap, n_frames=8, sleep_sec=0.02):
     """짧은 시간 n_frames 프레임을 평균해서 LAB 보드값을 안정적으로 산출"""
     acc = np.zeros((8, 8, 3), np.float32)
+    means = np.empty((8, 8, 3), np.float32)
     cnt = 0
     last_warp = None
 
@@ -159,7 +147,7 @@ def _capture_avg_lab_board(cap, n_frames=8, sleep_sec=0.02):
             warp = cv2.resize(frame, (400, 400))
 
         last_warp = warp
-        acc += _mean_lab_board_from_warp(warp)
+        acc += _mean_lab_board_from_warp(warp, out=means)
         cnt += 1
         time.sleep(sleep_sec)
 
@@ -228,24 +216,41 @@ def gen_original_frames_with_hsv():
                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
 # ---------- 스트림 라우트 ----------
+# 스트림마다 프로듀서 하나가 렌더링/인코딩하고 접속한 클라이언트 모두에게 나눠준다
+def _gen_diff_frames():
+    from piece_recognition import gen_edges_frames as gen_diff_frames
+    # 차이 시각화: threshold 완화(40 → 15) + 절대경로 사용
+    return gen_diff_frames(cap, base_board_path=NPPATH, threshold=15, top_k=2)
+
+stream_hub = StreamHub()
+stream_hub.register('warp', lambda: gen_warped_frames(cap))
+stream_hub.register('original', gen_original_frames_with_hsv)
+stream_hub.register('edges', lambda: gen_edges_frames(cap))
+stream_hub.register('piece', _gen_diff_frames)
+
 @app.route('/warp')
 def warp_feed():
-    return Response(gen_warped_frames(cap), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(stream_hub.stream('warp'), mimetype=MULTIPART_MIMETYPE)
 
 @app.route('/original')
 def original_feed():
-    return Response(gen_original_frames_with_hsv(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(stream_hub.stream('original'), mimetype=MULTIPART_MIMETYPE)
 
 @app.route('/edges')
 def edges_feed():
-    return Response(gen_edges_frames(cap), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(stream_hub.stream('edges'), mimetype=MULTIPART_MIMETYPE)
 
-# 차이 시각화: threshold 완화(40 → 15) + 절대경로 사용
 @app.route('/piece')
 def piece_feed():
-    from piece_recognition import gen_edges_frames as gen_diff_frames
-    return Response(gen_diff_frames(cap, base_board_path=NPPATH, threshold=15,top_k=2),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(stream_hub.stream('piece'), mimetype=MULTIPART_MIMETYPE)
+
+@app.route('/stream_stats')
+def stream_stats():
+    return stream_hub.stats()
+
+@app.route('/encode_stats')
+def encode_stats():
+    return get_encoder().stats()
 
 # ---------- 상태 라우트 ----------
 @app.route('/turn_status')
@@ -294,17 +299,8 @@ def base_board_img():
         else:
             warp = cv2.resize(frame, (400, 400))
 
-        diff_vals = np.zeros((8, 8), dtype=np.float32)
-        diff_list = []
-        for i in range(8):
-            for j in range(8):
-                y1, y2 = i * cell_h, (i + 1) * cell_h
-                x1, x2 = j * cell_w, (j + 1) * cell_w
-                cell = warp[y1:y2, x1:x2]
-                mean_bgr = np.mean(cell.reshape(-1, 3), axis=0)
-                diff = np.linalg.norm(mean_bgr - init_board_values[i, j])
-                diff_vals[i, j] = diff
-                diff_list.append((diff, i, j))
+        diff_vals = cell_diff_norms(cell_means(warp), init_board_values)
+        diff_list = [(float(diff_vals[i, j]), i, j) for i in range(8) for j in range(8)]
 
         # 숫자(굵게)
         for i in range(8):
@@ -330,8 +326,7 @@ def base_board_img():
             if shown == 2:
                 break
 
-    _, buffer = cv2.imencode('.jpg', base_img)
-    return Response(buffer.tobytes(), mimetype='image/jpeg')
+    return Response(get_encoder().encode(base_img, quality=95), mimetype='image/jpeg')
 
 # ---------- 기준값 저장 ----------
 @app.route('/set_init_board', methods=['POST'])
@@ -347,16 +342,7 @@ def set_init_board():
 
     warp = warp_chessboard(frame, corners, size=400) if corners is not None else cv2.resize(frame, (400, 400))
 
-    h, w = warp.shape[:2]
-    cell_h = h // 8
-    cell_w = w // 8
-    board_vals = np.zeros((8, 8, 3), dtype=np.float32)
-    for i in range(8):
-        for j in range(8):
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            x1, x2 = j * cell_w, (j + 1) * cell_w
-            cell = warp[y1:y2, x1:x2]
-            board_vals[i, j] = np.mean(cell.reshape(-1, 3), axis=0)
+    board_vals = cell_means(warp)
 
     np.save(NPPATH, board_vals)
     init_board_values = board_vals
@@ -395,13 +381,8 @@ def next_turn():
     prev_warp = warp.copy()
 
     # prev_board_values(BGR평균) -> LAB로 변환
-    prev_lab = np.zeros((8, 8, 3), np.float32)
     if prev_board_values is not None:
-        for i in range(8):
-            for j in range(8):
-                bgr = np.array(prev_board_values[i, j], dtype=np.uint8)[None, None, :]
-                lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB).astype(np.float32)
-                prev_lab[i, j] = lab[0, 0]
+        prev_lab = bgr_grid_to_lab(prev_board_values)
     else:
         prev_lab = curr_lab.copy()
 
@@ -471,16 +452,7 @@ def next_turn():
         print(f"[DEBUG] adaptive pick src={src} dst={dst} thr={adaptive_thr:.2f}")
 
     # --- board_vals(BGR) 생성: 다음 턴 기준 저장용 ---
-    h, w = warp.shape[:2]
-    cell_h = h // 8
-    cell_w = w // 8
-    board_vals = np.zeros((8, 8, 3), np.float32)
-    for i in range(8):
-        for j in range(8):
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            x1, x2 = j * cell_w, (j + 1) * cell_w
-            cell = warp[y1:y2, x1:x2]
-            board_vals[i, j] = cell.reshape(-1, 3).mean(axis=0)
+    board_vals = cell_means(warp)
 
     # ---- 이동 반영 ----
     try:
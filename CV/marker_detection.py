@@ -0,0 +1,363 @@
+"""초록 마커(보드 네 모서리) 검출.
+
+- find_green_corners(frame, lower, upper, min_area): 전체 프레임 검출기. 저장소의 초록 마커
+  검출 구현은 이것 하나이고, picam_stable / piece_detector / CV 스크립트가 모두 이걸 부른다.
+- find_green_corners_coarse(...): 같은 시그니처. 1/4 축소 프레임에서 마커를 찾고
+  원본 해상도의 작은 패치에서 모멘트로 중심을 다시 구한다(서브픽셀).
+- MarkerTracker: CornerStabilizer 가 잠기면 직전 마커 위치 주변 작은 창에서만
+  HSV 변환/윤곽선 탐색을 하고, N 프레임 연속 실패하면 전체 프레임 검색으로 돌아간다.
+  전체 프레임 검색의 기본값은 find_green_corners_coarse 다.
+- compare_detectors(frames): 녹화 프레임에서 두 검출기의 정확도/속도 비교
+  (python -m cv.marker_detection <이미지 폴더|영상 파일>)
+
+brain/cv 와 CV/ 에 같은 내용의 사본이 있다.
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# picam_stable 과 같은 기본 HSV 범위
+DEFAULT_LOWER = np.array([35, 60, 60], dtype=np.uint8)
+DEFAULT_UPPER = np.array([85, 255, 255], dtype=np.uint8)
+
+MIN_AREA = 60
+DEDUP_PX = 8            # 이보다 가까운 중심은 같은 마커로 본다
+MAX_CONTOURS = 10
+COARSE_SCALE = 0.25    # 축소 검출 배율 (픽셀 수 1/16)
+REFINE_MIN_RADIUS = 8  # 원본 해상도 정밀화 패치 최소 반경(px)
+ROI_RADIUS = 40         # 추적 창 반경(px). 한 프레임 사이 마커 이동 허용량
+MAX_MISSES = 5          # 연속 실패 허용 횟수. 넘으면 전체 프레임 검색
+
+_MORPH_KERNEL = np.ones((3, 3), np.uint8)
+
+Candidate = Tuple[float, float, float]  # (cx, cy, area)
+
+
+# ---------------------------------------------------------------------------
+# 공통 도우미
+# ---------------------------------------------------------------------------
+def sort_corners_by_position(pts) -> np.ndarray:
+    """TL, TR, BR, BL 순서로 정렬 (picam_stable 과 동일 규칙)."""
+    pts = sorted(np.asarray(pts, dtype=np.float32).tolist(), key=lambda p: (p[1], p[0]))
+    top = sorted(pts[:2], key=lambda p: p[0])
+    bot = sorted(pts[2:], key=lambda p: p[0])
+    return np.array([top[0], top[1], bot[1], bot[0]], dtype=np.float32)
+
+
+def hsv_marker_mask(frame: np.ndarray, lower, upper) -> np.ndarray:
+    """BGR → HSV → inRange 마커 마스크."""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    return cv2.inRange(hsv, lower, upper)
+
+
+def _clean_mask(mask: np.ndarray) -> np.ndarray:
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, _MORPH_KERNEL)
+    return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, _MORPH_KERNEL)
+
+
+def centers_from_mask(mask: np.ndarray, min_area: float,
+                      offset: Tuple[int, int] = (0, 0),
+                      max_contours: int = MAX_CONTOURS) -> List[Candidate]:
+    """마스크의 외곽 윤곽선 중심(모멘트). offset 은 ROI 의 원본 좌표 원점."""
+    cnts, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    cnts = sorted(cnts, key=cv2.contourArea, reverse=True)[:max_contours]
+    out: List[Candidate] = []
+    ox, oy = offset
+    for c in cnts:
+        area = cv2.contourArea(c)
+        if area < min_area:
+            continue
+        M = cv2.moments(c)
+        if M["m00"] == 0:
+            continue
+        out.append((M["m10"] / M["m00"] + ox, M["m01"] / M["m00"] + oy, float(area)))
+    return out
+
+
+def select_four(cands: List[Candidate], dedup_px: float = DEDUP_PX) -> Optional[np.ndarray]:
+    """가까운 중복을 합치고 면적이 큰 4개를 골라 TL,TR,BR,BL 로 정렬."""
+    dedup: List[Candidate] = []
+    for c in sorted(cands, key=lambda t: -t[2]):
+        if all(np.hypot(c[0] - d[0], c[1] - d[1]) > dedup_px for d in dedup):
+            dedup.append(c)
+    if len(dedup) < 4:
+        return None
+    return sort_corners_by_position([(x, y) for x, y, _ in dedup[:4]])
+
+
+# ---------------------------------------------------------------------------
+# 전체 프레임 검출기
+# ---------------------------------------------------------------------------
+def find_green_corners(frame: np.ndarray, lower=DEFAULT_LOWER, upper=DEFAULT_UPPER,
+                       min_area: float = MIN_AREA) -> Optional[np.ndarray]:
+    """전체 프레임에서 초록 마커 4개를 찾아 (4,2) float32 (TL,TR,BR,BL) 반환. 실패 시 None."""
+    mask = _clean_mask(hsv_marker_mask(frame, lower, upper))
+    return select_four(centers_from_mask(mask, min_area))
+
+
+def _refine_center(frame: np.ndarray, cx: float, cy: float, radius: int,
+                   lower, upper) -> Optional[Tuple[float, float]]:
+    """원본 해상도 패치에서 (cx, cy)에 가장 가까운 마커 덩어리의 모멘트 중심."""
+    h, w = frame.shape[:2]
+    x0, y0 = max(0, int(cx) - radius), max(0, int(cy) - radius)
+    x1, y1 = min(w, int(cx) + radius + 1), min(h, int(cy) + radius + 1)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    patch = frame[y0:y1, x0:x1]
+    mask = hsv_marker_mask(patch, lower, upper)
+    cands = centers_from_mask(_clean_mask(mask), 1.0, offset=(x0, y0), max_contours=3)
+    if not cands:
+        return None
+    best = min(cands, key=lambda c: (c[0] - cx) ** 2 + (c[1] - cy) ** 2)
+    return best[0], best[1]
+
+
+def find_green_corners_coarse(frame: np.ndarray, lower=DEFAULT_LOWER, upper=DEFAULT_UPPER,
+                              min_area: float = MIN_AREA,
+                              scale: float = COARSE_SCALE) -> Optional[np.ndarray]:
+    """find_green_corners 와 같은 시그니처의 coarse-to-fine 검출기.
+
+    1) scale 배 축소 프레임에서 마스크/윤곽선으로 후보 4개 선택.
+       축소는 INTER_NEAREST(단순 솎아내기)로 한다. INTER_AREA 는 1280x720 에서
+       HSV 변환보다 비싸서 이득이 없어지고, 중심 정확도는 2) 에서 되찾는다.
+    2) 각 후보 주변 원본 해상도 패치에서 마커 중심을 모멘트로 다시 계산
+    정밀화에 실패한 점은 축소 좌표를 그대로 원본 배율로 돌려 쓴다.
+    """
+    h, w = frame.shape[:2]
+    small = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                       interpolation=cv2.INTER_NEAREST)
+    mask = hsv_marker_mask(small, lower, upper)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, _MORPH_KERNEL)
+    cands = centers_from_mask(mask, max(1.0, min_area * scale * scale))
+    coarse = select_four(cands, dedup_px=max(2.0, DEDUP_PX * scale))
+    if coarse is None:
+        return None
+
+    area_by_pt = {(round(c[0], 3), round(c[1], 3)): c[2] for c in cands}
+    refined = []
+    inv = 1.0 / scale
+    for x, y in coarse:
+        area = area_by_pt.get((round(float(x), 3), round(float(y), 3)), 4.0)
+        radius = max(REFINE_MIN_RADIUS, int(2.0 * np.sqrt(area) * inv))
+        fx, fy = x * inv, y * inv
+        pt = _refine_center(frame, fx, fy, radius, lower, upper)
+        refined.append(pt if pt is not None else (fx, fy))
+    return sort_corners_by_position(refined)
+
+
+# ---------------------------------------------------------------------------
+# ROI 추적
+# ---------------------------------------------------------------------------
+def _default_stabilizer():
+    try:
+        from cv.picam_stable import CornerStabilizer
+    except ImportError:
+        try:
+            from picam_stable import CornerStabilizer  # type: ignore
+        except ImportError:
+            from warp_cam_picam2_v2 import CornerStabilizer  # type: ignore
+    return CornerStabilizer(hist_len=7, ema_alpha=0.35, max_jump=60.0, need_good=3)
+
+
+class MarkerTracker:
+    """안정화 잠금 이후 마커 주변 창만 검색하는 코너 추적기.
+
+    update(frame) 은 CornerStabilizer 를 거친 코너(잠기기 전엔 None)를 반환한다.
+    ROI 검색 실패 프레임에서는 안정화 값을 그대로 유지하고, max_misses 번 연속 실패하면
+    전체 프레임 검색(detector, 기본 find_green_corners_coarse)으로 전환해 다시 잠글 때까지
+    그 방식을 쓴다. 잠기기 전 프레임도 모두 detector 로 찾는다.
+    """
+
+    def __init__(self,
+                 lower=DEFAULT_LOWER,
+                 upper=DEFAULT_UPPER,
+                 min_area: float = MIN_AREA,
+                 roi_radius: int = ROI_RADIUS,
+                 max_misses: int = MAX_MISSES,
+                 stabilizer=None,
+                 detector: Optional[Callable[..., Optional[np.ndarray]]] = None):
+        self.lower = np.asarray(lower, dtype=np.uint8)
+        self.upper = np.asarray(upper, dtype=np.uint8)
+        self.min_area = min_area
+        self.roi_radius = int(roi_radius)
+        self.max_misses = int(max_misses)
+        self.stabilizer = stabilizer if stabilizer is not None else _default_stabilizer()
+        self.detector = detector or find_green_corners_coarse
+        self._last: Optional[np.ndarray] = None
+        self.roi_hits = 0
+        self.roi_misses = 0
+        self.full_searches = 0
+        self.full_hits = 0
+        self.consecutive_misses = 0
+
+    def reset(self) -> None:
+        self._last = None
+        self.consecutive_misses = 0
+
+    def _search_roi(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        h, w = frame.shape[:2]
+        r = self.roi_radius
+        found = []
+        for x, y in self._last:
+            x0, y0 = max(0, int(x) - r), max(0, int(y) - r)
+            x1, y1 = min(w, int(x) + r + 1), min(h, int(y) + r + 1)
+            if x1 <= x0 or y1 <= y0:
+                return None
+            mask = _clean_mask(hsv_marker_mask(frame[y0:y1, x0:x1], self.lower, self.upper))
+            cands = centers_from_mask(mask, self.min_area, offset=(x0, y0), max_contours=3)
+            if not cands:
+                return None
+            # 창 안에 여러 개면 직전 위치에 가장 가까운 것
+            best = min(cands, key=lambda c: (c[0] - x) ** 2 + (c[1] - y) ** 2)
+            found.append((best[0], best[1]))
+        return sort_corners_by_position(found)
+
+    def _locked(self) -> bool:
+        return self._last is not None and self.stabilizer.get() is not None
+
+    def update(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        if self._locked() and self.consecutive_misses < self.max_misses:
+            raw = self._search_roi(frame)
+            if raw is None:
+                self.roi_misses += 1
+                self.consecutive_misses += 1
+                return self.stabilizer.get()
+            self.roi_hits += 1
+            self.consecutive_misses = 0
+        else:
+            self.full_searches += 1
+            raw = self.detector(frame, self.lower, self.upper, min_area=self.min_area)
+            if raw is not None and np.asarray(raw).shape == (4, 2):
+                self.full_hits += 1
+                self.consecutive_misses = 0
+            else:
+                raw = None
+        if raw is not None:
+            self._last = np.asarray(raw, dtype=np.float32)
+        return self.stabilizer.update(raw)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "roi_hits": self.roi_hits,
+            "roi_misses": self.roi_misses,
+            "full_searches": self.full_searches,
+            "full_hits": self.full_hits,
+            "consecutive_misses": self.consecutive_misses,
+        }
+
+
+# ---------------------------------------------------------------------------
+# 녹화 프레임 정확도 비교
+# ---------------------------------------------------------------------------
+def load_frames(path: str, limit: int = 300) -> List[np.ndarray]:
+    """이미지 폴더(jpg/png) 또는 영상 파일에서 프레임을 읽는다."""
+    frames: List[np.ndarray] = []
+    if os.path.isdir(path):
+        files = sorted(sum((glob.glob(os.path.join(path, p)) for p in ("*.jpg", "*.jpeg", "*.png")), []))
+        for f in files[:limit]:
+            img = cv2.imread(f)
+            if img is not None:
+                frames.append(img)
+        return frames
+    cap = cv2.VideoCapture(path)
+    try:
+        while len(frames) < limit:
+            ok, img = cap.read()
+            if not ok:
+                break
+            frames.append(img)
+    finally:
+        cap.release()
+    return frames
+
+
+def compare_detectors(frames: Iterable[np.ndarray], lower=DEFAULT_LOWER, upper=DEFAULT_UPPER,
+                      min_area: float = MIN_AREA,
+                      candidate: Callable[..., Optional[np.ndarray]] = find_green_corners_coarse,
+                      reference: Callable[..., Optional[np.ndarray]] = find_green_corners,
+                      ) -> Dict[str, float]:
+    """reference(전체 해상도) 대비 candidate 검출기의 정확도/속도를 잰다.
+
+    반환: 프레임 수, 두 검출기 성공 수, 둘 다 성공한 프레임의 코너 오차(px) 평균/최대,
+    프레임당 평균 시간(ms).
+    """
+    n = ref_ok = cand_ok = both = 0
+    errs: List[float] = []
+    t_ref = t_cand = 0.0
+    for frame in frames:
+        n += 1
+        t0 = time.perf_counter()
+        ref = reference(frame, lower, upper, min_area=min_area)
+        t1 = time.perf_counter()
+        cand = candidate(frame, lower, upper, min_area=min_area)
+        t2 = time.perf_counter()
+        t_ref += t1 - t0
+        t_cand += t2 - t1
+        ref_ok += ref is not None
+        cand_ok += cand is not None
+        if ref is not None and cand is not None:
+            both += 1
+            errs.extend(np.linalg.norm(np.asarray(ref) - np.asarray(cand), axis=1).tolist())
+    n_safe = max(n, 1)
+    report = {
+        "frames": n,
+        "reference_found": ref_ok,
+        "candidate_found": cand_ok,
+        "both_found": both,
+        "mean_err_px": float(np.mean(errs)) if errs else float("nan"),
+        "max_err_px": float(np.max(errs)) if errs else float("nan"),
+        "reference_ms": t_ref * 1000.0 / n_safe,
+        "candidate_ms": t_cand * 1000.0 / n_safe,
+    }
+    print(f"[marker_detection] frames={n} found ref={ref_ok} cand={cand_ok} both={both} | "
+          f"corner err mean={report['mean_err_px']:.2f}px max={report['max_err_px']:.2f}px | "
+          f"ref {report['reference_ms']:.2f} ms, cand {report['candidate_ms']:.2f} ms")
+    return report
+
+
+def _synthetic_frames(n: int = 30, size=(1280, 720)) -> List[np.ndarray]:
+    """녹화 파일이 없을 때 쓰는 합성 프레임 (배경 노이즈 + 초록 원형 마커 4개)."""
+    w, h = size
+    rng = np.random.default_rng(0)
+    base = np.array([[0.22 * w, 0.12 * h], [0.80 * w, 0.14 * h], [0.84 * w, 0.9 * h], [0.19 * w, 0.88 * h]])
+    frames = []
+    for _ in range(n):
+        img = rng.integers(60, 140, (h, w, 3), dtype=np.uint8)
+        img = cv2.GaussianBlur(img, (5, 5), 0)
+        for x, y in base + rng.normal(0, 3, base.shape):
+            cv2.circle(img, (int(round(x)), int(round(y))), int(rng.integers(9, 14)), (50, 190, 60), -1, cv2.LINE_AA)
+        frames.append(img)
+    return frames
+
+
+__all__ = [
+    'DEFAULT_LOWER',
+    'DEFAULT_UPPER',
+    'sort_corners_by_position',
+    'hsv_marker_mask',
+    'centers_from_mask',
+    'select_four',
+    'find_green_corners',
+    'find_green_corners_coarse',
+    'MarkerTracker',
+    'load_frames',
+    'compare_detectors',
+]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        _frames = load_frames(sys.argv[1])
+        print(f"[marker_detection] loaded {len(_frames)} frames from {sys.argv[1]}")
+    else:
+        print("[marker_detection] no recording given, using synthetic frames")
+        _frames = _synthetic_frames()
+    compare_detectors(_frames)
@@ -0,0 +1,309 @@
+"""미리 그려 둔 오버레이 레이어와 숫자 스프라이트.
+
+격자선/좌표 라벨/칸 번호/상태 문구는 와프 크기가 같으면 매 프레임 똑같은데, 예전에는
+프레임마다 cv2.line/putText(LINE_AA) 수십 번으로 다시 그렸다 (안티에일리어싱 글자가 특히 느림).
+
+- OverlayLayer: 크기별로 한 번만 그리는 RGBA 레이어. apply() 는 알파 마스크로
+  cv2.copyTo 한 번 (커버리지 ALPHA_CUT 미만인 AA 가장자리 픽셀은 버리므로 직접 그린
+  것보다 글자 가장자리가 조금 더 또렷하다).
+- cached_layer(key, shape, build): (key, 크기) 별 레이어 캐시. grid_layer()/text_layer() 는
+  자주 쓰는 격자/문구용 단축 함수.
+- GlyphCache: diff 숫자처럼 매 프레임 바뀌는 값은 0~255 글자 스프라이트를 미리 만들어
+  두고 붙인다 (그 밖의 값은 처음 쓸 때 만들어 캐시). put_grid() 는 8x8 칸 숫자를
+  스프라이트 픽셀 표에서 모아 인덱스 대입 한 번으로 찍는다.
+
+brain/cv, CV/, mjpg/ 에 같은 내용의 사본이 있다.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+PREBUILT_VALUES = 256   # GlyphCache 가 미리 만드는 정수 스프라이트 수 (0~255)
+ALPHA_CUT = 128         # 이 커버리지 이상인 픽셀만 마스크 복사 (AA 가장자리의 옅은 픽셀은 버림)
+
+
+class OverlayLayer:
+    """(h, w) 크기의 RGBA 레이어. 그리기 함수는 cv2 와 같은 좌표/색 규칙을 쓴다."""
+
+    def __init__(self, height: int, width: int):
+        self.rgba = np.zeros((int(height), int(width), 4), np.uint8)
+        self._frozen = False
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.rgba.shape[:2]
+
+    # ------------------------------------------------------------------
+    def _stamp(self, color, draw: Callable[[np.ndarray], None]) -> "OverlayLayer":
+        """draw(mask) 로 그린 커버리지(0~255)를 color 로 레이어 위에 덮는다 (over 합성)."""
+        m = np.zeros(self.shape, np.uint8)
+        draw(m)
+        a = m.astype(np.float32)[..., None] / 255.0
+        A = self.rgba[..., 3:].astype(np.float32) / 255.0
+        out_a = a + A * (1.0 - a)
+        col = np.asarray(color, np.float32)[:3]
+        rgb = (col * a + self.rgba[..., :3].astype(np.float32) * A * (1.0 - a)) / np.maximum(out_a, 1e-6)
+        self.rgba[..., :3] = np.clip(rgb + 0.5, 0, 255).astype(np.uint8)
+        self.rgba[..., 3] = np.clip(out_a[..., 0] * 255.0 + 0.5, 0, 255).astype(np.uint8)
+        self._frozen = False
+        return self
+
+    def line(self, p1, p2, color, thickness: int = 1, line_type: int = cv2.LINE_AA) -> "OverlayLayer":
+        return self._stamp(color, lambda m: cv2.line(m, tuple(map(int, p1)), tuple(map(int, p2)),
+                                                     255, thickness, line_type))
+
+    def rectangle(self, p1, p2, color, thickness: int = 1, line_type: int = cv2.LINE_8) -> "OverlayLayer":
+        return self._stamp(color, lambda m: cv2.rectangle(m, tuple(map(int, p1)), tuple(map(int, p2)),
+                                                          255, thickness, line_type))
+
+    def text(self, text: str, org, scale: float, color, thickness: int = 1,
+             line_type: int = cv2.LINE_AA, outline=None) -> "OverlayLayer":
+        """putText 와 같은 위치(org = 글자 왼쪽 아래). outline 색을 주면 두께+2 외곽선을 먼저 그린다."""
+        org = (int(org[0]), int(org[1]))
+        if outline is not None:
+            self._stamp(outline, lambda m: cv2.putText(m, text, org, FONT, scale, 255, thickness + 2, line_type))
+        return self._stamp(color, lambda m: cv2.putText(m, text, org, FONT, scale, 255, thickness, line_type))
+
+    # ------------------------------------------------------------------
+    def _freeze(self) -> None:
+        self._bgr = np.ascontiguousarray(self.rgba[..., :3])
+        self._mask = np.where(self.rgba[..., 3] >= ALPHA_CUT, 255, 0).astype(np.uint8)
+        self._frozen = True
+
+    def apply(self, dst: np.ndarray, x: int = 0, y: int = 0) -> np.ndarray:
+        """dst 의 (x, y) 위치에 레이어를 마스크 복사 한 번으로 합성한다 (dst 는 제자리 수정)."""
+        if not self._frozen:
+            self._freeze()
+        h, w = self.shape
+        H, W = dst.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, W), min(y + h, H)
+        if x0 >= x1 or y0 >= y1:
+            return dst
+        sy, sx = y0 - y, x0 - x
+        cv2.copyTo(self._bgr[sy:sy + (y1 - y0), sx:sx + (x1 - x0)],
+                   self._mask[sy:sy + (y1 - y0), sx:sx + (x1 - x0)],
+                   dst[y0:y1, x0:x1])
+        return dst
+
+    def pixels(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """마스크가 켜진 픽셀의 (y, x, 색) 배열 (GlyphCache 의 한 번에 찍기용)."""
+        if not self._frozen:
+            self._freeze()
+        ys, xs = np.nonzero(self._mask)
+        return ys, xs, self._bgr[ys, xs]
+
+
+_layers: Dict[Hashable, OverlayLayer] = {}
+_layers_lock = threading.Lock()
+
+
+def cached_layer(key: Hashable, shape, build: Callable[[OverlayLayer], None]) -> OverlayLayer:
+    """(key, 높이, 너비) 별로 build(layer) 를 한 번만 불러 만든 레이어를 돌려준다."""
+    h, w = int(shape[0]), int(shape[1])
+    full_key = (key, h, w)
+    layer = _layers.get(full_key)
+    if layer is None:
+        with _layers_lock:
+            layer = _layers.get(full_key)
+            if layer is None:
+                layer = OverlayLayer(h, w)
+                build(layer)
+                layer._freeze()
+                _layers[full_key] = layer
+    return layer
+
+
+def grid_layer(shape, grid: int = 8, color=(100, 100, 100), thickness: int = 1,
+               line_type: int = cv2.LINE_AA, border: bool = False,
+               labels: Optional[Tuple[float, Tuple[int, int, int]]] = None) -> OverlayLayer:
+    """grid x grid 격자선 레이어. labels=(글자 크기, 색) 이면 윗줄 a~h, 왼쪽 8~1 좌표도 넣는다."""
+    def build(layer: OverlayLayer) -> None:
+        h, w = layer.shape
+        cs_h, cs_w = h // grid, w // grid
+        rng = range(0, grid + 1) if border else range(1, grid)
+        for j in rng:
+            layer.line((j * cs_w, 0), (j * cs_w, h), color, thickness, line_type)
+        for i in rng:
+            layer.line((0, i * cs_h), (w, i * cs_h), color, thickness, line_type)
+        if labels is not None:
+            scale, label_color = labels
+            for j in range(grid):
+                layer.text(chr(ord('a') + j), (j * cs_w + 4, 14), scale, label_color, 1)
+            for i in range(grid):
+                layer.text(str(grid - i), (4, i * cs_h + 14), scale, label_color, 1)
+
+    key = ("grid", grid, tuple(color), thickness, line_type, border, labels)
+    return cached_layer(key, shape, build)
+
+
+def text_layer(shape, text: str, org, scale: float = 0.6, color=(0, 255, 255),
+               thickness: int = 2, outline=None) -> OverlayLayer:
+    """고정 문구(상태 표시 등) 레이어. 문구/위치/색마다 한 번만 그린다."""
+    key = ("text", text, tuple(org), scale, tuple(color), thickness,
+           None if outline is None else tuple(outline))
+    return cached_layer(key, shape, lambda layer: layer.text(text, org, scale, color, thickness,
+                                                             outline=outline))
+
+
+class GlyphCache:
+    """숫자/짧은 문자열 스프라이트 캐시. put() 은 putText 와 같은 기준점(왼쪽 아래)을 쓴다."""
+
+    def __init__(self, scale: float = 0.5, color=(0, 0, 255), thickness: int = 1,
+                 outline=None, prebuild: int = PREBUILT_VALUES):
+        self.scale = float(scale)
+        self.color = tuple(color)
+        self.thickness = int(thickness)
+        self.outline = None if outline is None else tuple(outline)
+        self._sprites: Dict[str, Tuple[OverlayLayer, int, int]] = {}
+        self._lock = threading.Lock()
+        self._prebuild = int(prebuild)
+        self._tabs: Dict[int, tuple] = {}
+        for v in range(self._prebuild):
+            self._build(str(v))
+
+    def _build(self, text: str) -> Tuple[OverlayLayer, int, int]:
+        t = self.thickness + (2 if self.outline is not None else 0)
+        (tw, th), base = cv2.getTextSize(text, FONT, self.scale, t)
+        pad = t + 2
+        ox, oy = pad, pad + th          # 스프라이트 안에서의 putText 기준점
+        layer = OverlayLayer(th + base + 2 * pad, tw + 2 * pad)
+        layer.text(text, (ox, oy), self.scale, self.color, self.thickness, outline=self.outline)
+        layer._freeze()
+        entry = (layer, ox, oy)
+        with self._lock:
+            self._sprites[text] = entry
+        return entry
+
+    def put(self, dst: np.ndarray, value, org) -> np.ndarray:
+        """cv2.putText(dst, str(value), org, ...) 대신 캐시된 스프라이트를 붙인다."""
+        text = str(value)
+        entry = self._sprites.get(text)
+        if entry is None:
+            entry = self._build(text)
+        layer, ox, oy = entry
+        return layer.apply(dst, int(org[0]) - ox, int(org[1]) - oy)
+
+    def _table(self, width: int):
+        """0~prebuild-1 스프라이트를 dst 폭 기준 바이트 오프셋/색 표로 만든다 (폭마다 한 번).
+
+        (N,3) 행 단위 대입보다 평면 바이트 인덱스 대입이 몇 배 빨라서 채널까지 펼쳐 둔다.
+        짧은 스프라이트는 첫 픽셀을 반복해 채운다 (같은 픽셀에 같은 색을 다시 쓰므로 무해).
+        """
+        tab = self._tabs.get(width)
+        if tab is None:
+            n = self._prebuild
+            pix = [self._sprites[str(v)][0].pixels() for v in range(n)]
+            m = max(1, max(len(p[0]) for p in pix))
+            off = np.zeros((n, m), np.int64)
+            cols = np.zeros((n, m, 3), np.uint8)
+            ext = np.zeros((n, 4), np.int64)        # y 최소/최대, x 최소/최대 (기준점 기준)
+            usable = np.zeros(n, bool)
+            for v, (py, px, pc) in enumerate(pix):
+                if len(py) == 0:
+                    continue
+                _, ox, oy = self._sprites[str(v)]
+                ry, rx = py.astype(np.int64) - oy, px.astype(np.int64) - ox
+                k = len(ry)
+                off[v, :k], cols[v, :k] = ry * width + rx, pc
+                off[v, k:], cols[v, k:] = off[v, 0], pc[0]
+                ext[v] = (ry.min(), ry.max(), rx.min(), rx.max())
+                usable[v] = True
+            off3 = (off[..., None] * 3 + np.arange(3)).reshape(n, -1)
+            tab = (off3, cols.reshape(n, -1), ext, usable)
+            self._tabs[width] = tab
+        return tab
+
+    def put_grid(self, dst: np.ndarray, values: np.ndarray, dx: int = 2, dy: Optional[int] = None) -> np.ndarray:
+        """(g, g) 정수 배열을 칸마다 (칸 왼쪽 + dx, 칸 위 + dy) 에 찍는다 (기본 dy = 칸 높이/2)."""
+        values = np.asarray(values)
+        g_h, g_w = values.shape[:2]
+        h, w = dst.shape[:2]
+        cs_h, cs_w = h // g_h, w // g_w
+        dy = cs_h // 2 if dy is None else dy
+        org_y = np.repeat(np.arange(g_h) * cs_h + dy, g_w)
+        org_x = np.tile(np.arange(g_w) * cs_w + dx, g_h)
+        vals = values.reshape(-1).astype(np.int64)
+        fast = (vals >= 0) & (vals < self._prebuild)
+        if dst.flags.c_contiguous and dst.dtype == np.uint8 and fast.any():
+            off3, cols3, ext, usable = self._table(w)
+            v = np.where(fast, vals, 0)
+            e = ext[v]
+            # 스프라이트가 프레임 안에 다 들어가는 칸만 한 번에 (가장자리는 put() 으로 잘라 붙임)
+            fast &= usable[v] & (org_y + e[:, 0] >= 0) & (org_y + e[:, 1] < h) \
+                & (org_x + e[:, 2] >= 0) & (org_x + e[:, 3] < w)
+            v = v[fast]
+            idx = off3[v] + ((org_y[fast] * w + org_x[fast]) * 3)[:, None]
+            dst.reshape(-1)[idx.reshape(-1)] = cols3[v].reshape(-1)
+        else:
+            fast[:] = False
+        for k in np.flatnonzero(~fast):
+            self.put(dst, int(vals[k]), (int(org_x[k]), int(org_y[k])))
+        return dst
+
+
+def benchmark_overlays(size: int = 400, n_frames: int = 200) -> Dict[str, float]:
+    """직접 그리기(line/putText) vs 캐시 레이어+스프라이트, 프레임당 ms."""
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (size, size, 3), dtype=np.uint8)
+    values = rng.integers(0, 120, (n_frames, 8, 8))
+    cs = size // 8
+
+    def direct(vis, vals):
+        for j in range(1, 8):
+            cv2.line(vis, (j * cs, 0), (j * cs, size), (100, 100, 100), 1, cv2.LINE_AA)
+            cv2.line(vis, (0, j * cs), (size, j * cs), (100, 100, 100), 1, cv2.LINE_AA)
+        for j in range(8):
+            cv2.putText(vis, chr(ord('a') + j), (j * cs + 4, 14), FONT, 0.45, (120, 120, 120), 1, cv2.LINE_AA)
+            cv2.putText(vis, str(8 - j), (4, j * cs + 14), FONT, 0.45, (120, 120, 120), 1, cv2.LINE_AA)
+        for i in range(8):
+            for j in range(8):
+                cv2.putText(vis, str(int(vals[i, j])), (j * cs + 2, i * cs + cs // 2),
+                            FONT, 0.5, (0, 0, 255), 1, cv2.LINE_AA)
+        cv2.putText(vis, "Warp OK", (10, size - 10), FONT, 0.6, (0, 255, 255), 2, cv2.LINE_AA)
+
+    glyphs = GlyphCache(0.5, (0, 0, 255), 1)
+
+    def cached(vis, vals):
+        grid_layer(vis.shape, labels=(0.45, (120, 120, 120))).apply(vis)
+        glyphs.put_grid(vis, vals)
+        text_layer(vis.shape, "Warp OK", (10, size - 10)).apply(vis)
+
+    out = {}
+    for name, fn in (("direct", direct), ("cached", cached)):
+        vis = base.copy()
+        fn(vis, values[0])   # 캐시 준비
+        t0 = time.perf_counter()
+        for k in range(n_frames):
+            vis[...] = base
+            fn(vis, values[k])
+        out[name] = (time.perf_counter() - t0) * 1000.0 / n_frames
+    a, b = base.copy(), base.copy()
+    direct(a, values[0])
+    cached(b, values[0])
+    out["max_abs_diff"] = float(np.abs(a.astype(np.int16) - b.astype(np.int16)).max())
+    out["mean_abs_diff"] = float(np.abs(a.astype(np.int16) - b.astype(np.int16)).mean())
+    print(f"[overlay] {size}x{size}: direct {out['direct']:.3f} ms/frame, "
+          f"cached {out['cached']:.3f} ms/frame, mean |diff| {out['mean_abs_diff']:.3f}")
+    return out
+
+
+__all__ = [
+    'OverlayLayer',
+    'cached_layer',
+    'grid_layer',
+    'text_layer',
+    'GlyphCache',
+    'benchmark_overlays',
+]
+
+
+if __name__ == "__main__":
+    benchmark_overlays()
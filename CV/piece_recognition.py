@@ -8,8 +8,12 @@ import cv2
 import numpy as np
 import os
 
+from board_stats import cell_diff_norms, cell_geometry, cell_means
+from frame_ring import FrameRing, flip_code, orient_into, read_picam_bgr
+from jpeg_encoder import StreamProfile, get_encoder
+from overlay import GlyphCache, text_layer
+from marker_detection import find_green_corners
 from warp_cam_picam2_v2 import (
-    find_green_corners,
     warp_chessboard,
     FRAME_SIZE, FPS, HFLIP, VFLIP,
     USE_AUTO_EXPOSURE, EXPOSURE_TIME, ANALOG_GAIN,
@@ -33,44 +37,27 @@ SHOW_WINDOW_NAME = "PieceRecognition (Warp+Diff)"
 
 # -------------------- 공통 유틸 --------------------
 def _split_sizes(h: int, w: int, grid: int):
-    """셀 크기, 마진 계산"""
-    cs_h, cs_w = h // grid, w // grid
-    my = int(cs_h * CELL_MARGIN_RATIO)
-    mx = int(cs_w * CELL_MARGIN_RATIO)
-    return cs_h, cs_w, my, mx
-
-
-def _cell_region(i, j, cs_h, cs_w, my, mx, H, W):
-    """셀 내부 마진까지 고려한 안전한 ROI"""
-    y1 = i * cs_h + my
-    y2 = (i + 1) * cs_h - my
-    x1 = j * cs_w + mx
-    x2 = (j + 1) * cs_w - mx
-    # 경계 보정
-    y1 = max(0, min(y1, H - 1)); y2 = max(y1 + 1, min(y2, H))
-    x1 = max(0, min(x1, W - 1)); x2 = max(x1 + 1, min(x2, W))
-    return y1, y2, x1, x2
+    """셀 크기, 마진 계산 (board_stats 와 같은 규칙: 칸 안쪽 최소 1픽셀 보장)"""
+    return cell_geometry(h, w, grid, CELL_MARGIN_RATIO)
 
 
 def compute_board_means_LAB(image_bgr, grid=GRID, margin_ratio=CELL_MARGIN_RATIO):
     """단독 실행(run)에서 메모리 기준값을 만들 때 사용 (LAB 평균)"""
     lab = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2LAB)
-    H, W = lab.shape[:2]
-    cs_h, cs_w, my, mx = _split_sizes(H, W, grid)
-    means = np.zeros((grid, grid, 3), np.float32)
-    for i in range(grid):
-        for j in range(grid):
-            y1, y2, x1, x2 = _cell_region(i, j, cs_h, cs_w, my, mx, H, W)
-            cell = lab[y1:y2, x1:x2]
-            means[i, j] = cell.reshape(-1, 3).mean(axis=0).astype(np.float32)
-    return means  # (grid,grid,3), float32
+    return cell_means(lab, grid=grid, margin_ratio=margin_ratio)  # (grid,grid,3), float32
 
 
 # -------------------- 단독 실행용 --------------------
 class PiCam2Capture:
-    """Picamera2 캡처 래퍼 (단독 실행에만 사용)"""
+    """Picamera2 캡처 래퍼 (단독 실행에만 사용)
+
+    read() 는 미리 할당한 링 버퍼에 BGR 로 바로 쓰고 반전은 제자리 flip 한 번.
+    """
     def __init__(self):
         from picamera2 import Picamera2
+        self._ring = FrameRing()
+        self._flip = flip_code(HFLIP, VFLIP)
+        self._shape = None
         self.picam2 = Picamera2()
         cfg = self.picam2.create_preview_configuration(
             main={"size": FRAME_SIZE, "format": "RGB888"},
@@ -83,13 +70,10 @@ class PiCam2Capture:
             self.picam2.set_controls({"ExposureTime": EXPOSURE_TIME, "AnalogueGain": ANALOG_GAIN})
 
     def read(self):
-        rgb = self.picam2.capture_array()
-        frame = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
-        if HFLIP:
-            frame = cv2.flip(frame, 1)
-        if VFLIP:
-            frame = cv2.flip(frame, 0)
-        return True, frame
+        buf = self._ring.next(self._shape) if self._shape is not None else None
+        frame = read_picam_bgr(self.picam2, buf)
+        self._shape = frame.shape
+        return True, orient_into(frame, frame, 0, self._flip)
 
     def release(self):
         try:
@@ -109,6 +93,7 @@ def run():
     prev_warp = None
     ema_means = None
     prev_diff = None
+    means = np.empty((GRID, GRID, 3), np.float32)
 
     cv2.namedWindow(SHOW_WINDOW_NAME, cv2.WINDOW_NORMAL)
 
@@ -148,13 +133,7 @@ def run():
             lab = cv2.cvtColor(warp, cv2.COLOR_BGR2LAB)
             H, W = lab.shape[:2]
             cs_h, cs_w, my, mx = _split_sizes(H, W, GRID)
-
-            means = np.zeros((GRID, GRID, 3), np.float32)
-            for i in range(GRID):
-                for j in range(GRID):
-                    y1, y2, x1, x2 = _cell_region(i, j, cs_h, cs_w, my, mx, H, W)
-                    cell = lab[y1:y2, x1:x2]
-                    means[i, j] = cell.reshape(-1, 3).mean(axis=0).astype(np.float32)
+            cell_means(lab, grid=GRID, margin_ratio=CELL_MARGIN_RATIO, out=means)
 
             if ema_means is None:
                 ema_means = means.copy()
@@ -215,6 +194,9 @@ def run():
 
 
 # -------------------- Flask 스트리밍용 --------------------
+EDGES_PROFILE = StreamProfile("edges", target_kb=30, max_encode_ms=10)
+_DIFF_GLYPHS = GlyphCache(scale=0.5, color=(0, 0, 255), thickness=1)
+
 def gen_edges_frames(cap, base_board_path='init_board_values.npy', threshold=12.0, top_k=4):
     """
     main.py에서 /piece 라우트로 사용하는 제너레이터.
@@ -258,18 +240,10 @@ def gen_edges_frames(cap, base_board_path='init_board_values.npy', threshold=12.
         if base_board_values is not None and base_board_values.shape == (GRID, GRID, 3):
             H, W = warp.shape[:2]
             cs_h, cs_w = H // GRID, W // GRID
-            diffs = np.zeros((GRID, GRID), np.float32)
+            diffs = cell_diff_norms(cell_means(warp, grid=GRID), base_board_values)
 
-            for i in range(GRID):
-                for j in range(GRID):
-                    y1, y2 = i * cs_h, (i + 1) * cs_h
-                    x1, x2 = j * cs_w, (j + 1) * cs_w
-                    cell = warp[y1:y2, x1:x2]
-                    mean_bgr = np.mean(cell.reshape(-1, 3), axis=0)
-                    diff = np.linalg.norm(mean_bgr - base_board_values[i, j])
-                    diffs[i, j] = diff
-                    cv2.putText(vis, str(int(diff)), (x1 + 2, y1 + cs_h // 2),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1, cv2.LINE_AA)
+            # 칸별 diff 숫자는 캐시된 글자 스프라이트로 한 번에
+            _DIFF_GLYPHS.put_grid(vis, diffs.astype(np.int32), dx=2, dy=cs_h // 2)
 
             flat = diffs.flatten()
             idx_sorted = np.argsort(-flat)
@@ -283,13 +257,14 @@ def gen_edges_frames(cap, base_board_path='init_board_values.npy', threshold=12.
                 x2, y2 = (j + 1) * cs_w, (i + 1) * cs_h
                 cv2.rectangle(vis, (x1, y1), (x2, y2), (0, 0, 255), 2)
         else:
-            cv2.putText(vis, "NO BASE FILE: set in web UI (Set Initial Board)",
-                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2, cv2.LINE_AA)
+            text_layer(vis.shape, "NO BASE FILE: set in web UI (Set Initial Board)",
+                       (10, 30), 0.6, (0, 255, 255), 2).apply(vis)
 
         # JPEG로 인코딩하여 MJPEG 스트리밍
-        _, buffer = cv2.imencode('.jpg', vis)
+        # JPEG 인코딩은 공용 풀에서 (품질/축소는 EDGES_PROFILE 목표에 맞춰 자동 조절)
+        jpeg = get_encoder().encode(vis, profile=EDGES_PROFILE)
         yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+               b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
 
 
 # -------------------- 엔트리 --------------------
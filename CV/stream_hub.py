@@ -0,0 +1,154 @@
+"""MJPEG 스트림 허브: 스트림 종류마다 프로듀서 하나가 인코딩하고 구독자에게 나눠준다.
+
+예전에는 /warp, /edges 같은 스트림 라우트에 클라이언트가 붙을 때마다 제너레이터가
+따로 돌아 카메라 읽기/코너 검출/와핑/JPEG 인코딩을 각자 했다 (탭 두 개 = CPU 두 배).
+
+- hub.register(name, factory): factory() 는 멀티파트 조각(b'--frame...')을
+  내는 기존 제너레이터를 돌려준다.
+- hub.stream(name): Flask Response 에 넘길 구독자 제너레이터.
+  첫 구독자가 붙으면 프로듀서 스레드를 시작하고, 마지막 구독자가 떠나면
+  다음 프레임에서 프로듀서가 멈춘다 (제너레이터 close()).
+- 채널은 최신 조각 한 장과 순번만 들고 있다. 느린 클라이언트는 밀린 프레임을
+  건너뛰고(drop) 최신 것만 받으므로 프로듀서가 막히지 않는다.
+
+CV/ 와 mjpg/ 에 같은 내용의 사본이 있다.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+MULTIPART_MIMETYPE = 'multipart/x-mixed-replace; boundary=frame'
+SUBSCRIBER_TIMEOUT = 5.0   # 이 시간 동안 새 프레임이 없으면 구독자 쪽에서 다시 확인
+
+
+class _Channel:
+    def __init__(self, name: str, factory: Callable[[], Iterator[bytes]]):
+        self.name = name
+        self.factory = factory
+        self.cond = threading.Condition()
+        self.chunk: Optional[bytes] = None
+        self.seq = 0
+        self.subscribers = 0
+        self.thread: Optional[threading.Thread] = None
+        self.ended = False
+        self.frames = 0
+        self.drops = 0
+        self.starts = 0
+        self.encode_ms = 0.0
+
+
+class StreamHub:
+    """스트림 이름별로 프로듀서 하나 + 구독자 N 명."""
+
+    def __init__(self):
+        self._channels: Dict[str, _Channel] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Iterator[bytes]]) -> None:
+        with self._lock:
+            self._channels[name] = _Channel(name, factory)
+
+    # ------------------------------------------------------------------
+    def _produce(self, ch: _Channel) -> None:
+        try:
+            it = ch.factory()
+        except Exception as e:
+            print(f"[stream_hub] {ch.name}: producer start failed: {e}")
+            it = None
+        try:
+            while it is not None:
+                t0 = time.perf_counter()
+                try:
+                    chunk = next(it)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    print(f"[stream_hub] {ch.name}: producer error: {e}")
+                    break
+                dt = (time.perf_counter() - t0) * 1000.0
+                with ch.cond:
+                    ch.chunk = chunk
+                    ch.seq += 1
+                    ch.frames += 1
+                    ch.encode_ms = dt if ch.frames == 1 else 0.9 * ch.encode_ms + 0.1 * dt
+                    ch.cond.notify_all()
+                    if ch.subscribers == 0:
+                        # 멈추기로 한 잠금 안에서 바로 채널을 놓는다. 아래 close() 도중 붙는
+                        # 구독자(새로고침 등)는 thread 가 None 이라 새 프로듀서를 띄운다.
+                        ch.thread = None
+                        ch.chunk = None
+                        break
+        finally:
+            if it is not None and hasattr(it, "close"):
+                try:
+                    it.close()
+                except Exception:
+                    pass
+            with ch.cond:
+                # 이미 채널을 놓았으면(위 break) 그사이 시작된 새 프로듀서의 상태를 건드리지 않는다
+                if ch.thread is threading.current_thread():
+                    ch.thread = None
+                    if ch.subscribers > 0:
+                        # 구독자가 남았는데 제너레이터가 끝남 → 대기 중인 구독자도 끝낸다
+                        ch.ended = True
+                    ch.chunk = None
+                    ch.cond.notify_all()
+
+    def _subscribe(self, ch: _Channel) -> int:
+        with ch.cond:
+            ch.subscribers += 1
+            if ch.thread is None:
+                ch.ended = False
+                ch.starts += 1
+                ch.thread = threading.Thread(target=self._produce, args=(ch,),
+                                             name=f"stream-{ch.name}", daemon=True)
+                ch.thread.start()
+            return ch.seq
+
+    def _unsubscribe(self, ch: _Channel) -> None:
+        with ch.cond:
+            ch.subscribers = max(0, ch.subscribers - 1)
+
+    def stream(self, name: str) -> Iterator[bytes]:
+        """구독자 제너레이터. 클라이언트가 끊기면(GeneratorExit) 구독을 해제한다."""
+        ch = self._channels[name]
+        last = self._subscribe(ch)
+        try:
+            while True:
+                with ch.cond:
+                    ch.cond.wait_for(lambda: ch.seq > last or ch.ended, SUBSCRIBER_TIMEOUT)
+                    if ch.ended:
+                        return
+                    if ch.seq <= last:
+                        if ch.thread is None:
+                            return
+                        continue
+                    if ch.seq > last + 1:
+                        ch.drops += ch.seq - last - 1
+                    chunk, last = ch.chunk, ch.seq
+                if chunk is not None:
+                    yield chunk
+        finally:
+            self._unsubscribe(ch)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for name, ch in self._channels.items():
+            out[name] = {
+                "subscribers": ch.subscribers,
+                "running": ch.thread is not None,
+                "frames": ch.frames,
+                "drops": ch.drops,
+                "starts": ch.starts,
+                "produce_ms": round(ch.encode_ms, 2),
+            }
+        return out
+
+
+__all__ = [
+    'MULTIPART_MIMETYPE',
+    'StreamHub',
+]
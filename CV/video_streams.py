@@ -3,11 +3,16 @@ import cv2
 import numpy as np
 import os, time
 
-# v2 모듈에서 코너/와핑 및 HSV 임계값 재사용
+from jpeg_encoder import StreamProfile, get_encoder
+from overlay import GlyphCache, grid_layer, text_layer
+
+from board_stats import cell_diff_norms, cell_means
+# v2 모듈에서 와핑 및 HSV 임계값 재사용 (코너 검출은 marker_detection 의 MarkerTracker)
 from warp_cam_picam2_v2 import (
-    find_green_corners, warp_chessboard,
+    warp_chessboard, CornerStabilizer,
     Hmin, Hmax, Smin, Smax, Vmin, Vmax
 )
+from marker_detection import MarkerTracker
 
 # ==== 설정값 ====
 GRID = 8
@@ -19,37 +24,20 @@ TOP_K = 2            # 이동 후보 칸 수 (보통 2칸: 출발/도착)
 DIFF_EMA = 0.5       # diff 부드럽게(지터 완화)
 # ===============
 
-def _jpeg_bytes(img):
-    ok, buf = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
-    if not ok: ok, buf = cv2.imencode('.jpg', img)
-    return buf.tobytes()
+# 스트림별 프레임 크기 목표: 품질/축소는 jpeg_encoder 가 최근 크기/시간을 보고 맞춘다
+ORIGINAL_PROFILE = StreamProfile("original", target_kb=45, quality=JPEG_QUALITY, max_encode_ms=20)
+WARP_PROFILE = StreamProfile("warp", target_kb=30, quality=JPEG_QUALITY, max_encode_ms=10)
+
+def _jpeg_bytes(img, profile=None):
+    # 공용 인코더 풀에서 인코딩 (profile 이 없으면 JPEG_QUALITY 고정)
+    return get_encoder().encode(img, profile=profile, quality=JPEG_QUALITY)
+
+# diff 숫자 스프라이트 (0~255 미리 렌더)
+_DIFF_GLYPHS = GlyphCache(scale=0.5, color=(0, 0, 255), thickness=1)
 
 def _draw_grid(vis):
-    h, w = vis.shape[:2]
-    cs_h, cs_w = h // GRID, w // GRID
-
-    # 세로선
-    for j in range(1, GRID):
-        x = j * cs_w
-        cv2.line(vis, (x, 0), (x, h), (100, 100, 100), 1, cv2.LINE_AA)
-    # 가로선
-    for i in range(1, GRID):
-        y = i * cs_h
-        cv2.line(vis, (0, y), (w, y), (100, 100, 100), 1, cv2.LINE_AA)
-
-    # 좌표 라벨
-    for j in range(GRID):
-        cv2.putText(vis, chr(ord('a') + j), (j * cs_w + 4, 14),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, (120,120,120), 1, cv2.LINE_AA)
-    for i in range(GRID):
-        cv2.putText(vis, str(GRID - i), (4, i * cs_h + 14),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, (120,120,120), 1, cv2.LINE_AA)
-
-def _cell_mean_bgr(img, i, j, cs_h, cs_w):
-    y1, y2 = i * cs_h, (i + 1) * cs_h
-    x1, x2 = j * cs_w, (j + 1) * cs_w
-    cell = img[y1:y2, x1:x2]
-    return cell.reshape(-1, 3).mean(axis=0)
+    # 격자선 + 좌표 라벨: 와프 크기별로 한 번 그려 둔 레이어를 마스크 복사
+    grid_layer(vis.shape, GRID, color=(100, 100, 100), labels=(0.45, (120, 120, 120))).apply(vis)
 
 def _cell_center(i, j, cs_h, cs_w):
     y1, y2 = i * cs_h, (i + 1) * cs_h
@@ -67,7 +55,7 @@ def gen_original_frames(cap):
         ret, frame = cap.read()
         if not ret:
             time.sleep(0.01); continue
-        yield _jpeg_bytes(frame), []
+        yield _jpeg_bytes(frame, ORIGINAL_PROFILE), []
 
         hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
         lower = np.array([Hmin, Smin, Vmin], dtype=np.uint8)
@@ -90,7 +78,7 @@ def gen_original_frames(cap):
             cx = int(M['m10']/M['m00']); cy = int(M['m01']/M['m00'])
             hsv_values.append([int(x) for x in hsv[cy, cx]])
 
-        yield _jpeg_bytes(disp), hsv_values
+        yield _jpeg_bytes(disp, ORIGINAL_PROFILE), hsv_values
 
 def gen_warped_frames(cap, base_board_path='init_board_values.npy'):
     """
@@ -111,6 +99,9 @@ def gen_warped_frames(cap, base_board_path='init_board_values.npy'):
     base_vals = None
     last_mtime = None
 
+    # 잠금 이후에는 마커 주변 창만 검색, 연속 실패 시 전체 프레임 검색
+    tracker = MarkerTracker(lower, upper, min_area=60, stabilizer=CornerStabilizer())
+
     while True:
         ret, frame = cap.read()
         if not ret:
@@ -130,11 +121,8 @@ def gen_warped_frames(cap, base_board_path='init_board_values.npy'):
             base_vals = None
             last_mtime = None
 
-        # 코너 → 와핑 (시그니처 차이 안전)
-        try:
-            corners = find_green_corners(frame.copy(), lower, upper, min_area=60)
-        except TypeError:
-            corners = find_green_corners(frame.copy())
+        # 코너 → 와핑
+        corners = tracker.update(frame)
 
         if corners is not None and len(corners) == 4:
             warp = warp_chessboard(frame, corners, size=WARP_SIZE)
@@ -156,11 +144,7 @@ def gen_warped_frames(cap, base_board_path='init_board_values.npy'):
 
         # diff 계산 & 오버레이
         if base_vals is not None and base_vals.shape == (GRID, GRID, 3):
-            diffs = np.zeros((GRID, GRID), np.float32)
-            for i in range(GRID):
-                for j in range(GRID):
-                    mean_bgr = _cell_mean_bgr(warp, i, j, cs_h, cs_w).astype(np.float32)
-                    diffs[i, j] = float(np.linalg.norm(mean_bgr - base_vals[i, j]))
+            diffs = cell_diff_norms(cell_means(warp, grid=GRID), base_vals)
 
             # 부드럽게
             if prev_diffs is None:
@@ -169,12 +153,8 @@ def gen_warped_frames(cap, base_board_path='init_board_values.npy'):
                 smooth = DIFF_EMA * diffs + (1.0 - DIFF_EMA) * prev_diffs
             prev_diffs = smooth
 
-            # 숫자 쓰기
-            for i in range(GRID):
-                for j in range(GRID):
-                    y1 = i * cs_h; x1 = j * cs_w
-                    cv2.putText(vis, str(int(round(smooth[i, j]))), (x1 + 2, y1 + cs_h // 2),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,255), 1, cv2.LINE_AA)
+            # 숫자 쓰기 (캐시된 글자 스프라이트)
+            _DIFF_GLYPHS.put_grid(vis, np.rint(smooth).astype(np.int32), dx=2, dy=cs_h // 2)
 
             # 상위 K칸 하이라이트 (사각형만, 화살표/라벨 없음)
             flat = smooth.flatten()
@@ -192,15 +172,14 @@ def gen_warped_frames(cap, base_board_path='init_board_values.npy'):
                 cv2.rectangle(vis, (x1, y1), (x2, y2), (0,0,255), 2)
 
         else:
-            cv2.putText(vis, "NO BASE: click 'Set Initial Board' in web UI",
-                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,255), 2, cv2.LINE_AA)
+            text_layer(vis.shape, "NO BASE: click 'Set Initial Board' in web UI",
+                       (10, 30), 0.6, (0, 255, 255), 2).apply(vis)
 
         # 상태 텍스트
-        cv2.putText(vis, status, (10, h - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,255), 2, cv2.LINE_AA)
+        text_layer(vis.shape, status, (10, h - 10), 0.6, (0, 255, 255), 2).apply(vis)
 
         yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + _jpeg_bytes(vis) + b'\r\n')
+               b'Content-Type: image/jpeg\r\n\r\n' + _jpeg_bytes(vis, WARP_PROFILE) + b'\r\n')
 
 def gen_edges_frames(cap):
     """
@@ -6,6 +6,8 @@ import numpy as np
 import cv2
 from picamera2 import Picamera2
 
+from marker_detection import find_green_corners  # 코너 검출 구현은 marker_detection 하나
+
 # ======================== CONFIG ========================
 Hmin, Hmax = 65, 84
 Smin, Smax = 65, 255
@@ -100,77 +102,6 @@ def sort_corners_by_position(pts):
     bot = sorted(pts[2:], key=lambda p: p[0])
     return np.array([top[0], top[1], bot[1], bot[0]], dtype=np.float32)
 
-def find_green_corners(frame, lower, upper, min_area=60):
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    mask = cv2.inRange(hsv, lower, upper)
-    
-    # 모폴로지 연산으로 노이즈 제거
-    k = np.ones((3,3), np.uint8)  # 더 작은 커널
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, k)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, k)
-
-    # 마스크 정보 출력
-    mask_fill = mask.mean()/255.0
-    if VERBOSE and int(time.time()*3)%3==0:
-        print(f"[DBG] mask_fill={mask_fill:.3f}, lower={lower}, upper={upper}")
-
-    # 윤곽선 찾기
-    cnts, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    cnts = sorted(cnts, key=cv2.contourArea, reverse=True)[:10]  # 더 많은 윤곽선 검사
-
-    centers = []
-    for i, c in enumerate(cnts):
-        area = cv2.contourArea(c)
-        if area < min_area:
-            continue
-        M = cv2.moments(c)
-        if M["m00"] == 0:
-            continue
-        cx = int(M["m10"]/M["m00"])
-        cy = int(M["m01"]/M["m00"])
-        centers.append([cx, cy])
-        
-        if VERBOSE and int(time.time()*3)%3==0:
-            print(f"[DBG] contour {i}: area={area:.1f}, center=({cx},{cy})")
-
-    # 근접 중복 제거 (거리 임계값을 더 작게)
-    dedup = []
-    for c in centers:
-        if all(np.hypot(c[0]-d[0], c[1]-d[1]) > 8 for d in dedup):  # 8픽셀로 줄임
-            dedup.append(c)
-    centers = dedup
-
-    if VERBOSE and int(time.time()*3)%3==0:
-        print(f"[DBG] final centers={len(centers)}: {centers}")
-
-    if len(centers) == 4:
-        sorted_corners = sort_corners_by_position(centers)
-        if VERBOSE:
-            print(f"[DBG] corners sorted: {sorted_corners.tolist()}")
-        return sorted_corners
-    elif len(centers) > 4:
-        # 4개보다 많으면 가장 큰 4개만 선택
-        if VERBOSE:
-            print(f"[DBG] too many centers ({len(centers)}), selecting largest 4")
-        # 면적으로 정렬하여 가장 큰 4개 선택
-        areas = []
-        for c in centers:
-            # 해당 중심점 근처의 마스크 픽셀 수 계산
-            x, y = int(c[0]), int(c[1])
-            area = np.sum(mask[max(0,y-10):min(mask.shape[0],y+10), 
-                             max(0,x-10):min(mask.shape[1],x+10)]) / 255
-            areas.append(area)
-        
-        # 면적으로 정렬하여 상위 4개 선택
-        sorted_indices = np.argsort(areas)[::-1][:4]
-        selected_centers = [centers[i] for i in sorted_indices]
-        sorted_corners = sort_corners_by_position(selected_centers)
-        if VERBOSE:
-            print(f"[DBG] selected corners: {sorted_corners.tolist()}")
-        return sorted_corners
-    
-    return None
-
 def warp_chessboard(frame, corners, size=480):
     if corners is None:
         if VERBOSE: print("[warp] corners is None")
@@ -1,12 +1,32 @@
 """CV 관련 하위 모듈 패키지."""
 
 __all__ = [
+    "background_model",
+    "board_monitor",
+    "board_stats",
+    "calibrate_camera",
+    "change_segmentation",
     "cv_detection",
     "cv_manager",
     "cv_web",
+    "file_capture",
+    "flight_recorder",
+    "frame_grabber",
+    "frame_ring",
+    "jobs",
+    "jpeg_encoder",
+    "marker_detection",
+    "motion_monitor",
+    "move_inference",
+    "occupancy",
+    "overlay",
     "picam_stable",
     "piece_auto_update",
     "piece_detector",
     "player_input",
+    "response_cache",
+    "sequential_detector",
+    "warp_cache",
+    "web_loadtest",
+    "web_server",
 ]
-
@@ -0,0 +1,272 @@
+"""칸별 적응형 배경 모델 (LAB 평균 + 노이즈 분산).
+
+예전에는 턴마다 process_turn_transition 이 와프 한 장으로 8x8 BGR 기준 전체를 새로 만들고
+init_board_values.npy 를 지웠다가 다시 쓰고 다시 읽었다. 턴 사이에 조명이 천천히 바뀌면
+그 변화가 그대로 기물 이동처럼 보이고, 문턱은 모든 칸에 같은 9.0 하나였다.
+
+BackgroundModel 은 칸마다
+- mean : LAB 평균 (8, 8, 3)
+- var  : 기준 대비 변화량 제곱의 EMA (칸 노이즈 분산)
+을 들고 있고, 변화 판정은 z = |detrended(lab - mean)| / sigma 칸별 z-score 로 한다.
+
+- observe(lab): 배경과 가까운 칸(z < Z_UPDATE)만 EMA 로 흡수한다. 이동한 칸이나 손/팔이 가린
+  칸은 z 가 커서 건드리지 않고, 너무 많은 칸이 튀면(MAX_OCCLUDED) 그 프레임은 통째로 버린다.
+  BackgroundFollower 가 FrameGrabber 프레임으로 계속 불러 준다.
+- reset(cells, lab): 확정된 수가 바꾼 칸만 새 값으로 바꾼다 (나머지 칸의 적응 상태는 유지).
+- save(np_path): init_board_values.npy(BGR, 다른 모듈 호환)를 임시 파일 + os.replace 로 한 번에
+  바꾸고, 평균/분산은 옆의 .bg.npz 에 둔다. 다른 곳에서 npy 를 새로 쓰면(/set_init_board 등)
+  다음 get_background_model() 에서 그 npy 로 모델을 다시 만든다.
+
+적응 전(var = SIGMA_INIT^2) 에는 z >= Z_THRESHOLD 가 예전 norms >= 9.0 과 같다.
+감지 쪽에는 normalized_norms() (= z * SIGMA_INIT) 를 넘겨 기존 문턱/점수 단위를 유지한다.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from cv.board_stats import bgr_grid_to_lab
+
+SIGMA_INIT = 3.0        # 적응 전 칸 노이즈 (LAB 거리)
+SIGMA_FLOOR = 2.0       # 분산이 너무 작아져 작은 흔들림에 z 가 폭주하지 않도록
+Z_THRESHOLD = 9.0 / SIGMA_INIT   # 예전 전역 문턱 9.0 에 해당
+Z_UPDATE = 2.5          # 이보다 가까운 칸만 배경으로 흡수
+ALPHA = 0.05            # EMA 비율 (관측 한 번당)
+MAX_OCCLUDED = 6        # 이보다 많은 칸이 Z_THRESHOLD 를 넘으면 그 프레임은 학습하지 않음
+FOLLOW_HZ = 2.0
+
+
+def _sidecar(np_path) -> Path:
+    return Path(np_path).with_suffix(".bg.npz")
+
+
+def _file_key(path) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class BackgroundModel:
+    """칸별 LAB 평균/분산. 모든 메서드는 스레드 안전."""
+
+    def __init__(self, mean_lab: np.ndarray, var: Optional[np.ndarray] = None, *,
+                 alpha: float = ALPHA, z_update: float = Z_UPDATE, sigma_floor: float = SIGMA_FLOOR):
+        self.mean = np.asarray(mean_lab, np.float32).reshape(8, 8, 3).copy()
+        self.var = (np.full((8, 8), SIGMA_INIT ** 2, np.float32) if var is None
+                    else np.asarray(var, np.float32).reshape(8, 8).copy())
+        self.alpha = float(alpha)
+        self.z_update = float(z_update)
+        self.var_floor = float(sigma_floor) ** 2
+        self.key: Optional[tuple] = None        # 이 모델이 마지막으로 쓰거나 읽은 npy 의 (mtime, size)
+        self.updates = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_bgr(cls, board_vals: np.ndarray, **kw) -> "BackgroundModel":
+        return cls(bgr_grid_to_lab(board_vals), **kw)
+
+    # ------------------------------------------------------------------
+    def _deviations(self, lab: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        diff = np.asarray(lab, np.float32) - self.mean
+        detrended = diff - diff.reshape(-1, 3).mean(axis=0)   # 전체 조명 이동 제거
+        return diff, np.linalg.norm(detrended, axis=2)
+
+    def _z(self, norms: np.ndarray) -> np.ndarray:
+        return (norms / np.sqrt(np.maximum(self.var, self.var_floor))).astype(np.float32)
+
+    def z_scores(self, lab: np.ndarray) -> np.ndarray:
+        """칸별 z-score (8, 8)."""
+        with self._lock:
+            _, norms = self._deviations(lab)
+            return self._z(norms)
+
+    def normalized_norms(self, lab: np.ndarray) -> np.ndarray:
+        """z * SIGMA_INIT: 예전 norms 와 같은 단위의 칸 노이즈 정규화 변화량.
+
+        기존 문턱(9.0), move_inference 점수, sequential_detector LLR 을 그대로 쓰면서
+        판정은 칸별 z >= 9.0 / SIGMA_INIT 이 된다.
+        """
+        return self.z_scores(lab) * np.float32(SIGMA_INIT)
+
+    def mean_lab(self) -> np.ndarray:
+        with self._lock:
+            return self.mean.copy()
+
+    def observe(self, lab: np.ndarray) -> int:
+        """배경과 가까운 칸만 EMA 로 흡수하고, 갱신한 칸 수를 돌려준다."""
+        with self._lock:
+            diff, norms = self._deviations(lab)
+            z = self._z(norms)
+            if int(np.count_nonzero(z >= Z_THRESHOLD)) > MAX_OCCLUDED:
+                self.skipped += 1
+                return 0
+            upd = z < self.z_update
+            self.mean[upd] += self.alpha * diff[upd]
+            self.var[upd] += self.alpha * (norms[upd] ** 2 - self.var[upd])
+            self.updates += 1
+            return int(upd.sum())
+
+    def reset(self, cells: Iterable[int], lab: np.ndarray) -> None:
+        """확정된 수가 바꾼 칸(cv 격자 인덱스 i*8+j)만 새 값으로 바꾼다."""
+        idx = np.asarray(sorted(set(int(k) for k in cells)), np.int64)
+        if idx.size == 0:
+            return
+        lab = np.asarray(lab, np.float32).reshape(64, 3)
+        with self._lock:
+            self.mean.reshape(64, 3)[idx] = lab[idx]
+
+    def baseline_bgr(self) -> np.ndarray:
+        """기존 init_board_values.npy 형식 (8, 8, 3) BGR float32."""
+        with self._lock:
+            lab8 = np.clip(np.rint(self.mean), 0, 255).astype(np.uint8)
+        return cv2.cvtColor(lab8, cv2.COLOR_LAB2BGR).astype(np.float32)
+
+    # ------------------------------------------------------------------
+    def save(self, np_path) -> np.ndarray:
+        """npy(BGR) 를 원자적으로 바꾸고 평균/분산을 .bg.npz 에 저장. 저장한 BGR 기준을 반환."""
+        np_path = Path(np_path)
+        board_vals = self.baseline_bgr()
+        tmp = np_path.with_name(np_path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, board_vals)
+        os.replace(tmp, np_path)
+        self.key = _file_key(np_path)
+        with self._lock:
+            mean, var = self.mean.copy(), self.var.copy()
+        side = _sidecar(np_path)
+        tmp = side.with_name(side.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, mean=mean, var=var, key=np.asarray(self.key, np.int64))
+        os.replace(tmp, side)
+        return board_vals
+
+    @classmethod
+    def load(cls, np_path) -> Optional["BackgroundModel"]:
+        """npy 가 .bg.npz 를 쓴 뒤 그대로면 적응 상태까지, 아니면 npy 로 새로 만든다."""
+        key = _file_key(np_path)
+        if key is None:
+            return None
+        try:
+            with np.load(_sidecar(np_path)) as z:
+                if tuple(int(v) for v in z["key"]) == key:
+                    model = cls(z["mean"], z["var"])
+                    model.key = key
+                    return model
+        except (OSError, KeyError, ValueError):
+            pass
+        try:
+            model = cls.from_bgr(np.load(np_path))
+        except Exception as e:
+            print(f"[background_model] failed to load {np_path}: {e}")
+            return None
+        model.key = key
+        return model
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            sigma = np.sqrt(np.maximum(self.var, self.var_floor))
+            return {"updates": self.updates, "skipped": self.skipped,
+                    "sigma_min": round(float(sigma.min()), 2), "sigma_max": round(float(sigma.max()), 2)}
+
+
+_models: Dict[str, BackgroundModel] = {}
+_models_lock = threading.Lock()
+
+
+def get_background_model(np_path) -> Optional[BackgroundModel]:
+    """np_path 별 공유 모델. npy 가 밖에서 바뀌었으면 다시 만든다 (없으면 None)."""
+    path = str(Path(np_path).resolve())
+    key = _file_key(path)
+    with _models_lock:
+        model = _models.get(path)
+        if model is not None and model.key == key:
+            return model
+        model = BackgroundModel.load(path)
+        if model is None:
+            _models.pop(path, None)
+        else:
+            _models[path] = model
+        return model
+
+
+class BackgroundFollower:
+    """FrameGrabber 최신 프레임으로 배경 모델을 hz 속도로 계속 갱신하는 데몬 스레드."""
+
+    def __init__(self, cap, np_path, hz: float = FOLLOW_HZ):
+        self._cap = cap
+        self._np_path = np_path
+        self.interval = 1.0 / hz if hz > 0 else 1.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._means = np.empty((8, 8, 3), np.float32)
+
+    @property
+    def cap(self):
+        return self._cap
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="background-follower", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        from cv.cv_manager import frame_lab_means
+
+        seq = 0
+        while not self._stop.wait(self.interval):
+            model = get_background_model(self._np_path)
+            if model is None:
+                continue
+            grabbed = self._cap.wait_next(seq or None, timeout=1.0)
+            if grabbed is None:
+                continue
+            seq = grabbed.seq
+            try:
+                model.observe(frame_lab_means(grabbed.frame, out=self._means))
+            except Exception as e:
+                print(f"[background_model] observe error: {e}")
+                time.sleep(1.0)
+
+
+_followers: Dict[str, BackgroundFollower] = {}
+
+
+def start_background_follower(cap, np_path, hz: float = FOLLOW_HZ) -> BackgroundFollower:
+    """np_path 당 하나의 follower 를 띄운다 (이미 같은 cap 으로 돌고 있으면 그대로 반환)."""
+    path = str(Path(np_path).resolve())
+    with _models_lock:
+        follower = _followers.get(path)
+        if follower is not None and follower.cap is cap:
+            follower.start()
+            return follower
+        if follower is not None:
+            follower.stop()
+        follower = BackgroundFollower(cap, path, hz)
+        _followers[path] = follower
+    follower.start()
+    return follower
+
+
+__all__ = [
+    'SIGMA_INIT',
+    'Z_THRESHOLD',
+    'BackgroundModel',
+    'get_background_model',
+    'BackgroundFollower',
+    'start_background_follower',
+]
@@ -0,0 +1,151 @@
+"""보드 변화 푸시 채널 (Server-Sent Events).
+
+예전 index 페이지는 1초마다 /snapshot_board 를 불러 요청마다 프레임 4장 캡처/와핑/LAB
+변환/80ms sleep/np.load/JPEG 인코딩을 했다. BoardMonitor 는 스레드 하나가 새 프레임마다
+(최대 max_hz) 칸별 LAB 평균을 한 번 계산해 기준과의 차이 64개, 상위 k 칸, 턴 상태를
+작은 JSON 으로 만들고, /events 에 붙은 모든 브라우저가 같은 결과를 받는다.
+히트맵은 브라우저가 캔버스에 직접 그린다.
+
+- 구독자가 없으면 계산 스레드는 멈춘다 (첫 구독자가 붙을 때 시작).
+- 기준은 background_model 의 칸별 모델이고(npy 가 바뀌면 다시 만든다), 히트맵 값은
+  칸 노이즈로 정규화한 변화량이라 문턱이 턴 판정과 같은 칸별 z 문턱이 된다.
+- 느린 클라이언트는 최신 이벤트만 받는다 (StreamHub 와 같은 최신 슬롯 방식).
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+from cv import cv_manager
+from cv.background_model import get_background_model
+
+MAX_HZ = 5.0            # 이벤트 최대 발행 빈도
+TOP_K = 2
+THRESHOLD = 9.0         # process_turn_transition 기본 문턱과 동일
+HEARTBEAT_SEC = 15.0    # 이벤트가 없을 때 연결 유지용 주석 전송 간격
+
+
+class BoardMonitor:
+    """FrameGrabber 의 새 프레임마다 칸 차이를 계산해 SSE 구독자에게 발행한다."""
+
+    def __init__(self, cap, np_path, state: Dict[str, Any], *, max_hz: float = MAX_HZ,
+                 top_k: int = TOP_K, threshold: float = THRESHOLD):
+        self._cap = cap
+        self._np_path = Path(np_path)
+        self._state = state
+        self.min_interval = 1.0 / max_hz if max_hz > 0 else 0.0
+        self.top_k = int(top_k)
+        self.threshold = float(threshold)
+
+        self._cond = threading.Condition()
+        self._event: Optional[str] = None
+        self._seq = 0
+        self._subscribers = 0
+        self._thread: Optional[threading.Thread] = None
+
+        self._means = np.empty((8, 8, 3), np.float32)
+        self._compute_lock = threading.Lock()   # 모니터 스레드와 notify() 가 버퍼를 공유
+        self.compute_ms = 0.0
+
+    # ------------------------------------------------------------------
+    def compute(self, frame: np.ndarray, seq: int = 0) -> Dict[str, Any]:
+        """프레임 한 장 → 이벤트 dict (norms 64개, 상위 k 칸, 턴 상태)."""
+        with self._compute_lock:
+            return self._compute(frame, seq)
+
+    def _compute(self, frame: np.ndarray, seq: int) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        curr = cv_manager.frame_lab_means(frame, out=self._means)
+        model = get_background_model(self._np_path)
+        event: Dict[str, Any] = {
+            "seq": int(seq),
+            "has_baseline": model is not None,
+            "threshold": self.threshold,
+            "turn": {
+                "current": self._state.get("turn_color"),
+                "previous": self._state.get("prev_turn_color"),
+                "moves": len(self._state.get("move_history", [])),
+                "last_move": (self._state.get("move_history") or [None])[-1],
+            },
+            "job": self._state.get("job"),
+        }
+        if model is not None:
+            flat = model.normalized_norms(curr).reshape(-1)
+            order = np.argsort(-flat)[:self.top_k]
+            event["norms"] = np.round(flat.astype(np.float64), 1).tolist()
+            event["max"] = round(float(flat.max()), 1)
+            event["top"] = [[int(k) // 8, int(k) % 8, round(float(flat[k]), 1)] for k in order]
+        self.compute_ms = (time.perf_counter() - t0) * 1000.0
+        return event
+
+    def _publish(self, event: Dict[str, Any]) -> None:
+        data = json.dumps(event, separators=(",", ":"), ensure_ascii=False)
+        with self._cond:
+            self._event = data
+            self._seq += 1
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        last_seq = 0
+        last_t = 0.0
+        while True:
+            with self._cond:
+                if self._subscribers == 0:
+                    self._thread = None
+                    return
+            grabbed = self._cap.wait_next(last_seq, timeout=1.0)
+            if grabbed is None:
+                continue
+            last_seq = grabbed.seq
+            now = time.monotonic()
+            if now - last_t < self.min_interval:
+                continue
+            last_t = now
+            try:
+                self._publish(self.compute(grabbed.frame, grabbed.seq))
+            except Exception as e:
+                print(f"[board_monitor] compute error: {e}")
+                time.sleep(0.5)
+
+    def notify(self) -> None:
+        """턴 전환/기준 저장 직후 호출하면 다음 프레임을 기다리지 않고 턴 상태를 보낸다."""
+        with self._cond:
+            active = self._subscribers > 0
+        if active:
+            grabbed = self._cap.latest(timeout=0.5)
+            if grabbed is not None:
+                self._publish(self.compute(grabbed.frame, grabbed.seq))
+
+    # ------------------------------------------------------------------
+    def events(self) -> Iterator[str]:
+        """SSE 본문 제너레이터. 클라이언트가 끊기면 구독을 해제한다."""
+        with self._cond:
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="board-monitor", daemon=True)
+                self._thread.start()
+            last = self._seq
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq > last, HEARTBEAT_SEC)
+                    if self._seq <= last:
+                        data = None
+                    else:
+                        data, last = self._event, self._seq
+                yield f"data: {data}\n\n" if data is not None else ": ping\n\n"
+        finally:
+            with self._cond:
+                self._subscribers = max(0, self._subscribers - 1)
+
+
+__all__ = [
+    'BoardMonitor',
+]
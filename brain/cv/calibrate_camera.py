@@ -0,0 +1,137 @@
+"""카메라 내부 파라미터(렌즈 왜곡) 오프라인 보정 도구.
+
+체커보드 사진이 든 디렉터리를 읽어 cv2.calibrateCamera 로 K, dist 를 구하고
+npz 로 저장한다. 저장된 파일은 cv_manager 가 시작할 때 읽어 와핑 remap 테이블에
+왜곡 보정을 함께 넣는다(프레임당 추가 비용 없음).
+
+사용 예 (brain 디렉터리에서):
+    python -m cv.calibrate_camera ./calib_images --pattern 9x6 --square 25
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+CAMERA_INTRINSICS_PATH = BASE_DIR / "camera_intrinsics.npz"
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+
+
+def _parse_pattern(text: str) -> Tuple[int, int]:
+    cols, rows = text.lower().split("x")
+    return int(cols), int(rows)
+
+
+def calibrate_from_directory(image_dir: str,
+                             pattern_size: Tuple[int, int] = (9, 6),
+                             square_size: float = 1.0,
+                             min_views: int = 5) -> Dict[str, np.ndarray]:
+    """디렉터리의 체커보드 이미지로 카메라를 보정한다.
+
+    pattern_size: 체커보드 내부 코너 수 (cols, rows)
+    square_size: 칸 한 변 길이 (단위는 자유, 내부 파라미터에는 영향 없음)
+    반환: {"K", "dist", "image_size"(w, h), "rms", "n_views"}
+    """
+    paths = []
+    for pat in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(image_dir, pat)))
+    paths.sort()
+    if not paths:
+        raise FileNotFoundError(f"no calibration images in {image_dir}")
+
+    cols, rows = pattern_size
+    objp = np.zeros((cols * rows, 3), np.float32)
+    objp[:, :2] = np.mgrid[0:cols, 0:rows].T.reshape(-1, 2) * float(square_size)
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 1e-3)
+
+    obj_points, img_points = [], []
+    image_size: Optional[Tuple[int, int]] = None
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"[calibrate] skip (unreadable): {path}")
+            continue
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        size = (gray.shape[1], gray.shape[0])
+        if image_size is None:
+            image_size = size
+        elif size != image_size:
+            print(f"[calibrate] skip (size {size} != {image_size}): {path}")
+            continue
+        found, corners = cv2.findChessboardCorners(gray, pattern_size, None)
+        if not found:
+            print(f"[calibrate] pattern not found: {path}")
+            continue
+        corners = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria)
+        obj_points.append(objp)
+        img_points.append(corners)
+        print(f"[calibrate] ok: {path}")
+
+    if len(img_points) < min_views:
+        raise RuntimeError(f"only {len(img_points)} usable views (need >= {min_views})")
+
+    rms, K, dist, _, _ = cv2.calibrateCamera(obj_points, img_points, image_size, None, None)
+    print(f"[calibrate] views={len(img_points)} rms reprojection error={rms:.4f}px")
+    return {
+        "K": K,
+        "dist": dist.reshape(-1),
+        "image_size": np.array(image_size, dtype=np.int32),
+        "rms": np.float64(rms),
+        "n_views": np.int32(len(img_points)),
+    }
+
+
+def save_intrinsics(calib: Dict[str, np.ndarray], path=CAMERA_INTRINSICS_PATH) -> None:
+    np.savez(str(path), **calib)
+    print(f"[calibrate] intrinsics saved to {path}")
+
+
+def load_intrinsics(path=CAMERA_INTRINSICS_PATH) -> Optional[Dict[str, np.ndarray]]:
+    """저장된 내부 파라미터를 읽는다. 파일이 없거나 깨졌으면 None."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with np.load(str(path)) as data:
+            return {
+                "K": np.asarray(data["K"], dtype=np.float64).reshape(3, 3),
+                "dist": np.asarray(data["dist"], dtype=np.float64).reshape(-1),
+                "image_size": tuple(int(v) for v in data["image_size"]),
+            }
+    except Exception as e:
+        print(f"[calibrate] failed to load intrinsics {path}: {e}")
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="체커보드 이미지로 카메라 내부 파라미터 보정")
+    parser.add_argument("image_dir", help="체커보드 이미지 디렉터리")
+    parser.add_argument("--pattern", default="9x6", help="내부 코너 수 COLSxROWS (기본 9x6)")
+    parser.add_argument("--square", type=float, default=1.0, help="칸 한 변 길이")
+    parser.add_argument("--out", default=str(CAMERA_INTRINSICS_PATH), help="저장 경로(npz)")
+    args = parser.parse_args(argv)
+
+    calib = calibrate_from_directory(args.image_dir, _parse_pattern(args.pattern), args.square)
+    save_intrinsics(calib, args.out)
+    print(f"K=\n{calib['K']}\ndist={calib['dist']}")
+    return 0
+
+
+__all__ = [
+    'CAMERA_INTRINSICS_PATH',
+    'calibrate_from_directory',
+    'save_intrinsics',
+    'load_intrinsics',
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,292 @@
+"""픽셀 단위 변화 분할 + 연결 요소로 칸별 변화 면적을 구하는 이동 증거.
+
+칸 평균(cell_means) 변화량은 칸 안의 픽셀을 모두 섞는다. 기물을 칸 가장자리로 밀어 두면
+변화가 두 칸에 반씩 나뉘어 둘 다 문턱 아래로 내려가고, 키 큰 기물의 그림자가 이웃 칸 평균을
+끌어내리면 그 칸이 바뀐 것처럼 보인다.
+
+ChangeSegmenter 는 기준 와프(감지 해상도, 칸당 8 px) 한 장을 LAB 로 들고 있다가
+
+    diff  = |curr - ref - (전체 평균 이동)|  (채널 L1, 조명 변화 제거)
+    mask  = diff > PIXEL_THRESHOLD
+    connectedComponentsWithStats(mask)      → 작은 얼룩(노이즈) 제거,
+                                              판 가장자리에 닿는 큰 얼룩(손/팔)은 가림으로 표시
+    area  = bincount(cell_map[kept], 64)    → 칸별 변화 면적 비율
+
+을 OpenCV 호출 몇 번과 bincount 하나로 계산한다 (칸 64개를 파이썬으로 자르지 않는다).
+cell_map 은 와프 크기별로 한 번 만들어 두는 픽셀 → 칸(i*8+j) 인덱스 표다.
+
+면적 비율은 norms(fraction) 으로 기존 변화량 단위(FRACTION_AT_THRESHOLD 면적이 threshold)로
+바꿔 move_inference 의 합법 수 점수(E @ (norms - tau))에 그대로 넣는다. 살짝 밀린 기물도
+도착 칸 면적이 충분하면 잡히고, 그림자 한 줄은 이웃 칸 면적이 작아 문턱을 넘지 않는다.
+
+기준 와프는 init_board_values.npy 옆 .ref.npz 에 npy 의 (mtime, size) 와 함께 저장한다.
+다른 곳에서 npy 를 새로 쓰면 키가 달라져 get_change_segmenter() 가 None 을 돌려주고,
+감지는 칸 평균 증거로 돌아간다 (다음 턴이 끝나면 그 와프로 다시 만든다).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from cv.background_model import _file_key
+
+PIXEL_THRESHOLD = 24.0       # 픽셀 LAB L1 거리 (조명 이동 제거 후)
+MIN_BLOB_AREA = 3            # 이보다 작은 연결 요소는 노이즈
+OCCLUDER_SQUARES = 6.0       # 판 가장자리에 닿고 이 칸 수 이상 면적이면 손/팔로 본다
+FRACTION_AT_THRESHOLD = 0.2  # 칸 면적의 이 비율이 바뀌면 기존 문턱(threshold)과 같은 증거
+MAX_EVIDENCE = 3.0           # 한 칸 증거 상한 (threshold 배수) — 큰 얼룩 하나가 점수를 독차지하지 않도록
+
+_cell_maps: Dict[tuple, tuple] = {}
+
+
+def cell_map(shape) -> tuple:
+    """(H, W) 와프의 픽셀 → 칸 인덱스 표와 칸별 픽셀 수 (크기별 캐시)."""
+    h, w = int(shape[0]), int(shape[1])
+    cached = _cell_maps.get((h, w))
+    if cached is None:
+        rows = (np.arange(h) * 8) // h
+        cols = (np.arange(w) * 8) // w
+        idx = (rows[:, None] * 8 + cols[None, :]).astype(np.int32)
+        cached = (idx, np.bincount(idx.ravel(), minlength=64).astype(np.float32))
+        _cell_maps[(h, w)] = cached
+    return cached
+
+
+class Segmentation(NamedTuple):
+    fraction: np.ndarray     # (8, 8) 칸별 변화 면적 비율 (가림 얼룩 제외)
+    mask: np.ndarray         # (H, W) uint8, 남긴 얼룩 픽셀 = 255
+    blobs: int               # 남긴 연결 요소 수
+    occluded: bool           # 가장자리에 닿는 큰 얼룩(손/팔)이 있었는지
+    elapsed: float           # 초
+
+    def norms(self, threshold: float = 9.0) -> np.ndarray:
+        """move_inference 점수에 넣을 칸별 증거 (8, 8), 기존 변화량과 같은 단위."""
+        scale = np.float32(threshold / FRACTION_AT_THRESHOLD)
+        return np.minimum(self.fraction * scale, np.float32(threshold * MAX_EVIDENCE))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "blobs": self.blobs,
+            "occluded": self.occluded,
+            "changed": int(np.count_nonzero(self.fraction >= FRACTION_AT_THRESHOLD)),
+            "elapsed_ms": round(self.elapsed * 1e3, 2),
+        }
+
+
+class ChangeSegmenter:
+    """기준 와프 대비 픽셀 변화 마스크를 칸별 면적으로 모은다. 모든 메서드는 스레드 안전."""
+
+    def __init__(self, ref_bgr: np.ndarray, *, pixel_threshold: float = PIXEL_THRESHOLD,
+                 min_blob_area: int = MIN_BLOB_AREA, occluder_squares: float = OCCLUDER_SQUARES):
+        self.ref = np.ascontiguousarray(ref_bgr, np.uint8).copy()
+        self.pixel_threshold = float(pixel_threshold)
+        self.min_blob_area = int(min_blob_area)
+        self.occluder_squares = float(occluder_squares)
+        self.key: Optional[tuple] = None        # 이 기준이 맞춰진 npy 의 (mtime, size)
+        self._lock = threading.Lock()
+        self._ref_lab = cv2.cvtColor(self.ref, cv2.COLOR_BGR2LAB).astype(np.float32)
+        self._ref_mean = np.asarray(cv2.mean(self._ref_lab)[:3], np.float32)
+        self._ones = np.ones((1, 3), np.float32)
+
+    @property
+    def shape(self):
+        return self.ref.shape[:2]
+
+    def _fit(self, warp: np.ndarray) -> np.ndarray:
+        if warp.shape[:2] != self.ref.shape[:2]:
+            warp = cv2.resize(warp, (self.ref.shape[1], self.ref.shape[0]), interpolation=cv2.INTER_AREA)
+        return warp
+
+    def segment(self, warp: np.ndarray) -> Segmentation:
+        """현재 와프(BGR, 크기가 다르면 기준 크기로 줄임)의 칸별 변화 면적."""
+        t0 = time.perf_counter()
+        lab = cv2.cvtColor(self._fit(warp), cv2.COLOR_BGR2LAB).astype(np.float32)
+        with self._lock:
+            shift = np.asarray(cv2.mean(lab)[:3], np.float32) - self._ref_mean
+            diff = cv2.absdiff(lab, self._ref_lab + shift)
+        dist = cv2.transform(diff, self._ones)
+        _, mask = cv2.threshold(dist, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        n, labels, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+
+        h, w = labels.shape
+        idx, per_cell = cell_map((h, w))
+        area = stats[:, cv2.CC_STAT_AREA]
+        x, y = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+        touches = (x == 0) | (y == 0) | (x + stats[:, cv2.CC_STAT_WIDTH] == w) | (y + stats[:, cv2.CC_STAT_HEIGHT] == h)
+        occluder = touches & (area >= self.occluder_squares * h * w / 64.0)
+        keep = (area >= self.min_blob_area) & ~occluder
+        keep[0] = False
+        occluder[0] = False
+
+        kept = keep[labels]
+        fraction = np.bincount(idx.ravel(), weights=kept.ravel(), minlength=64).astype(np.float32) / per_cell
+        return Segmentation(fraction.reshape(8, 8), kept.astype(np.uint8) * 255, int(keep.sum()),
+                            bool(occluder.any()), time.perf_counter() - t0)
+
+    def reset(self, cells: Iterable[int], warp: np.ndarray) -> None:
+        """확정된 수가 바꾼 칸(i*8+j)의 픽셀만 현재 와프로 바꾼다."""
+        cells = np.asarray(sorted(set(int(k) for k in cells)), np.int32)
+        if cells.size == 0:
+            return
+        warp = self._fit(warp)
+        idx, _ = cell_map(self.ref.shape)
+        sel = np.isin(idx, cells)
+        with self._lock:
+            self.ref[sel] = warp[sel]
+            self._ref_lab = cv2.cvtColor(self.ref, cv2.COLOR_BGR2LAB).astype(np.float32)
+            self._ref_mean = np.asarray(cv2.mean(self._ref_lab)[:3], np.float32)
+
+    # ------------------------------------------------------------------
+    def save(self, np_path) -> None:
+        """기준 와프를 np_path 의 현재 키와 함께 .ref.npz 에 원자적으로 저장."""
+        self.key = _file_key(np_path)
+        side = _sidecar(np_path)
+        tmp = side.with_name(side.name + ".tmp")
+        with self._lock:
+            ref = self.ref.copy()
+        with open(tmp, "wb") as f:
+            np.savez(f, ref=ref, key=np.asarray(self.key or (0, 0), np.int64))
+        os.replace(tmp, side)
+
+    @classmethod
+    def load(cls, np_path) -> Optional["ChangeSegmenter"]:
+        """.ref.npz 가 지금 npy 와 같은 키로 저장됐을 때만 불러온다."""
+        key = _file_key(np_path)
+        if key is None:
+            return None
+        try:
+            with np.load(_sidecar(np_path)) as z:
+                if tuple(int(v) for v in z["key"]) != key:
+                    return None
+                seg = cls(z["ref"])
+        except (OSError, KeyError, ValueError):
+            return None
+        seg.key = key
+        return seg
+
+
+def _sidecar(np_path) -> Path:
+    return Path(np_path).with_suffix(".ref.npz")
+
+
+_segmenters: Dict[str, ChangeSegmenter] = {}
+_segmenters_lock = threading.Lock()
+
+
+def get_change_segmenter(np_path) -> Optional[ChangeSegmenter]:
+    """np_path 별 공유 분할기. 기준 와프가 없거나 npy 보다 오래됐으면 None."""
+    path = str(Path(np_path).resolve())
+    key = _file_key(path)
+    with _segmenters_lock:
+        seg = _segmenters.get(path)
+        if seg is not None and seg.key == key:
+            return seg
+        seg = ChangeSegmenter.load(path)
+        if seg is None:
+            _segmenters.pop(path, None)
+        else:
+            _segmenters[path] = seg
+        return seg
+
+
+def save_reference_warp(np_path, warp: np.ndarray) -> ChangeSegmenter:
+    """npy 를 새로 쓴 직후 호출해 와프 전체로 기준을 잡는다 (초기 기준 저장, 기준이 없던 턴)."""
+    seg = ChangeSegmenter(warp)
+    seg.save(np_path)
+    with _segmenters_lock:
+        _segmenters[str(Path(np_path).resolve())] = seg
+    return seg
+
+
+def _render_board(board, size: int, rng, offsets: Optional[Dict[int, tuple]] = None,
+                  shadows: Iterable[int] = ()) -> np.ndarray:
+    """합성 위에서 본 판: 칸 색 + 원 모양 기물(offsets 로 칸 안에서 밀기) + 기물 그림자."""
+    sq = size / 8.0
+    img = np.empty((size, size, 3), np.uint8)
+    idx, _ = cell_map((size, size))
+    img[((idx // 8 + idx % 8) % 2) == 0] = (180, 200, 215)
+    img[((idx // 8 + idx % 8) % 2) == 1] = (70, 110, 140)
+    offsets = offsets or {}
+    for square, piece in board.piece_map().items():
+        k = (7 - square // 8) * 8 + square % 8
+        dy, dx = offsets.get(square, (0.0, 0.0))
+        cy, cx = (k // 8 + 0.5 + dy) * sq, (k % 8 + 0.5 + dx) * sq
+        if square in shadows:
+            # 키 큰 기물 그림자: 위쪽(먼 랭크) 이웃 칸으로 길게 드리운다
+            cv2.ellipse(img, (int(cx), int(cy - 0.6 * sq)), (int(0.25 * sq), int(0.55 * sq)), 0, 0, 360,
+                        (40, 60, 75), -1)
+        color = (225, 230, 235) if piece.color else (35, 35, 40)
+        cv2.circle(img, (int(cx), int(cy)), int(0.33 * sq), color, -1)
+    noise = rng.normal(0, 4.0, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def benchmark_segmentation(trials: int = 200, size: int = 64, seed: int = 0) -> Dict[str, Any]:
+    """합성 판에서 '가장자리로 밀린 기물 + 이웃 칸 그림자' 수를 칸 평균 증거와 분할 증거로 맞혀 본다."""
+    import chess
+
+    from cv.board_stats import cell_means
+    from cv.move_inference import estimate_from_table, move_table
+
+    rng = np.random.default_rng(seed)
+    fens = [
+        chess.STARTING_FEN,
+        "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP2BPPP/R2QKB1R w KQ - 0 8",
+        "r3k2r/pppq1ppp/2n2n2/3pp3/3PP3/2N2N2/PPPQ1PPP/R3K2R b KQkq - 0 1",
+    ]
+    correct = {"cells": 0, "segmentation": 0}
+    seg_times = []
+    for t in range(trials):
+        board = chess.Board(fens[t % len(fens)])
+        table = move_table(board)
+        r = int(rng.integers(len(table.moves)))
+        move = table.moves[r]
+        before = _render_board(board, 400, rng)
+        after_board = board.copy(stack=False)
+        after_board.push(move)
+        # 도착 기물을 칸 가장자리 쪽으로 밀고, 그림자를 이웃 칸에 드리운다
+        off = tuple(rng.uniform(-0.3, 0.3, 2))
+        after = _render_board(after_board, 400, rng, {move.to_square: off}, shadows=(move.to_square,))
+        ref = cv2.resize(before, (size, size), interpolation=cv2.INTER_AREA)
+        cur = cv2.resize(after, (size, size), interpolation=cv2.INTER_AREA)
+
+        prev_lab = cell_means(cv2.cvtColor(ref, cv2.COLOR_BGR2LAB).astype(np.float32))
+        curr_lab = cell_means(cv2.cvtColor(cur, cv2.COLOR_BGR2LAB).astype(np.float32))
+        deltas = curr_lab - prev_lab
+        deltas -= deltas.reshape(-1, 3).mean(axis=0)
+        est = estimate_from_table(table, np.linalg.norm(deltas, axis=2))
+        correct["cells"] += int(est is not None and est.move == move)
+
+        seg = ChangeSegmenter(ref).segment(cur)
+        seg_times.append(seg.elapsed)
+        est = estimate_from_table(table, seg.norms())
+        correct["segmentation"] += int(est is not None and est.move == move)
+
+    out = {k: round(v / trials, 3) for k, v in correct.items()}
+    out["segment_ms"] = round(float(np.median(seg_times)) * 1e3, 3)
+    print(f"[change_segmentation] accuracy cells={out['cells']:.3f} segmentation={out['segmentation']:.3f}, "
+          f"segment {out['segment_ms']:.2f} ms ({size}px)")
+    return out
+
+
+__all__ = [
+    'PIXEL_THRESHOLD',
+    'FRACTION_AT_THRESHOLD',
+    'cell_map',
+    'Segmentation',
+    'ChangeSegmenter',
+    'get_change_segmenter',
+    'save_reference_warp',
+    'benchmark_segmentation',
+]
+
+
+if __name__ == "__main__":
+    benchmark_segmentation()
@@ -8,9 +8,21 @@ import chess
 from game import game_state
 from cv.cv_manager import (
     coord_to_chess_notation,
+    dump_flight_record,
     process_turn_transition,
+    refresh_baseline_squares,
     save_initial_board_from_capture,
+    warp_with_manual_corners,
 )
+from cv.background_model import start_background_follower
+from cv.move_inference import changed_cells, pieces_after_move
+from cv.occupancy import OccupancyModel, board_occupancy, pieces_occupancy, resync_move
+from cv.motion_monitor import SETTLE_TIMEOUT, MotionMonitor, SettleResult
+
+_motion_monitor: Optional[MotionMonitor] = None
+
+RESYNC_MIN_GAP = 1.0     # 점유 재동기화: 1등과 2등 후보의 (confidence 가중) 불일치 차 최소값
+RESYNC_MAX_MISMATCH = 2  # 1등 후보도 이보다 많은 칸이 다르면 믿지 않음
 
 
 def default_chess_pieces() -> list[list[str]]:
@@ -39,6 +51,20 @@ def load_chess_pieces() -> list[list[str]]:
     return default_chess_pieces()
 
 
+def wait_for_board_settle(timeout: float = SETTLE_TIMEOUT) -> Optional[SettleResult]:
+    """손이 판에서 빠지고 화면이 멈출 때까지 대기 (최대 timeout 초)."""
+    global _motion_monitor
+    cap = game_state.cv_capture_wrapper
+    if cap is None:
+        return None
+    if _motion_monitor is None or _motion_monitor.cap is not cap:
+        _motion_monitor = MotionMonitor(cap, game_state.BOARD_VALUES_PATH)
+    result = _motion_monitor.wait_settled(timeout)
+    print(f"[CV] 보드 안정 판정: settled={result.settled} {result.waited:.2f}s "
+          f"frames={result.frames} changed={result.changed}")
+    return result
+
+
 def detect_move_via_cv() -> Optional[chess.Move]:
     """CV로 기물 변화를 감지하여 체스 이동을 반환."""
     if game_state.cv_capture_wrapper is None:
@@ -55,11 +81,28 @@ def detect_move_via_cv() -> Optional[chess.Move]:
             str(game_state.CHESS_PIECES_PATH),
             game_state.chess_pieces_state,
             game_state.cv_turn_color,
+            board=game_state.current_board,
         )
     except Exception as exc:
         print(f"[CV] 턴 전환 처리 실패: {exc}")
+        dump_flight_record("turn transition error", error=str(exc))
         return None
 
+    if not result.get("committed", True):
+        # 움직임 없음/모호한 판정은 확정하지 않았다. 모호하면 점유 분류가 확인해 줄 때만 그 수로 간다.
+        print(f"[CV] {result['reason']}: 후보 {result['candidate']} score={result['score']:.1f} "
+              f"margin={result['margin']:.1f} ranked={result['ranked']}")
+        if result["score"] <= 0:
+            return None
+        move = resync_via_occupancy()
+        if move is None:
+            return None
+        if move.uci() != result["candidate"]:
+            print(f"[CV] 점유 분류로 수정: {result['candidate']} -> {move.uci()}")
+        _apply_corrected_move(move)
+        game_state.cv_turn_color = "black" if game_state.cv_turn_color == "white" else "white"
+        return move
+
     game_state.cv_turn_color = result["turn_color"]
     game_state.init_board_values = result["init_board_values"]
     game_state.chess_pieces_state = result["chess_pieces"]
@@ -70,26 +113,122 @@ def detect_move_via_cv() -> Optional[chess.Move]:
     if move_str:
         print(f"[CV] 감지된 이동: {move_str}")
 
+    if result.get("move"):
+        # 합법 수 전체를 점수 매긴 결과 (move_inference)
+        print(f"[CV] 추론: {result['move']} margin={result['margin']:.1f} "
+              f"confidence={result['confidence']:.2f} frames={result.get('frames_used', 1)}")
+        return chess.Move.from_uci(result["move"])
+
     if src is None or dst is None:
         return None
 
     move = _resolve_move_from_coords(tuple(src), tuple(dst))
     if move is None:
         print(f"[CV] 합법적인 이동을 찾지 못했습니다: src={src}, dst={dst}")
+        dump_flight_record("no legal move", src=list(src), dst=list(dst),
+                           fen=game_state.current_board.fen())
+        move = resync_via_occupancy()
+        if move is not None:
+            _apply_corrected_move(move)
     return move
 
 
+def _load_occupancy_model() -> Optional[OccupancyModel]:
+    if game_state.occupancy_model is None and game_state.OCCUPANCY_MODEL_PATH.exists():
+        game_state.occupancy_model = OccupancyModel.load(game_state.OCCUPANCY_MODEL_PATH)
+    return game_state.occupancy_model
+
+
+def read_occupancy():
+    """지금 프레임 한 장의 칸 점유 예측 (모델이나 프레임이 없으면 None)."""
+    model = _load_occupancy_model()
+    if model is None or game_state.cv_capture_wrapper is None:
+        return None
+    ret, frame = game_state.cv_capture_wrapper.read()
+    if not ret or frame is None:
+        return None
+    return model.predict(warp_with_manual_corners(frame, size=400))
+
+
+def verify_board_state(pred=None) -> Optional[dict]:
+    """점유 예측을 current_board / chess_pieces_state 와 비교한 불일치 칸 목록."""
+    pred = pred if pred is not None else read_occupancy()
+    if pred is None:
+        return None
+    report = {"board": pred.mismatches(board_occupancy(game_state.current_board))}
+    if game_state.chess_pieces_state is not None:
+        report["pieces"] = pred.mismatches(pieces_occupancy(game_state.chess_pieces_state))
+    return report
+
+
+def resync_via_occupancy(depth: int = 1) -> Optional[chess.Move]:
+    """프레임 한 장의 점유 예측과 가장 잘 맞는 다음 수 (확신이 없으면 None)."""
+    pred = read_occupancy()
+    if pred is None:
+        return None
+    res = resync_move(game_state.current_board, pred, depth=depth)
+    line = " ".join(m.uci() for m in res.moves) or "(변화 없음)"
+    print(f"[CV] 점유 재동기화: {line} mismatches={res.mismatches} "
+          f"cost={res.cost:.2f} runner_up={res.runner_up:.2f}")
+    if (len(res.moves) != 1 or res.mismatches > RESYNC_MAX_MISMATCH
+            or res.runner_up - res.cost < RESYNC_MIN_GAP):
+        dump_flight_record("occupancy resync rejected", line=line, mismatches=res.mismatches,
+                           cost=res.cost, runner_up=res.runner_up, fen=game_state.current_board.fen(),
+                           report=verify_board_state(pred))
+        return None
+    return res.moves[0]
+
+
+def _apply_corrected_move(move: chess.Move) -> None:
+    """점유 분류로 고른 수에 맞춰 기물 배열과 그 수가 바꾼 칸의 기준을 다시 잡는다."""
+    board = game_state.current_board
+    game_state.chess_pieces_state = pieces_after_move(board, move)
+    try:
+        with open(game_state.CHESS_PIECES_PATH, "wb") as file:
+            pickle.dump(game_state.chess_pieces_state, file)
+    except Exception as exc:
+        print(f"[CV] 기물 배열 저장 실패: {exc}")
+    board_vals = refresh_baseline_squares(
+        game_state.cv_capture_wrapper, str(game_state.BOARD_VALUES_PATH), changed_cells(board, move)
+    )
+    if board_vals is not None:
+        game_state.init_board_values = board_vals
+
+
+def refresh_baseline_for_move(move: chess.Move) -> None:
+    """로봇이 둔 수의 칸만 기준을 다시 잡는다 (current_board 에 push 하기 전에 호출)."""
+    if game_state.cv_capture_wrapper is None:
+        return
+    cells = changed_cells(game_state.current_board, move)
+    wait_for_board_settle(timeout=3.0)
+    board_vals = refresh_baseline_squares(
+        game_state.cv_capture_wrapper, str(game_state.BOARD_VALUES_PATH), cells
+    )
+    if board_vals is not None:
+        game_state.init_board_values = board_vals
+        print(f"[CV] 로봇 이동 {move.uci()} 칸 기준 갱신 ({len(cells)}칸)")
+
+
 def initialize_board_reference() -> Optional[Any]:
     """초기 캡처에서 체스판 기준값을 저장."""
     if game_state.cv_capture_wrapper is None:
         print("[!] 캡처 장치가 없어 체스판 기준값을 초기화할 수 없습니다")
         return None
 
-    board_vals, _ = save_initial_board_from_capture(
+    board_vals, warp = save_initial_board_from_capture(
         game_state.cv_capture_wrapper, str(game_state.BOARD_VALUES_PATH)
     )
     if board_vals is not None:
         game_state.init_board_values = board_vals
+        start_background_follower(game_state.cv_capture_wrapper, game_state.BOARD_VALUES_PATH)
+        if warp is not None and game_state.current_board.board_fen() == chess.STARTING_BOARD_FEN:
+            # 시작 배치가 확실한 이 프레임으로 점유 분류기를 맞춘다
+            try:
+                game_state.occupancy_model = OccupancyModel.fit_start_position(warp)
+                game_state.occupancy_model.save(game_state.OCCUPANCY_MODEL_PATH)
+                print("[✓] 칸 점유 분류기 학습 완료")
+            except Exception as exc:
+                print(f"[!] 칸 점유 분류기 학습 실패: {exc}")
         print("[✓] 체스판 기준값 초기화 완료")
     else:
         print("[!] 체스판 기준값 초기화 실패 - CV 감지 정확도가 낮을 수 있습니다")
@@ -6,17 +6,24 @@
 
 from __future__ import annotations
 
-import os
 import time
 import pickle
 from pathlib import Path
 from typing import Iterable, List, Optional, Tuple, Callable, Dict, Any
 
+import chess
 import cv2
 import numpy as np
 
-from cv.picam_stable import warp_chessboard
+from cv.board_stats import bgr_grid_to_lab, cell_means
+from cv.calibrate_camera import load_intrinsics
+from cv.background_model import get_background_model
+from cv.change_segmentation import get_change_segmenter, save_reference_warp
+from cv.flight_recorder import FlightRecorder
+from cv.frame_grabber import FrameGrabber
+from cv.warp_cache import WarpCache, WarpPyramid
 from cv.piece_auto_update import update_chess_pieces
+from cv.move_inference import infer_move, pieces_after_move
 
 try:
     from piece_recognition import _pair_moves as default_pair_moves_fn
@@ -72,6 +79,29 @@ MANUAL_CORNERS_PATH = BASE_DIR / "manual_corners.npy"
 
 _manual_corners: Optional[np.ndarray] = None  # TL, TR, BR, BL
 
+# 감지 경로의 칸 샘플링 (전체 warpPerspective 대신 칸당 s x s 점만 remap)
+DETECT_SPARSE = True
+# 이동 증거: "cells" (칸 평균 변화량) / "segmentation" (픽셀 변화 마스크의 칸별 면적)
+DETECT_EVIDENCE = "cells"
+# 와프 피라미드: 감지용(칸당 정수 픽셀, 8의 배수) / 표시용 해상도
+DETECT_WARP_SIZE = 64
+DISPLAY_WARP_SIZE = 400
+
+# 수동 코너용 와핑/샘플링 remap 테이블 캐시
+_warp_cache = WarpCache()
+
+# 턴 처리에 쓰인 최근 프레임 블랙박스. 이동 판정 실패 시 덤프해 FileCapture 로 재생
+_flight_recorder = FlightRecorder()
+
+
+def get_flight_recorder() -> FlightRecorder:
+    return _flight_recorder
+
+
+def dump_flight_record(reason: str, **extra: Any) -> Optional[Path]:
+    """검출 실패 시 호출. 최근 프레임/칸 통계를 백그라운드에서 npz 로 저장."""
+    return _flight_recorder.dump(reason, extra)
+
 
 # ---------------------------------------------------------------------------
 # 수동 코너 지정
@@ -93,6 +123,7 @@ def set_manual_corners(points: Iterable[Iterable[float]]) -> None:
     global _manual_corners
     ordered = _order_corners_tl_tr_br_bl(points)
     _manual_corners = ordered
+    _warp_cache.invalidate()
     print(f"[cv_manager] manual corners set: {ordered.tolist()}")
     try:
         np.save(MANUAL_CORNERS_PATH, _manual_corners)
@@ -105,6 +136,7 @@ def clear_manual_corners() -> None:
     """수동 코너를 해제."""
     global _manual_corners
     _manual_corners = None
+    _warp_cache.invalidate()
     print("[cv_manager] manual corners cleared")
     try:
         if MANUAL_CORNERS_PATH.exists():
@@ -139,19 +171,29 @@ def _load_manual_corners_from_file() -> None:
         _manual_corners = None
 
 
-# 모듈 임포트 시 자동으로 이전 수동 코너 로드
+def _load_camera_intrinsics() -> None:
+    """calibrate_camera 로 저장한 내부 파라미터가 있으면 와핑 테이블에 왜곡 보정을 포함."""
+    intrinsics = load_intrinsics()
+    if intrinsics is None:
+        return
+    _warp_cache.set_intrinsics(intrinsics)
+    print(f"[cv_manager] lens undistortion enabled (calibrated at {intrinsics['image_size']})")
+
+
+# 모듈 임포트 시 자동으로 이전 수동 코너/카메라 보정값 로드
 _load_manual_corners_from_file()
+_load_camera_intrinsics()
 
 
 # ---------------------------------------------------------------------------
 # 와핑 & 보드 평균 계산
 # ---------------------------------------------------------------------------
 def warp_with_manual_corners(frame: np.ndarray, size: int = 400) -> np.ndarray:
-    """수동 코너가 있으면 와핑, 없으면 리사이즈."""
+    """수동 코너가 있으면 와핑(캐시된 remap 테이블), 없으면 리사이즈."""
     corners = get_manual_corners(copy=False)
     if corners is not None and corners.shape == (4, 2):
         try:
-            return warp_chessboard(frame, corners, size=size)
+            return _warp_cache.warp(frame, corners, size=size)
         except Exception as e:
             print(f"[cv_manager] warp failed, fallback resize: {e}")
     try:
@@ -160,61 +202,125 @@ def warp_with_manual_corners(frame: np.ndarray, size: int = 400) -> np.ndarray:
         return frame
 
 
-def _mean_lab_board_from_warp(warp: np.ndarray) -> np.ndarray:
-    h, w = warp.shape[:2]
-    cell_h = h // 8
-    cell_w = w // 8
+def warp_pyramid(frame: np.ndarray,
+                 display_size: int = DISPLAY_WARP_SIZE,
+                 detect_size: Optional[int] = None) -> WarpPyramid:
+    """현재 코너(없으면 프레임 전체)로 프레임의 와프 피라미드를 만든다. 실제 와핑은 요청 시 수행."""
+    corners = get_manual_corners(copy=False)
+    if corners is None or corners.shape != (4, 2):
+        h, w = frame.shape[:2]
+        corners = np.array([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]], dtype=np.float32)
+    return WarpPyramid(frame, corners, _warp_cache,
+                       detect_size=detect_size or DETECT_WARP_SIZE,
+                       display_size=display_size)
+
+
+def sample_with_manual_corners(frame: np.ndarray, size: int = DISPLAY_WARP_SIZE) -> np.ndarray:
+    """전체 와핑 없이 감지용 작은 와프(DETECT_WARP_SIZE)를 만든다. 칸 통계(감지) 전용."""
+    return warp_pyramid(frame, display_size=size).detect
+
+
+def _mean_lab_board_from_warp(warp: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
     lab = cv2.cvtColor(warp, cv2.COLOR_BGR2LAB)
-    out = np.zeros((8, 8, 3), np.float32)
-    for i in range(8):
-        for j in range(8):
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            x1, x2 = j * cell_w, (j + 1) * cell_w
-            cell = lab[y1:y2, x1:x2]
-            out[i, j] = cell.reshape(-1, 3).mean(axis=0)
-    return out
+    return cell_means(lab, out=out)
+
+
+def frame_lab_means(frame: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """프레임 한 장의 칸별 LAB 평균 (감지용 작은 와프 기준)."""
+    return _mean_lab_board_from_warp(sample_with_manual_corners(frame), out=out)
+
+
+def detrended_lab_deltas(curr_lab: np.ndarray, prev_lab: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """칸별 LAB 차이에서 전체 평균 이동(조명 변화)을 뺀 deltas 와 그 크기 norms(8,8)."""
+    deltas = curr_lab - prev_lab
+    mean_shift = deltas.reshape(-1, 3).mean(axis=0, dtype=np.float32)
+    deltas = deltas - mean_shift
+    norms = np.linalg.norm(deltas, axis=2).astype(np.float32)
+    return deltas, norms
 
 
 def capture_avg_lab_board(cap,
                           n_frames: int = 8,
                           sleep_sec: float = 0.02,
-                          warp_size: int = 400
+                          warp_size: int = 400,
+                          sparse: bool = False,
+                          display: bool = False,
+                          record: bool = False,
+                          stop: Optional[Callable[[np.ndarray], bool]] = None,
                           ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
-    """다중 프레임을 캡처해 LAB 평균과 마지막 와프 이미지를 반환."""
+    """다중 프레임을 캡처해 LAB 평균과 마지막 와프 이미지를 반환.
+
+    sparse=True 이면 전체 와프 대신 감지용 작은 와프(DETECT_WARP_SIZE)로 계산하고,
+    두 번째 반환값도 그 작은 와프가 된다(칸 평균 계산에는 큰 와프와 동일하게 쓸 수 있음).
+    display=True 이면 마지막 프레임에 대해서만 warp_size 표시용 와프를 만들어 반환한다.
+    record=True 이면 프레임과 칸 LAB 평균을 flight recorder 링에 넣는다.
+    cap 이 FrameGrabber 이면 read() 가 이미 새 프레임을 기다리므로 sleep_sec 는 건너뛴다.
+    stop 을 주면 프레임마다 그 프레임의 칸 LAB 평균(재사용 버퍼)으로 호출하고, True 를 돌려주면
+    n_frames 전에 멈춘다 (sequential_detector 가 확신이 서면 바로 끝내는 데 쓴다).
+    """
+    if isinstance(cap, FrameGrabber):
+        sleep_sec = 0.0
     acc = np.zeros((8, 8, 3), np.float32)
+    means = np.empty((8, 8, 3), np.float32)
     cnt = 0
-    last_warp = None
+    last_pyr: Optional[WarpPyramid] = None
 
     for _ in range(n_frames):
         ret, frame = cap.read()
         if not ret:
             break
 
-        warp = warp_with_manual_corners(frame, size=warp_size)
-        last_warp = warp
-        acc += _mean_lab_board_from_warp(warp)
+        pyr = warp_pyramid(frame, display_size=warp_size)
+        warp = pyr.detect if sparse else pyr.display()
+        last_pyr = pyr
+        acc += _mean_lab_board_from_warp(warp, out=means)
+        if record:
+            _flight_recorder.record(frame, stats=means)
         cnt += 1
-        time.sleep(sleep_sec)
+        if stop is not None and stop(means):
+            break
+        if sleep_sec > 0:
+            time.sleep(sleep_sec)
 
-    if cnt == 0:
+    if cnt == 0 or last_pyr is None:
         return None, None
+    last_warp = last_pyr.display() if (display or not sparse) else last_pyr.detect
     return acc / cnt, last_warp
 
 
-def compute_board_means_bgr(warp: np.ndarray) -> np.ndarray:
-    h, w = warp.shape[:2]
-    cell_h = h // 8
-    cell_w = w // 8
-    board_vals = np.zeros((8, 8, 3), np.float32)
-    for i in range(8):
-        for j in range(8):
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            x1, x2 = j * cell_w, (j + 1) * cell_w
-            cell = warp[y1:y2, x1:x2]
-            board_vals[i, j] = np.mean(cell.reshape(-1, 3), axis=0)
+def refresh_baseline_squares(cap, np_path: str, cells: Iterable[int], n_frames: int = 2,
+                             sparse: Optional[bool] = None) -> Optional[np.ndarray]:
+    """기준에서 cells(i*8+j) 칸만 지금 화면으로 다시 잡는다 (로봇 이동 뒤 등). 저장한 BGR 기준 반환."""
+    model = get_background_model(np_path)
+    if model is None:
+        return None
+    segmenter = get_change_segmenter(np_path)
+    curr_lab, warp = capture_avg_lab_board(cap, n_frames=n_frames,
+                                           sparse=DETECT_SPARSE if sparse is None else sparse)
+    if curr_lab is None:
+        return None
+    model.reset(cells, curr_lab)
+    board_vals = model.save(np_path)
+    _update_reference_warp(segmenter, np_path, cells, warp)
     return board_vals
 
 
+def _update_reference_warp(segmenter, np_path: str, cells: Iterable[int], warp: np.ndarray) -> None:
+    """npy 를 쓴 뒤 분할 기준 와프도 맞춘다 (살아 있던 기준이면 cells 칸만, 없으면 와프 전체)."""
+    try:
+        if segmenter is not None:
+            segmenter.reset(cells, warp)
+            segmenter.save(np_path)
+        else:
+            save_reference_warp(np_path, warp)
+    except Exception as e:
+        print(f"[cv_manager] warning: failed to save reference warp: {e}")
+
+
+def compute_board_means_bgr(warp: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    return cell_means(warp, out=out)
+
+
 # ---------------------------------------------------------------------------
 # 초기 기준 저장
 # ---------------------------------------------------------------------------
@@ -223,6 +329,7 @@ def save_initial_board_from_frame(frame: np.ndarray, np_path: str, warp_size: in
     warp = warp_with_manual_corners(frame, size=warp_size)
     board_vals = compute_board_means_bgr(warp)
     np.save(np_path, board_vals)
+    _update_reference_warp(None, np_path, (), sample_with_manual_corners(frame))
     print(f"[cv_manager] initial board saved to {np_path}")
     return board_vals
 
@@ -281,18 +388,22 @@ def piece_to_fen(piece: str) -> str:
 
 
 def _bgr_to_lab_grid(board_vals: np.ndarray) -> np.ndarray:
-    prev_lab = np.zeros((8, 8, 3), np.float32)
-    for i in range(8):
-        for j in range(8):
-            bgr = np.array(board_vals[i, j], dtype=np.uint8)[None, None, :]
-            lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB).astype(np.float32)
-            prev_lab[i, j] = lab[0, 0]
-    return prev_lab
+    return bgr_grid_to_lab(board_vals)
 
 
 # ---------------------------------------------------------------------------
 # 턴 전환 처리
 # ---------------------------------------------------------------------------
+def _with_detection_info(result: Dict[str, Any], sequential, segmentation) -> Dict[str, Any]:
+    """순차 판정/분할 증거를 썼으면 그 정보를 결과에 붙인다."""
+    if sequential is not None:
+        result.update(frames_used=sequential.frames, posterior=sequential.posterior,
+                      decided=sequential.decided)
+    if segmentation is not None:
+        result['segmentation'] = segmentation.to_dict()
+    return result
+
+
 def process_turn_transition(
         cap,
         np_path: str,
@@ -304,7 +415,11 @@ def process_turn_transition(
         threshold: float = 9.0,
         n_frames: int = 1,
         sleep_sec: float = 0.02,
-        warp_size: int = 400
+        warp_size: int = 400,
+        sparse: Optional[bool] = None,
+        board: Optional[chess.Board] = None,
+        max_frames: Optional[int] = None,
+        evidence_mode: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     턴 전환 로직을 실행한다.
@@ -314,7 +429,23 @@ def process_turn_transition(
     - chess_pieces (업데이트된 배열)
     - move_str (기보 문자열)
     - src, dst (행/열 좌표)
-    - warp (마지막 와프 이미지)
+    - warp (마지막 와프 이미지, sparse 모드에서는 칸 샘플 모자이크)
+    - norms (칸별 변화량 8x8)
+    board(현재 chess.Board)를 주면 move_inference 로 합법 수 전체를 점수 매겨 고르고
+    move(uci), margin, confidence, ambiguous, ranked 키가 추가된다. board 가 없거나
+    합법 수가 없으면 예전처럼 변화량 상위 칸 쌍으로 판정한다.
+    committed 키는 수를 확정해 기물 배열(pkl)과 기준을 갱신했는지다. 1등 점수가 0 이하(문턱을 넘은
+    기대 칸이 없음 = 움직임 없음)이거나, 판정이 모호하거나, 순차 판정이 max_frames 안에 정지 규칙을
+    만족하지 못하면(decided=False) 아무것도 쓰지 않고 flight record 를 남긴 뒤
+    committed=False, move=None, candidate(1등 수 uci) 로 돌려준다. 이때 turn_color / chess_pieces 는
+    입력 그대로이고, 확정은 호출 쪽(점유 분류 확인 등)에 맡긴다.
+    board 와 기준이 모두 있으면 n_frames 고정 평균 대신 sequential_detector 로 확신이 설 때까지
+    (최대 max_frames, 기본 MAX_FRAMES) 캡처하고 frames_used, posterior, decided 키를 더한다.
+    기준이 있으면 변화량은 background_model 의 칸 노이즈 정규화 값이라 threshold 는 칸별
+    z 문턱(threshold / SIGMA_INIT) 으로 동작하고, 턴이 끝나면 이동한 칸만 기준을 다시 잡는다.
+    evidence_mode 가 "segmentation" 이고 board 와 기준 와프가 있으면 칸 평균 대신 change_segmentation 의
+    픽셀 변화 마스크 칸별 면적을 증거로 점수 매기고 segmentation 키를 더한다 (n_frames 고정 캡처).
+    sparse 가 None 이면 DETECT_SPARSE, evidence_mode 가 None 이면 DETECT_EVIDENCE 설정을 따른다.
     """
     if pair_moves_fn is None:
         if default_pair_moves_fn is None:
@@ -331,33 +462,105 @@ def process_turn_transition(
     except Exception as e:
         print(f"[cv_manager] warning: failed to pre-save chess pieces: {e}")
 
-    prev_board_values = np.load(np_path) if os.path.exists(np_path) else None
-
-    curr_lab, warp = capture_avg_lab_board(cap, n_frames=n_frames, sleep_sec=sleep_sec, warp_size=warp_size)
+    # 칸별 배경 모델 (기준 npy 가 밖에서 바뀌었으면 그 값으로 다시 만든다)
+    model = get_background_model(np_path)
+    segmenter = get_change_segmenter(np_path)
+
+    if sparse is None:
+        sparse = DETECT_SPARSE
+    if evidence_mode is None:
+        evidence_mode = DETECT_EVIDENCE
+    use_segmentation = evidence_mode == "segmentation" and board is not None and segmenter is not None
+    prev_lab = model.mean_lab() if model is not None else None
+    sequential = None
+    segmentation = None
+    if board is not None and model is not None and not use_segmentation:
+        # 확신이 서면 바로 멈추는 순차 판정 (최대 max_frames 장)
+        from cv.sequential_detector import MAX_FRAMES, detect_move_sequential
+        sequential, curr_lab, warp = detect_move_sequential(
+            cap, board, prev_lab, threshold=threshold, evidence=model.normalized_norms,
+            max_frames=max(n_frames, max_frames or MAX_FRAMES),
+            warp_size=warp_size, sparse=sparse, record=True)
+    else:
+        curr_lab, warp = capture_avg_lab_board(cap, n_frames=n_frames, sleep_sec=sleep_sec,
+                                               warp_size=warp_size, sparse=sparse, record=True)
     if curr_lab is None or warp is None:
         raise RuntimeError("현재 보드를 캡처할 수 없습니다.")
-
-    prev_lab = _bgr_to_lab_grid(prev_board_values) if prev_board_values is not None else curr_lab.copy()
-
-    deltas = curr_lab - prev_lab
-    mean_shift = deltas.reshape(-1, 3).mean(axis=0, dtype=np.float32)
-    deltas = deltas - mean_shift
-    norms = np.linalg.norm(deltas, axis=2).astype(np.float32)
-
-    pairs = pair_moves_fn(deltas.reshape(-1, 3), norms.reshape(-1), threshold=threshold)
-    if pairs:
-        a, b = pairs[0]
-        src = (a // 8, a % 8)
-        dst = (b // 8, b % 8)
-        print(f"[cv_manager] pair matched src={src}, dst={dst}")
+    if prev_lab is None:
+        prev_lab = curr_lab.copy()
+
+    deltas, norms = detrended_lab_deltas(curr_lab, prev_lab)
+    if model is not None:
+        norms = model.normalized_norms(curr_lab)
+    if use_segmentation:
+        segmentation = segmenter.segment(warp)
+        norms = segmentation.norms(threshold)
+        print(f"[cv_manager] segmentation {segmentation.to_dict()}")
+        if segmentation.occluded:
+            dump_flight_record("occluded during detection", norms=norms, fraction=segmentation.fraction,
+                               mask=segmentation.mask, turn_color=turn_color)
+
+    if sequential is not None:
+        estimate = sequential.estimate
     else:
-        flat = norms.flatten()
-        order = np.argsort(-flat)
-        src = (int(order[0]) // 8, int(order[0]) % 8)
-        dst = (int(order[1]) // 8, int(order[1]) % 8)
-        print(f"[cv_manager] pair not found -> fallback {src}->{dst}")
-
-    board_vals = compute_board_means_bgr(warp)
+        estimate = infer_move(board, norms, threshold=threshold) if board is not None else None
+    reject = None
+    if estimate is not None:
+        src, dst = estimate.src_dst()
+        print(f"[cv_manager] inferred {estimate.move.uci()} score={estimate.score:.1f} "
+              f"margin={estimate.margin:.1f} conf={estimate.confidence:.2f} ranked={estimate.ranked}")
+        if estimate.score <= 0:
+            # 문턱을 넘은 기대 칸이 없다 → 잘못 누른 버튼/가려진 프레임. 아무 수나 확정하지 않는다.
+            reject = "no move detected"
+        elif estimate.ambiguous:
+            reject = "ambiguous move"
+        elif sequential is not None and not sequential.decided:
+            # max_frames 를 다 써도 사후확률이 1 - alpha 에 못 미침 → 확정된 수로 쓰지 않는다
+            reject = "undecided move"
+        if reject is not None:
+            dump_flight_record(reject, norms=norms, curr_lab=curr_lab, prev_lab=prev_lab,
+                               fen=board.fen(), ranked=estimate.ranked, score=estimate.score,
+                               margin=estimate.margin, turn_color=turn_color,
+                               sequential=sequential.to_dict() if sequential is not None else None)
+    else:
+        pairs = pair_moves_fn(deltas.reshape(-1, 3), norms.reshape(-1), threshold=threshold)
+        if pairs:
+            a, b = pairs[0]
+            src = (a // 8, a % 8)
+            dst = (b // 8, b % 8)
+            print(f"[cv_manager] pair matched src={src}, dst={dst}")
+        else:
+            flat = norms.flatten()
+            order = np.argsort(-flat)
+            src = (int(order[0]) // 8, int(order[0]) % 8)
+            dst = (int(order[1]) // 8, int(order[1]) % 8)
+            print(f"[cv_manager] pair not found -> fallback {src}->{dst}")
+            dump_flight_record("pair not found", norms=norms, curr_lab=curr_lab, prev_lab=prev_lab,
+                               fallback_src=list(src), fallback_dst=list(dst), turn_color=turn_color)
+
+    if reject is not None:
+        print(f"[cv_manager] {reject}: not committing {estimate.move.uci()}")
+        result = {
+            'committed': False,
+            'turn_color': turn_color,
+            'prev_turn_color': turn_color,
+            'init_board_values': model.baseline_bgr() if model is not None else None,
+            'chess_pieces': chess_pieces,
+            'move_str': None,
+            'src': src,
+            'dst': dst,
+            'warp': warp,
+            'norms': norms,
+            'move': None,
+            'candidate': estimate.move.uci(),
+            'score': estimate.score,
+            'margin': estimate.margin,
+            'confidence': estimate.confidence,
+            'ambiguous': estimate.ambiguous,
+            'ranked': estimate.ranked,
+            'reason': reject,
+        }
+        return _with_detection_info(result, sequential, segmentation)
 
     try:
         with open(pkl_path, 'rb') as f:
@@ -366,7 +569,10 @@ def process_turn_transition(
         pass
 
     before = [row[:] for row in chess_pieces]
-    chess_pieces = update_chess_pieces(chess_pieces, src, dst)
+    if estimate is not None:
+        chess_pieces = pieces_after_move(board, estimate.move)
+    else:
+        chess_pieces = update_chess_pieces(chess_pieces, src, dst)
 
     piece_src = before[src[0]][src[1]]
     piece_dst = before[dst[0]][dst[1]]
@@ -384,21 +590,19 @@ def process_turn_transition(
     except Exception as e:
         print(f"[cv_manager] warning: failed to save chess pieces: {e}")
 
-    if os.path.exists(np_path):
-        try:
-            os.remove(np_path)
-            print(f"[cv_manager] removed old board values: {np_path}")
-        except Exception as e:
-            print(f"[cv_manager] failed to remove old board file: {e}")
-
-    np.save(np_path, board_vals)
-    try:
-        updated_board_vals = np.load(np_path)
-    except Exception as e:
-        print(f"[cv_manager] warning: failed to reload board values: {e}")
-        updated_board_vals = board_vals
+    # 확정된 수가 바꾼 칸만 새 값으로 (나머지 칸은 배경 모델이 계속 따라간 값 유지)
+    cells = estimate.cells if estimate is not None else (src[0] * 8 + src[1], dst[0] * 8 + dst[1])
+    if model is not None:
+        model.reset(cells, curr_lab)
+        updated_board_vals = model.save(np_path)
+        print(f"[cv_manager] baseline reset on {len(set(cells))} squares")
+    else:
+        updated_board_vals = compute_board_means_bgr(warp)
+        np.save(np_path, updated_board_vals)
+    _update_reference_warp(segmenter, np_path, cells, warp)
 
-    return {
+    result = {
+        'committed': True,
         'turn_color': new_turn_color,
         'prev_turn_color': prev_turn_color,
         'init_board_values': updated_board_vals,
@@ -407,7 +611,13 @@ def process_turn_transition(
         'src': src,
         'dst': dst,
         'warp': warp,
+        'norms': norms,
     }
+    if estimate is not None:
+        result.update(move=estimate.move.uci(), score=estimate.score, margin=estimate.margin,
+                      confidence=estimate.confidence, ambiguous=estimate.ambiguous,
+                      ranked=estimate.ranked)
+    return _with_detection_info(result, sequential, segmentation)
 
 
 __all__ = [
@@ -416,11 +626,18 @@ __all__ = [
     'get_manual_corners',
     'manual_mode_enabled',
     'warp_with_manual_corners',
+    'sample_with_manual_corners',
+    'warp_pyramid',
+    'frame_lab_means',
+    'detrended_lab_deltas',
     'capture_avg_lab_board',
     'compute_board_means_bgr',
     'save_initial_board_from_frame',
     'save_initial_board_from_capture',
     'process_turn_transition',
+    'refresh_baseline_squares',
+    'get_flight_recorder',
+    'dump_flight_record',
     'coord_to_chess_notation',
     'piece_to_fen',
 ]
@@ -12,17 +12,28 @@ from __future__ import annotations
 
 import os
 import threading
-import time
 import logging
 from pathlib import Path
-from typing import Optional, Dict, Any, Iterable, Tuple
+from typing import Optional, Dict, Any, Iterable, Tuple, Callable
 import pickle
 
+import chess
 import cv2
 import numpy as np
 from flask import Flask, Response, render_template_string, request, jsonify
 
 from cv import cv_manager
+from cv.background_model import start_background_follower
+from cv.board_monitor import BoardMonitor
+from cv.motion_monitor import SETTLE_TIMEOUT, MotionMonitor
+from cv.occupancy import OccupancyModel, pieces_occupancy
+from cv.file_capture import capture_from_env
+from cv.frame_grabber import FrameGrabber
+from cv.jobs import JobRunner
+from cv.jpeg_encoder import StreamProfile, get_encoder
+from cv.response_cache import ResponseCache, etag_for
+from cv.web_server import serve, stream_slots
+from cv.frame_ring import RING_SIZE, FrameRing, net_rotation, orient_into, oriented_shape
 
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -32,6 +43,10 @@ class USBCapture:
 
     rotate_180=True 이면 영상이 뒤집혀 있을 때 180도 회전 보정.
     기본값은 True (현재 세팅에서는 카메라가 180도 뒤집혀 있다고 가정).
+
+    read() 는 미리 할당한 ring_size 개 버퍼를 돌려 쓰고, 회전 옵션은 flip/rotate
+    한 번으로 합쳐 버퍼에 바로 쓴다. 반환된 프레임은 ring_size 번 뒤 read() 에서
+    덮어써지므로 오래 보관할 때는 copy() 한다.
     """
 
     def __init__(
@@ -42,6 +57,7 @@ class USBCapture:
         rotate_180: bool = True,
         rotate_90_ccw: bool = False,
         rotate_90_cw: bool = False,
+        ring_size: int = RING_SIZE,
     ):
         """
         index가 None이면 0~5 범위를 순회하며 첫 번째로 열리는 장치를 사용한다.
@@ -60,6 +76,10 @@ class USBCapture:
         self._rotate_180 = rotate_180
         self._rotate_90_ccw = rotate_90_ccw
         self._rotate_90_cw = rotate_90_cw
+        self._rotate_deg = net_rotation(rotate_180, rotate_90_ccw, rotate_90_cw)
+        self._ring = FrameRing(ring_size)
+        self._raw: Optional[np.ndarray] = None  # 회전이 있을 때 카메라 원본을 받는 스크래치
+        self._shape: Optional[Tuple[int, ...]] = None
 
         for idx in candidates:
             cap = cv2.VideoCapture(idx, cv2.CAP_V4L2)
@@ -81,20 +101,24 @@ class USBCapture:
             print(f"[USBCapture] 카메라 속성 설정 실패: {e}")
 
     def read(self):
-        ret, frame = self._cap.read()
-        if not ret or frame is None:
+        # 회전이 없으면 링 버퍼에 바로 읽고, 있으면 스크래치에 읽은 뒤 링 버퍼로 보정한다.
+        # (버퍼 크기가 카메라 출력과 다르면 OpenCV 가 새로 할당하고, 다음부터 그 크기를 쓴다)
+        if self._rotate_deg == 0:
+            buf = self._ring.next(self._shape) if self._shape is not None else None
+        else:
+            buf = self._raw
+        ret, raw = self._cap.read(buf) if buf is not None else self._cap.read()
+        if not ret or raw is None:
             print("[USBCapture] frame read 실패")
-            return ret, frame
-
-        # 카메라가 180도 뒤집혀 있을 때 보정
-        if self._rotate_180:
-            frame = cv2.rotate(frame, cv2.ROTATE_180)
-        if self._rotate_90_ccw:
-            frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
-        elif self._rotate_90_cw:
-            frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
+            return ret, raw
+        self._shape = raw.shape
+        if self._rotate_deg == 0:
+            return True, raw
+        self._raw = raw
 
-        return True, frame
+        # 카메라가 뒤집혀 있을 때 보정: 180도는 flip(-1), 90도는 rotate 한 번
+        dst = self._ring.next(oriented_shape(raw.shape, self._rotate_deg))
+        return True, orient_into(raw, dst, self._rotate_deg)
 
     def release(self):
         if self._cap is not None:
@@ -104,29 +128,18 @@ class USBCapture:
                 pass
 
 
-class ThreadSafeCapture:
-    """멀티스레드 환경에서 안전하게 read()를 보장하는 래퍼."""
-
-    def __init__(self, cap):
-        self._cap = cap
-        self._lock = threading.Lock()
-
-    def read(self):
-        with self._lock:
-            return self._cap.read()
-
-    def release(self):
-        with self._lock:
-            if hasattr(self._cap, "release"):
-                self._cap.release()
+# 미리보기 이미지는 크기 목표만 주고 품질/축소는 인코더가 맞춘다.
+# 수동 모드 원본은 클릭 좌표가 원본 픽셀과 맞아야 하므로 고정 품질/원본 크기.
+PREVIEW_PROFILE = StreamProfile("snapshot_preview", target_kb=25, quality=45, q_min=30, q_max=70,
+                                max_encode_ms=15)
+BOARD_PROFILE = StreamProfile("snapshot_board", target_kb=30, quality=55, q_min=35, q_max=75,
+                              max_encode_ms=15)
 
 
-def _encode_jpeg(img: np.ndarray, quality: int = 60) -> bytes:
-    quality = int(np.clip(quality, 10, 95))
-    ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
-    if not ok:
-        raise RuntimeError("JPEG 인코딩 실패")
-    return buf.tobytes()
+def _encode_jpeg(img: np.ndarray, quality: int = 60,
+                 profile: Optional[StreamProfile] = None) -> bytes:
+    """공용 JPEG 풀에서 인코딩 (요청 스레드 여러 개가 동시에 코어를 다 쓰지 않도록)."""
+    return get_encoder().encode(img, profile=profile, quality=quality)
 
 
 def _resize_for_preview(img: np.ndarray, max_width: int = 480) -> np.ndarray:
@@ -153,27 +166,51 @@ def _default_board() -> list:
     ]
 
 
+def _board_from_pieces(chess_pieces: list, turn_color: str) -> chess.Board:
+    """8x8 기물 배열(0행 = 8랭크)로 chess.Board 를 만든다. 캐슬링 권리는 킹/룩 위치로 추정."""
+    board = chess.Board(None)
+    for i, row in enumerate(chess_pieces):
+        for j, piece in enumerate(row):
+            symbol = cv_manager.piece_to_fen(piece)
+            if symbol and symbol != '?':
+                board.set_piece_at(chess.square(j, 7 - i), chess.Piece.from_symbol(symbol))
+    board.turn = chess.WHITE if turn_color == 'white' else chess.BLACK
+    board.set_castling_fen("KQkq")
+    board.castling_rights = board.clean_castling_rights()
+    return board
+
+
 def build_app(state: Dict[str, Any]) -> Flask:
     app = Flask(__name__)
     logging.getLogger("werkzeug").setLevel(logging.ERROR)
 
-    cap: ThreadSafeCapture = state["cap"]
+    cap: FrameGrabber = state["cap"]
     np_path: Path = state["np_path"]
     pkl_path: Path = state["pkl_path"]
+    # 칸 차이/턴 상태를 프레임마다 한 번 계산해 /events 구독자 모두에게 푸시
+    monitor = BoardMonitor(cap, np_path, state)
+    # 턴 전환 전 고정 sleep 대신 손이 빠지고 화면이 멈출 때까지만 기다린다
+    motion = MotionMonitor(cap, np_path)
+    # 스냅샷 라우트: 같은 프레임에 대한 동시 요청은 한 번만 계산 (+ ETag/304)
+    snapshot_cache = ResponseCache()
+    # 동시 스트림 상한: 스트림이 워커를 다 차지해도 제어 요청은 처리되도록
+    slots = state.get("stream_slots") or stream_slots()
+
+    def on_job_change(job) -> None:
+        # 진행 단계를 /events 구독자에게도 바로 푸시 (폴링 안 해도 보이도록)
+        state["job"] = job.to_dict()
+        monitor.notify()
+
+    # 턴 전환처럼 오래 걸리는 작업은 요청 스레드 밖에서 하나씩 실행
+    jobs = JobRunner(on_change=on_job_change)
 
     def capture_frame() -> Optional[np.ndarray]:
-        """항상 가능한 한 최신 프레임을 반환하도록 버퍼를 조금 비운 뒤 마지막 프레임을 사용."""
-        last_frame: Optional[np.ndarray] = None
-        # 짧은 시간 동안 여러 번 read() 해서 버퍼에 쌓인 이전 프레임은 버리고 마지막 것만 사용
-        for _ in range(4):
-            ret, frame = cap.read()
-            if not ret or frame is None:
-                continue
-            last_frame = frame
-        if last_frame is None:
+        """grab 스레드가 유지하는 최신 프레임을 반환 (버퍼 비우기 read 없음)."""
+        grabbed = cap.latest(timeout=1.0)
+        if grabbed is None:
             print("[cv_web] capture_frame: 유효한 프레임을 읽지 못했습니다")
             return None
-        return last_frame
+        return grabbed.frame
 
     @app.route("/")
     def index():
@@ -197,9 +234,12 @@ def build_app(state: Dict[str, Any]) -> Flask:
         </div>
 
         <div style="margin-top:24px;">
-          <h3>실시간 체스판 + diff 상위 2칸</h3>
-          <p style="font-size:13px; color:#555;">(매 1초마다 최신 프레임 기준으로 두 칸을 빨간 박스로 표시합니다.)</p>
-          <img id="board-img" src="/snapshot_board?ts=" style="max-width:420px; border:1px solid #ccc" />
+          <h3>실시간 체스판 diff 히트맵 + 상위 2칸</h3>
+          <p style="font-size:13px; color:#555;">(서버가 새 프레임마다 64칸 차이를 푸시합니다. 빨간 테두리 = 상위 칸)</p>
+          <canvas id="heatmap" width="400" height="400" style="border:1px solid #ccc"></canvas>
+          <div id="heat-info" style="font-size:13px; color:#555;"></div>
+          <button onclick="loadSnapshot()">와프 스냅샷 보기</button><br>
+          <img id="board-img" style="max-width:420px; border:1px solid #ccc; display:none" />
         </div>
 
         <script>
@@ -214,101 +254,192 @@ def build_app(state: Dict[str, Any]) -> Flask:
             .then(msg => setStatus(msg, true))
             .catch(e => setStatus('오류: '+e, false));
         }
+        const STAGES = {queued: '대기 중', running: '시작', settling: '손이 빠지길 기다리는 중',
+                        detecting: '이동 판정 중', done: '완료', failed: '실패'};
+        function pollJob(url){
+          fetch(url).then(r => r.json()).then(job => {
+            if (job.state === 'done'){
+              setStatus('턴 전환 완료: ' + job.result.move_str, true);
+              window.location.reload();
+            } else if (job.state === 'failed'){
+              setStatus('턴 전환 실패: ' + job.error, false);
+            } else {
+              setStatus('턴 전환 ' + (STAGES[job.stage] || job.stage) + '... (' + job.elapsed.toFixed(1) + 's)', true);
+              setTimeout(() => pollJob(url), 500);
+            }
+          }).catch(e => setStatus('오류: '+e, false));
+        }
         function nextTurn(){
           fetch('/next_turn', {method:'POST'})
-            .then(r => r.text())
-            .then(msg => {
-              setStatus(msg, true);
-              window.location.reload();
-            })
+            .then(r => r.json())
+            .then(res => pollJob(res.status_url))
             .catch(e => setStatus('오류: '+e, false));
         }
-        function refreshBoard(){
+        function loadSnapshot(){
           const img = document.getElementById('board-img');
-          if(img){
-            img.src = '/snapshot_board?ts=' + Date.now();
+          img.style.display = 'block';
+          img.src = '/snapshot_board?ts=' + Date.now();
+        }
+        const FILES = 'abcdefgh';
+        function drawHeatmap(ev){
+          const c = document.getElementById('heatmap');
+          const ctx = c.getContext('2d');
+          const cs = c.width / 8;
+          ctx.clearRect(0, 0, c.width, c.height);
+          const norms = ev.norms || [];
+          // 문턱의 2배를 최대 색으로 (그 이상은 포화)
+          const vmax = Math.max(ev.threshold * 2, 1);
+          for (let k = 0; k < 64; k++){
+            const i = Math.floor(k / 8), j = k % 8;
+            const v = norms.length ? Math.min(norms[k] / vmax, 1) : 0;
+            const base = (i + j) % 2 ? 90 : 150;
+            ctx.fillStyle = norms.length
+              ? `rgb(${Math.round(base + (255 - base) * v)},${Math.round(base * (1 - v))},${Math.round(base * (1 - v))})`
+              : `rgb(${base},${base},${base})`;
+            ctx.fillRect(j * cs, i * cs, cs, cs);
+            if (norms.length){
+              ctx.fillStyle = '#fff';
+              ctx.font = '11px sans-serif';
+              ctx.fillText(norms[k].toFixed(0), j * cs + 3, i * cs + 13);
+            }
+          }
+          ctx.strokeStyle = '#ff0000';
+          ctx.lineWidth = 3;
+          for (const [i, j] of (ev.top || [])){
+            ctx.strokeRect(j * cs + 1.5, i * cs + 1.5, cs - 3, cs - 3);
           }
+          const top = (ev.top || []).map(([i, j, v]) => `${FILES[j]}${8 - i}(${v})`).join(', ');
+          document.getElementById('heat-info').textContent = ev.has_baseline
+            ? `frame #${ev.seq} | max ${ev.max} | top: ${top} | 턴 ${ev.turn.current} (${ev.turn.moves}수)`
+            : '기준 보드가 없습니다. "완전 초기상태 저장"을 먼저 누르세요.';
         }
-        // 페이지 로드 후 주기적으로 보드 이미지 갱신
-        setInterval(refreshBoard, 1000);
-        refreshBoard();
+        const events = new EventSource('/events');
+        events.onmessage = (e) => {
+          const ev = JSON.parse(e.data);
+          drawHeatmap(ev);
+          // 다른 탭에서 시작한 턴 전환도 진행 단계를 보여 준다
+          if (ev.job && (ev.job.state === 'queued' || ev.job.state === 'running')){
+            setStatus('턴 전환 ' + (STAGES[ev.job.stage] || ev.job.stage) + '...', true);
+          }
+        };
+        events.onerror = () => setStatus('이벤트 연결 끊김 - 재연결 중...', false);
+        events.onopen = () => setStatus('');
         </script>
         ''', turn_color=state["turn_color"], prev_turn_color=state["prev_turn_color"], move_str=move_str)
 
+    @app.route("/events")
+    def events():
+        """보드 diff/턴 상태 Server-Sent Events 스트림."""
+        if not slots.acquire(blocking=False):
+            return Response("동시 스트림 수 초과", status=503, headers={"Retry-After": "2"})
+        resp = Response(monitor.events(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        resp.call_on_close(slots.release)
+        return resp
+
+    def cached_jpeg(key, render) -> Response:
+        """key 가 같으면 render() 를 한 번만 실행. If-None-Match 가 맞으면 계산 없이 304."""
+        etag = etag_for(key)
+        if request.if_none_match.contains(etag):
+            snapshot_cache.not_modified += 1
+            resp = Response(status=304)
+        else:
+            resp = Response(snapshot_cache.get_or_compute(key, render), mimetype="image/jpeg")
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+
     @app.route("/snapshot_original")
     def snapshot_original():
-        frame = capture_frame()
-        if frame is None:
+        grabbed = cap.latest(timeout=1.0)
+        if grabbed is None:
+            print("[cv_web] capture_frame: 유효한 프레임을 읽지 못했습니다")
             return "카메라 프레임 없음", 500
-
         manual_mode = request.args.get("manual") == "1"
-        if manual_mode:
-            img = frame
-            quality = 60
+
+        def render() -> bytes:
+            if manual_mode:
+                return _encode_jpeg(grabbed.frame, quality=60)
+            return _encode_jpeg(_resize_for_preview(grabbed.frame, max_width=480), profile=PREVIEW_PROFILE)
+
+        return cached_jpeg(("snapshot_original", manual_mode, grabbed.seq), render)
+
+    def render_board_snapshot() -> bytes:
+        # 칸 통계는 감지용 작은 와프로, 표시용 400px 와프는 마지막 프레임만
+        curr_lab, warp = cv_manager.capture_avg_lab_board(
+            cap, n_frames=4, sleep_sec=0.02, warp_size=400, sparse=True, display=True
+        )
+        if curr_lab is None or warp is None:
+            raise RuntimeError("보드를 캡처할 수 없습니다.")
+
+        prev_board_values = None
+        if np_path.exists():
+            try:
+                prev_board_values = np.load(np_path)
+            except Exception as e:
+                print(f"[cv_web] snapshot_board: failed to load {np_path}: {e}")
+
+        # 이전 보드 기준이 없으면 그냥 warp만 보여줌
+        if prev_board_values is None:
+            img = warp
         else:
-            img = _resize_for_preview(frame, max_width=480)
-            quality = 45
-        return Response(_encode_jpeg(img, quality=quality), mimetype="image/jpeg")
+            prev_lab = cv_manager._bgr_to_lab_grid(prev_board_values)
+
+            def compute_norms(curr_lab_arr):
+                deltas = curr_lab_arr - prev_lab
+                return np.linalg.norm(deltas, axis=2)
+
+            norms = compute_norms(curr_lab)
+            flat = norms.flatten()
+            order = np.argsort(-flat)
+
+            h, w = warp.shape[:2]
+            cell_h = h // 8
+            
+            cell_w = w // 8
+
+            highlight = warp.copy()
+
+            # for k in range(min(2, len(order))):
+            #     idx = int(order[k])
+            #     i = idx // 8
+            #     j = idx % 8
+            #     y1, y2 = i * cell_h, (i + 1) * cell_h
+            #     x1, x2 = j * cell_w, (j + 1) * cell_w
+            #     cv2.rectangle(highlight, (x1, y1), (x2, y2), (0, 0, 255), 2)
+
+            img = highlight
+
+        return _encode_jpeg(img, profile=BOARD_PROFILE)
 
     @app.route("/snapshot_board")
     def snapshot_board():
         """
         현재 프레임을 체스판으로 warp한 뒤,
         init_board_values.npy와 비교해 diff가 가장 큰 두 칸을 빨간 박스로 표시한 이미지를 반환.
+        키: 최신 프레임 seq + 기준 파일 mtime + 수동 코너 (셋 중 하나라도 바뀌면 새로 계산)
         """
         try:
-            def capture_board():
-                return cv_manager.capture_avg_lab_board(
-                    cap, n_frames=4, sleep_sec=0.02, warp_size=400
-                )
-
-            curr_lab, warp = capture_board()
-            if curr_lab is None or warp is None:
-                return "보드를 캡처할 수 없습니다.", 500
-
-            prev_board_values = None
-            if np_path.exists():
-                try:
-                    prev_board_values = np.load(np_path)
-                except Exception as e:
-                    print(f"[cv_web] snapshot_board: failed to load {np_path}: {e}")
-
-            # 이전 보드 기준이 없으면 그냥 warp만 보여줌
-            if prev_board_values is None:
-                img = warp
-            else:
-                prev_lab = cv_manager._bgr_to_lab_grid(prev_board_values)
-
-                def compute_norms(curr_lab_arr):
-                    deltas = curr_lab_arr - prev_lab
-                    return np.linalg.norm(deltas, axis=2)
-
-                norms = compute_norms(curr_lab)
-                flat = norms.flatten()
-                order = np.argsort(-flat)
-
-                h, w = warp.shape[:2]
-                cell_h = h // 8
-                
-                cell_w = w // 8
-
-                highlight = warp.copy()
-
-                # for k in range(min(2, len(order))):
-                #     idx = int(order[k])
-                #     i = idx // 8
-                #     j = idx % 8
-                #     y1, y2 = i * cell_h, (i + 1) * cell_h
-                #     x1, x2 = j * cell_w, (j + 1) * cell_w
-                #     cv2.rectangle(highlight, (x1, y1), (x2, y2), (0, 0, 255), 2)
-
-                img = highlight
-
-            return Response(_encode_jpeg(img, quality=55), mimetype="image/jpeg")
+            try:
+                base_mtime = np_path.stat().st_mtime_ns
+            except OSError:
+                base_mtime = None
+            corners = cv_manager.get_manual_corners(copy=False)
+            key = ("snapshot_board", cap.seq, base_mtime,
+                   corners.tobytes() if corners is not None else None)
+            return cached_jpeg(key, render_board_snapshot)
         except Exception as e:
             print(f"[cv_web] snapshot_board error: {e}")
             return "보드 이미지 생성 실패", 500
 
+    @app.route("/cache_stats")
+    def cache_stats():
+        return jsonify(snapshot_cache.stats())
+
+    @app.route("/encode_stats")
+    def encode_stats():
+        return jsonify(get_encoder().stats())
+
 
     @app.route("/set_init_board", methods=["POST"])
     def set_init_board():
@@ -317,29 +448,112 @@ def build_app(state: Dict[str, Any]) -> Flask:
             return "프레임을 읽을 수 없습니다.", 500
         board_vals = cv_manager.save_initial_board_from_frame(frame, str(np_path))
         state["init_board_values"] = board_vals
+        monitor.notify()
         return "초기상태 저장 완료", 200
 
-    @app.route("/next_turn", methods=["POST"])
-    def next_turn():
-        try:
-            time.sleep(5.0)
-            result = cv_manager.process_turn_transition(
-                state["cap"],
-                str(np_path),
-                str(pkl_path),
-                state["chess_pieces"],
-                state["turn_color"],
-            )
-        except Exception as e:
-            return f"턴 전환 실패: {e}", 500
+    occupancy_path = np_path.with_name("occupancy_model.npz")
+
+    def occupancy_model() -> Optional[OccupancyModel]:
+        if state.get("occupancy") is None and occupancy_path.exists():
+            state["occupancy"] = OccupancyModel.load(occupancy_path)
+        return state.get("occupancy")
+
+    @app.route("/fit_occupancy", methods=["POST"])
+    def fit_occupancy():
+        """지금 프레임이 시작 배치라고 보고 칸 점유 분류기를 맞춘다."""
+        frame = capture_frame()
+        if frame is None:
+            return "프레임을 읽을 수 없습니다.", 500
+        model = OccupancyModel.fit_start_position(cv_manager.warp_with_manual_corners(frame, size=400))
+        model.save(occupancy_path)
+        state["occupancy"] = model
+        return "점유 분류기 학습 완료", 200
+
+    @app.route("/occupancy")
+    def occupancy():
+        """프레임 한 장의 칸 점유(0 빈칸/1 백/2 흑)와 현재 기물 배열과의 불일치."""
+        model = occupancy_model()
+        if model is None:
+            return jsonify({"error": "occupancy model not fitted (POST /fit_occupancy)"}), 404
+        frame = capture_frame()
+        if frame is None:
+            return jsonify({"error": "no frame"}), 500
+        pred = model.predict(cv_manager.warp_with_manual_corners(frame, size=400))
+        return jsonify({
+            "labels": pred.labels.tolist(),
+            "confidence": np.round(pred.confidence, 3).tolist(),
+            "mismatches": pred.mismatches(pieces_occupancy(state["chess_pieces"])),
+        })
+
+    def current_board() -> chess.Board:
+        """게임에 붙어 있으면 게임의 보드, 단독 실행이면 cv_web 이 들고 있는 보드."""
+        provider = state.get("board_provider")
+        return provider() if provider is not None else state["board"]
+
+    def run_next_turn(progress) -> Dict[str, Any]:
+        progress("settling", timeout=SETTLE_TIMEOUT)
+        settle = motion.wait_settled(SETTLE_TIMEOUT, progress=progress)
+        progress("detecting", settle=settle.to_dict())
+        board = current_board()
+        result = cv_manager.process_turn_transition(
+            state["cap"],
+            str(np_path),
+            str(pkl_path),
+            state["chess_pieces"],
+            state["turn_color"],
+            board=board,
+        )
+        if not result.get("committed", True):
+            # 움직임 없음/모호한 판정: 보드·기물 배열·턴 모두 그대로 둔다
+            return {
+                "committed": False,
+                "reason": result["reason"],
+                "candidate": result["candidate"],
+                "move_str": None,
+                "turn_color": state["turn_color"],
+                "prev_turn_color": state["prev_turn_color"],
+            }
+        # 게임 보드는 게임 루프가 진행시키고, 단독 실행일 때만 여기서 수를 둔다
+        if state.get("board_provider") is None and result.get("move"):
+            board.push(chess.Move.from_uci(result["move"]))
 
         state["turn_color"] = result["turn_color"]
         state["prev_turn_color"] = result["prev_turn_color"]
         state["init_board_values"] = result["init_board_values"]
         state["chess_pieces"] = result["chess_pieces"]
         state["move_history"].append(result["move_str"])
+        return {
+            "committed": True,
+            "move_str": result["move_str"],
+            "turn_color": result["turn_color"],
+            "prev_turn_color": result["prev_turn_color"],
+        }
+
+    @app.route("/next_turn", methods=["POST"])
+    def next_turn():
+        """턴 전환 작업을 시작하고 202 + 작업 id 를 돌려준다 (진행 중이면 그 작업).
 
-        return f"턴 전환 완료: {result['move_str']}", 200
+        ?wait=1 이면 예전처럼 끝날 때까지 기다렸다가 텍스트로 응답한다.
+        """
+        job, created = jobs.submit("next_turn", run_next_turn)
+        if request.args.get("wait") == "1":
+            job.done.wait(60.0)
+            if job.error is not None:
+                return f"턴 전환 실패: {job.error}", 500
+            if job.result is None:
+                return "턴 전환 시간 초과", 504
+            if not job.result["committed"]:
+                return f"턴 전환 안 함: {job.result['reason']} (후보 {job.result['candidate']})", 200
+            return f"턴 전환 완료: {job.result['move_str']}", 200
+        return jsonify({"job": job.to_dict(), "created": created,
+                        "status_url": f"/jobs/{job.id}"}), 202
+
+    @app.route("/jobs/<job_id>")
+    def job_status(job_id):
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "unknown job"}), 404
+        return jsonify(job.to_dict())
 
     @app.route("/set_corners", methods=["POST"])
     def set_corners():
@@ -524,8 +738,10 @@ def build_app(state: Dict[str, Any]) -> Flask:
           }
 
           loadSnapshot(true);
-          // 수동 설정 화면에서도 카메라 프레임을 주기적으로 갱신
-          setInterval(() => loadSnapshot(false), 500);
+          // 점을 찍기 전, 탭이 보일 때만 카메라 프레임을 갱신 (그 외에는 버튼으로)
+          setInterval(() => {
+            if (!document.hidden && points.length === 0) loadSnapshot(false);
+          }, 1000);
           </script>
         </body>
         </html>
@@ -541,17 +757,29 @@ def start_cv_web_server(
         host: str = "0.0.0.0",
         port: int = 5001,
         use_thread: bool = True,
-        cap = None
+        cap = None,
+        server: Optional[str] = None,
+        workers: Optional[int] = None,
+        board_provider: Optional[Callable[[], chess.Board]] = None
 ) -> threading.Thread | None:
-    """Flask CV 웹 서버를 시작한다. use_thread=True이면 데몬 스레드로 실행."""
+    """Flask CV 웹 서버를 시작한다. use_thread=True이면 데몬 스레드로 실행.
+
+    board_provider: 게임에 붙일 때 현재 chess.Board 를 돌려주는 함수 (예: game_state.current_board).
+    없으면 기물 배열로 만든 보드를 /next_turn 감지 결과로 직접 진행시킨다.
+
+    server: "production"(기본, 워커 수 제한) 또는 "dev"(Flask 개발 서버).
+    None 이면 CHESS_WEB_SERVER 환경 변수를 따른다 (cv.web_server 참고).
+    """
     if np_path is None:
         np_path = str(BASE_DIR / "init_board_values.npy")
     if pkl_path is None:
         pkl_path = str(BASE_DIR / "chess_pieces.pkl")
 
     if cap is None:
-        cap = USBCapture(rotate_90_cw=False, rotate_90_ccw=False, rotate_180=True)
-    safe_cap = ThreadSafeCapture(cap)
+        # CHESS_REPLAY=<영상|이미지 폴더|npz> 이면 카메라 대신 녹화 프레임을 재생
+        cap = capture_from_env(lambda: USBCapture(rotate_90_cw=False, rotate_90_ccw=False, rotate_180=True))
+    # 카메라 read 는 grab 스레드 하나만 하고, 라우트들은 최신 프레임 슬롯을 공유한다
+    safe_cap = cap if isinstance(cap, FrameGrabber) else FrameGrabber(cap)
 
     init_board_values = np.load(np_path) if os.path.exists(np_path) else None
     if os.path.exists(pkl_path):
@@ -572,13 +800,18 @@ def start_cv_web_server(
         "turn_color": "white",
         "prev_turn_color": "white",
         "move_history": [],
+        "stream_slots": stream_slots(workers),
+        "board": _board_from_pieces(chess_pieces, "white"),
+        "board_provider": board_provider,
     }
 
     app = build_app(state)
+    # 턴 사이 조명 변화는 칸별 배경 모델이 프레임 흐름으로 계속 따라간다
+    start_background_follower(safe_cap, np_path)
 
     def run_app():
         try:
-            app.run(host=host, port=port, debug=False, use_reloader=False)
+            serve(app, host=host, port=port, mode=server, workers=workers)
         finally:
             safe_cap.release()
 
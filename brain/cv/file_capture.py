@@ -0,0 +1,277 @@
+"""녹화 프레임을 카메라처럼 재생하는 캡처 (read()/release() 계약 동일).
+
+카메라 없는 개발 PC 에서 process_turn_transition, gen_edges_frames, 코너 검출기를
+프로파일링하거나, 현장에서 오검출이 난 프레임을 그대로 다시 돌려 볼 때 쓴다.
+
+소스:
+- 영상 파일 (cv2.VideoCapture 가 여는 것)
+- 이미지 디렉터리 (jpg/jpeg/png/bmp, 파일 이름 순)
+- .npz 프레임 묶음 (save_frames_npz 형식)
+    frames      (N,H,W,3) uint8                 ─ 원본 프레임 그대로, 또는
+    jpeg_data   (M,) uint8 + jpeg_offsets (N+1,) ─ JPEG 바이트를 이어 붙인 것
+    timestamps  (N,) float64, 선택                ─ 초 단위 (재생 시각 기준)
+
+재생 속도(pacing):
+- "realtime": 타임스탬프(없으면 fps) 간격에 맞춰 read() 가 기다린다
+- "fast": 기다리지 않고 최대한 빨리
+- "step": step() 을 부를 때마다 한 프레임씩 (디버거/대화형 재생용)
+
+read() 가 돌려주는 프레임은 frame_ring 버퍼에 복사된 것이라 실제 카메라 래퍼와
+수명 규칙이 같다 (RING_SIZE 번 뒤 read() 에서 덮어써짐).
+
+사용 예 (brain 디렉터리에서):
+    python -m cv.file_capture recording.npz --pacing fast
+CHESS_REPLAY 환경 변수에 소스 경로를 주면 cv_web 서버가 카메라 대신 이것을 쓴다.
+
+brain/cv, CV/, mjpg/ 에 같은 내용의 사본이 있다.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+try:
+    from cv.frame_ring import RING_SIZE, FrameRing
+except ImportError:
+    from frame_ring import RING_SIZE, FrameRing
+
+PACING_MODES = ("realtime", "fast", "step")
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+DEFAULT_FPS = 30.0
+REPLAY_ENV = "CHESS_REPLAY"
+
+
+def save_frames_npz(path: str, frames: Sequence[np.ndarray],
+                    timestamps: Optional[Sequence[float]] = None,
+                    jpeg_quality: Optional[int] = None) -> None:
+    """프레임 묶음을 FileCapture 가 읽는 .npz 로 저장한다.
+
+    jpeg_quality 를 주면 프레임을 JPEG 로 이어 붙여 저장한다(용량 ~1/10).
+    """
+    data: Dict[str, np.ndarray] = {}
+    if jpeg_quality is None:
+        data["frames"] = np.stack([np.asarray(f, dtype=np.uint8) for f in frames])
+    else:
+        chunks, offsets = [], [0]
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
+        for f in frames:
+            ok, buf = cv2.imencode(".jpg", f, params)
+            if not ok:
+                raise RuntimeError("JPEG 인코딩 실패")
+            chunks.append(buf.reshape(-1))
+            offsets.append(offsets[-1] + buf.size)
+        data["jpeg_data"] = np.concatenate(chunks) if chunks else np.zeros(0, np.uint8)
+        data["jpeg_offsets"] = np.asarray(offsets, dtype=np.int64)
+    if timestamps is not None:
+        data["timestamps"] = np.asarray(timestamps, dtype=np.float64)
+    np.savez_compressed(path, **data)
+    print(f"[file_capture] saved {len(frames)} frames to {path}")
+
+
+class FileCapture:
+    """영상/이미지 폴더/npz 를 USBCapture 와 같은 read()/release() 로 재생한다."""
+
+    def __init__(self, source: str, pacing: str = "fast", fps: Optional[float] = None,
+                 loop: bool = False, ring_size: int = RING_SIZE):
+        if pacing not in PACING_MODES:
+            raise ValueError(f"pacing must be one of {PACING_MODES}")
+        self.source = str(source)
+        self.pacing = pacing
+        self.loop = loop
+        self.index = 0                      # 다음에 읽을 프레임 번호
+        self.timestamp: Optional[float] = None  # 마지막으로 읽은 프레임의 재생 시각(초)
+        self._ring = FrameRing(ring_size)
+        self._step = threading.Semaphore(0)
+        self._closed = False
+        self._t0: Optional[float] = None
+
+        self._video: Optional[cv2.VideoCapture] = None
+        self._paths: List[str] = []
+        self._frames: Optional[np.ndarray] = None
+        self._jpeg: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        self._timestamps: Optional[np.ndarray] = None
+
+        if os.path.isdir(self.source):
+            for pat in IMAGE_PATTERNS:
+                self._paths.extend(glob.glob(os.path.join(self.source, pat)))
+            self._paths.sort()
+            if not self._paths:
+                raise FileNotFoundError(f"no images in {self.source}")
+            self.frame_count = len(self._paths)
+        elif self.source.lower().endswith(".npz"):
+            with np.load(self.source) as data:
+                if "frames" in data:
+                    self._frames = np.asarray(data["frames"])
+                    self.frame_count = int(self._frames.shape[0])
+                else:
+                    self._jpeg = np.asarray(data["jpeg_data"], dtype=np.uint8)
+                    self._offsets = np.asarray(data["jpeg_offsets"], dtype=np.int64)
+                    self.frame_count = int(self._offsets.size - 1)
+                if "timestamps" in data:
+                    ts = np.asarray(data["timestamps"], dtype=np.float64)
+                    self._timestamps = ts - ts[0] if ts.size else ts
+        else:
+            self._video = cv2.VideoCapture(self.source)
+            if not self._video.isOpened():
+                raise FileNotFoundError(f"cannot open video {self.source}")
+            self.frame_count = int(self._video.get(cv2.CAP_PROP_FRAME_COUNT))
+            if fps is None:
+                fps = self._video.get(cv2.CAP_PROP_FPS) or None
+        self.fps = float(fps) if fps else DEFAULT_FPS
+        print(f"[file_capture] {self.source}: {self.frame_count} frames, pacing={pacing}, fps={self.fps:.1f}")
+
+    # ------------------------------------------------------------------
+    def _frame_time(self, i: int) -> float:
+        if self._timestamps is not None and i < self._timestamps.size:
+            return float(self._timestamps[i])
+        return i / self.fps
+
+    def _load(self, i: int) -> Optional[np.ndarray]:
+        if self._frames is not None:
+            return self._frames[i]
+        if self._jpeg is not None:
+            a, b = int(self._offsets[i]), int(self._offsets[i + 1])
+            return cv2.imdecode(self._jpeg[a:b], cv2.IMREAD_COLOR)
+        if self._paths:
+            return cv2.imread(self._paths[i])
+        ok, frame = self._video.read()
+        return frame if ok else None
+
+    def _rewind(self) -> None:
+        self.index = 0
+        self._t0 = None
+        if self._video is not None:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def _at_end(self) -> bool:
+        return self.frame_count > 0 and self.index >= self.frame_count
+
+    def step(self, n: int = 1) -> None:
+        """step 모드에서 read() 가 n 프레임 더 진행하도록 허용한다."""
+        for _ in range(n):
+            self._step.release()
+
+    def read(self, timeout: Optional[float] = None):
+        if self._closed:
+            return False, None
+        if self._at_end():
+            if not self.loop:
+                return False, None
+            self._rewind()
+
+        if self.pacing == "step" and not self._step.acquire(timeout=timeout):
+            return False, None
+
+        frame = self._load(self.index)
+        if frame is None:
+            # 영상은 프레임 수가 부정확할 수 있다: 실제 끝에 닿으면 여기서 종료/반복
+            if self.loop and self.index > 0:
+                self._rewind()
+                frame = self._load(self.index)
+            if frame is None:
+                self.frame_count = self.index
+                return False, None
+
+        t = self._frame_time(self.index)
+        if self.pacing == "realtime":
+            now = time.monotonic()
+            if self._t0 is None:
+                self._t0 = now - t
+            delay = self._t0 + t - now
+            if delay > 0:
+                time.sleep(delay)
+
+        self.index += 1
+        self.timestamp = t
+        buf = self._ring.next(frame.shape, frame.dtype)
+        np.copyto(buf, frame)
+        return True, buf
+
+    def release(self) -> None:
+        self._closed = True
+        self._step.release()
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+
+def capture_from_env(default=None):
+    """CHESS_REPLAY 가 설정돼 있으면 그 소스를 재생하는 FileCapture, 아니면 default()."""
+    source = os.environ.get(REPLAY_ENV)
+    if source:
+        pacing = os.environ.get(REPLAY_ENV + "_PACING", "realtime")
+        return FileCapture(source, pacing=pacing, loop=True)
+    return default() if callable(default) else default
+
+
+def profile_corner_detectors(cap, limit: Optional[int] = None) -> Dict[str, float]:
+    """재생 프레임마다 전체/coarse 코너 검출기 시간을 잰다 (프레임당 평균 ms).
+
+    marker_detection 이 없는 디렉터리(mjpg/)에서는 프로파일 없이 프레임만 재생하고 {} 를 돌려준다.
+    """
+    try:
+        from cv.marker_detection import compare_detectors
+    except ImportError:
+        try:
+            from marker_detection import compare_detectors
+        except ImportError:
+            compare_detectors = None
+
+    def frames():
+        n = 0
+        while limit is None or n < limit:
+            ok, frame = cap.read()
+            if not ok:
+                return
+            n += 1
+            yield frame
+
+    if compare_detectors is None:
+        print("[file_capture] marker_detection not available, corner profiling skipped")
+        for _ in frames():
+            pass
+        return {}
+    return compare_detectors(frames())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="녹화 프레임 재생 + 코너 검출기 프로파일")
+    parser.add_argument("source", help="영상 파일, 이미지 폴더 또는 .npz")
+    parser.add_argument("--pacing", choices=PACING_MODES, default="fast")
+    parser.add_argument("--fps", type=float, default=None)
+    parser.add_argument("--limit", type=int, default=None, help="최대 프레임 수")
+    args = parser.parse_args(argv)
+    if args.pacing == "step":
+        parser.error("step pacing needs an interactive driver; use realtime or fast here")
+
+    cap = FileCapture(args.source, pacing=args.pacing, fps=args.fps)
+    t0 = time.perf_counter()
+    try:
+        profile_corner_detectors(cap, limit=args.limit)
+    finally:
+        cap.release()
+    print(f"[file_capture] replayed {cap.index} frames in {time.perf_counter() - t0:.2f}s")
+    return 0
+
+
+__all__ = [
+    'PACING_MODES',
+    'REPLAY_ENV',
+    'FileCapture',
+    'save_frames_npz',
+    'capture_from_env',
+    'profile_corner_detectors',
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
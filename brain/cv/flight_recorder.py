@@ -0,0 +1,225 @@
+"""최근 프레임 블랙박스 (검출 실패 시 디스크로 덤프).
+
+턴 처리에 쓰인 원본 프레임을 (정수 간격으로 솎아) 바이트 예산 안에서 링으로
+보관하고, 프레임마다 계산한 8x8 칸 통계도 함께 둔다. 이동 판정이 실패하면
+dump() 가 백그라운드 스레드에서 .npz 로 써서, 나중에 FileCapture 로 같은 프레임을
+그대로 재생할 수 있다 (python -m cv.file_capture <덤프.npz>).
+
+정상 경로 비용:
+- record() 는 솎은 프레임 복사 한 번뿐 (리사이즈/JPEG 인코딩 없음, 원본 버퍼는 참조하지 않음)
+- JPEG 인코딩과 디스크 I/O 는 dump() 때만, 그것도 별도 스레드에서
+
+덤프 형식 (file_capture 와 같은 키 + 부가 정보):
+    jpeg_data, jpeg_offsets   또는 frames (축소 원본 모드)
+    timestamps  (N,) 초, 첫 프레임 기준
+    stats       (N,8,8,C) float32 (통계가 없는 프레임은 NaN)
+    extra_<이름> 덤프 호출자가 넘긴 배열 (norms 등)
+    meta        JSON 문자열 (reason, 원본 크기, 시각 등)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+FLIGHT_RECORD_DIR = BASE_DIR / "flight_records"
+
+BYTE_BUDGET = 16 * 1024 * 1024  # 링 전체 상한 (솎은 원본 기준, 640x480 이면 약 18장)
+MAX_WIDTH = 640                 # 이 폭 이하가 되도록 정수 간격으로 솎아 보관
+JPEG_QUALITY = 80               # 덤프 때 JPEG 품질. None 이면 솎은 원본 그대로 저장
+MIN_DUMP_INTERVAL = 5.0         # 연속 실패 때 덤프 간격(초)
+MAX_DUMP_FILES = 20             # 디렉터리에 남길 최대 덤프 수
+
+
+class RecordedFrame(NamedTuple):
+    data: np.ndarray               # 솎은 프레임 (인코딩은 덤프 때)
+    timestamp: float               # time.monotonic()
+    stats: Optional[np.ndarray]    # (8,8,C) 칸 통계
+    source_shape: tuple
+    nbytes: int
+
+
+class FlightRecorder:
+    """바이트 예산 안에서 최근 프레임/칸 통계를 보관하고 실패 시 덤프한다."""
+
+    def __init__(self, byte_budget: int = BYTE_BUDGET, max_width: int = MAX_WIDTH,
+                 jpeg_quality: Optional[int] = JPEG_QUALITY, out_dir=FLIGHT_RECORD_DIR,
+                 min_dump_interval: float = MIN_DUMP_INTERVAL, max_files: int = MAX_DUMP_FILES,
+                 enabled: bool = True):
+        self.byte_budget = int(byte_budget)
+        self.max_width = int(max_width)
+        self.jpeg_quality = jpeg_quality
+        self.out_dir = Path(out_dir)
+        self.min_dump_interval = float(min_dump_interval)
+        self.max_files = int(max_files)
+        self.enabled = enabled
+        self._frames: Deque[RecordedFrame] = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._last_dump = -1e9
+        self._writers: List[threading.Thread] = []
+        self.recorded = 0
+        self.dumps = 0
+
+    # ------------------------------------------------------------------
+    def _downscale(self, frame: np.ndarray) -> np.ndarray:
+        """폭이 max_width 이하가 되도록 정수 간격으로 솎은 복사본 (보간 없이 메모리 복사만)."""
+        step = -(-frame.shape[1] // self.max_width) if self.max_width > 0 else 1
+        if step > 1:
+            frame = frame[::step, ::step]
+        return np.ascontiguousarray(frame) if step > 1 else frame.copy()
+
+    def _encode(self, frames: List[RecordedFrame]) -> List[np.ndarray]:
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), int(self.jpeg_quality or 95)]
+        bufs = []
+        for f in frames:
+            ok, buf = cv2.imencode(".jpg", f.data, params)
+            if not ok:
+                raise RuntimeError("JPEG 인코딩 실패")
+            bufs.append(buf.reshape(-1))
+        return bufs
+
+    def record(self, frame: np.ndarray, stats: Optional[np.ndarray] = None,
+               timestamp: Optional[float] = None) -> None:
+        """프레임(과 칸 통계)을 링에 넣는다. 예산을 넘으면 오래된 것부터 버린다."""
+        if not self.enabled or frame is None:
+            return
+        try:
+            data = self._downscale(frame)
+        except Exception as e:
+            print(f"[flight_recorder] record failed: {e}")
+            return
+        st = None if stats is None else np.array(stats, dtype=np.float32)
+        nbytes = data.nbytes + (st.nbytes if st is not None else 0)
+        item = RecordedFrame(data, time.monotonic() if timestamp is None else timestamp,
+                             st, tuple(frame.shape), nbytes)
+        with self._lock:
+            self._frames.append(item)
+            self._bytes += nbytes
+            while self._bytes > self.byte_budget and len(self._frames) > 1:
+                self._bytes -= self._frames.popleft().nbytes
+            self.recorded += 1
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+
+    # ------------------------------------------------------------------
+    def dump(self, reason: str, extra: Optional[Dict[str, Any]] = None,
+             force: bool = False) -> Optional[Path]:
+        """현재 링을 .npz 로 비동기 저장하고 경로를 반환 (간격 제한에 걸리면 None).
+
+        extra 의 배열 값은 extra_<키> 로, 나머지는 meta JSON 에 들어간다.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not self._frames:
+                return None
+            if not force and now - self._last_dump < self.min_dump_interval:
+                print(f"[flight_recorder] dump skipped (rate limit): {reason}")
+                return None
+            self._last_dump = now
+            frames = list(self._frames)
+        self.dumps += 1
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = self.out_dir / f"flight_{stamp}_{self.dumps:03d}.npz"
+        t = threading.Thread(target=self._write, args=(path, frames, reason, dict(extra or {})),
+                             name="flight-recorder-dump", daemon=True)
+        t.start()
+        self._writers = [w for w in self._writers if w.is_alive()] + [t]
+        print(f"[flight_recorder] dumping {len(frames)} frames -> {path} ({reason})")
+        return path
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """진행 중인 덤프가 끝날 때까지 기다린다 (종료 직전/도구용)."""
+        for t in list(self._writers):
+            t.join(timeout)
+
+    def _write(self, path: Path, frames: List[RecordedFrame], reason: str,
+               extra: Dict[str, Any]) -> None:
+        try:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            data: Dict[str, np.ndarray] = {}
+            if self.jpeg_quality is None and len({f.data.shape for f in frames}) == 1:
+                data["frames"] = np.stack([f.data for f in frames])
+            else:
+                # JPEG 모드이거나 크기가 섞였으면 (재생 가능하도록) 여기서 한꺼번에 인코딩
+                bufs = self._encode(frames)
+                data["jpeg_data"] = np.concatenate(bufs)
+                data["jpeg_offsets"] = np.concatenate([[0], np.cumsum([b.size for b in bufs])]).astype(np.int64)
+            ts = np.array([f.timestamp for f in frames], dtype=np.float64)
+            data["timestamps"] = ts - ts[0]
+            stat_shape = next((f.stats.shape for f in frames if f.stats is not None), None)
+            if stat_shape is not None:
+                stats = np.full((len(frames),) + stat_shape, np.nan, np.float32)
+                for k, f in enumerate(frames):
+                    if f.stats is not None and f.stats.shape == stat_shape:
+                        stats[k] = f.stats
+                data["stats"] = stats
+            meta: Dict[str, Any] = {
+                "reason": reason,
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "source_shape": list(frames[-1].source_shape),
+                "n_frames": len(frames),
+            }
+            for key, value in extra.items():
+                if isinstance(value, np.ndarray):
+                    data[f"extra_{key}"] = value
+                else:
+                    meta[key] = value
+            data["meta"] = np.array(json.dumps(meta, ensure_ascii=False, default=str))
+            # 임시 파일은 _prune 의 flight_*.npz 글롭에 걸리지 않는 이름으로
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.savez_compressed(f, **data)
+            os.replace(tmp, path)
+            self._prune()
+            print(f"[flight_recorder] saved {path}")
+        except Exception as e:
+            print(f"[flight_recorder] dump failed: {e}")
+
+    def _prune(self) -> None:
+        files = sorted(self.out_dir.glob("flight_*.npz"), key=lambda p: p.stat().st_mtime)
+        for old in files[:-self.max_files] if self.max_files > 0 else []:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+def load_flight_record(path) -> Dict[str, Any]:
+    """덤프 파일의 meta/stats/extra 를 읽는다 (프레임은 FileCapture 로 재생)."""
+    with np.load(str(path)) as data:
+        out: Dict[str, Any] = {"meta": json.loads(str(data["meta"])) if "meta" in data else {}}
+        if "stats" in data:
+            out["stats"] = np.asarray(data["stats"])
+        out["timestamps"] = np.asarray(data["timestamps"]) if "timestamps" in data else None
+        for key in data.files:
+            if key.startswith("extra_"):
+                out[key[len("extra_"):]] = np.asarray(data[key])
+    return out
+
+
+__all__ = [
+    'FLIGHT_RECORD_DIR',
+    'RecordedFrame',
+    'FlightRecorder',
+    'load_flight_record',
+]
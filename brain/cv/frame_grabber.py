@@ -0,0 +1,146 @@
+"""최신 프레임 한 장만 유지하는 캡처 스레드.
+
+카메라 read() 는 전용 grab 스레드 하나만 호출하고, 소비자(웹 라우트, 턴 처리,
+MJPEG 스트림)는 슬롯에 놓인 최신 프레임을 가져간다. 프레임마다 순번(seq)과
+단조 시각(time.monotonic) 이 붙으므로,
+- latest(min_seq=...) : 지금 가장 새 프레임 (min_seq 이상이 올 때까지만 대기)
+- wait_next(after_seq) : after_seq 보다 새 프레임이 올 때까지 대기
+로 필요한 만큼만 기다린다. 요청 한 번에 락 한 번, V4L2 버퍼 비우기용 read 가 없다.
+
+read() 는 cv2.VideoCapture 와 같은 (ret, frame) 인터페이스다. 호출한 스레드가
+마지막으로 받은 seq 를 기억해 매번 그보다 새 프레임을 돌려주므로, 여러 장을 평균하는
+기존 코드(capture_avg_lab_board 등)가 같은 프레임을 두 번 받지 않는다.
+
+슬롯의 프레임은 여러 소비자가 함께 보므로 읽기 전용으로 다루고, 그릴 때는 copy() 한다.
+캡처 래퍼가 링 버퍼(frame_ring)를 쓰면 RING_SIZE 프레임 뒤에 덮어써지므로,
+그보다 오래 보관할 프레임도 copy() 한다.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class GrabbedFrame(NamedTuple):
+    frame: np.ndarray
+    seq: int          # 1부터 증가하는 프레임 순번
+    timestamp: float  # time.monotonic() 기준 grab 시각
+
+
+class FrameGrabber:
+    """cap.read() 를 전용 스레드에서 돌리고 최신 프레임 한 장만 보관하는 래퍼."""
+
+    def __init__(self, cap, *, start: bool = True, retry_sleep: float = 0.01,
+                 name: str = "frame-grabber"):
+        self._cap = cap
+        self._retry_sleep = float(retry_sleep)
+        self._name = name
+        self._cond = threading.Condition()
+        self._latest: Optional[GrabbedFrame] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._local = threading.local()
+        self._failures = 0
+        self._started_at = time.monotonic()
+        if start:
+            self.start()
+
+    # ------------------------------------------------------------------
+    # grab 스레드
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                ret, frame = self._cap.read()
+            except Exception as e:
+                print(f"[frame_grabber] read error: {e}")
+                ret, frame = False, None
+            if not ret or frame is None:
+                self._failures += 1
+                time.sleep(self._retry_sleep)
+                continue
+            now = time.monotonic()
+            with self._cond:
+                seq = self._latest.seq + 1 if self._latest is not None else 1
+                self._latest = GrabbedFrame(frame, seq, now)
+                self._cond.notify_all()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self) -> None:
+        """grab 스레드를 멈추고 원본 캡처도 해제한다."""
+        self.stop()
+        if hasattr(self._cap, "release"):
+            self._cap.release()
+
+    # ------------------------------------------------------------------
+    # 소비자 API
+    # ------------------------------------------------------------------
+    @property
+    def seq(self) -> int:
+        """지금까지 받은 마지막 프레임 순번 (아직 없으면 0)."""
+        latest = self._latest
+        return latest.seq if latest is not None else 0
+
+    def latest(self, min_seq: int = 1, timeout: Optional[float] = 1.0) -> Optional[GrabbedFrame]:
+        """seq >= min_seq 인 최신 프레임. 이미 있으면 바로 반환, timeout 안에 없으면 None."""
+        with self._cond:
+            ok = self._cond.wait_for(
+                lambda: self._stop.is_set() or (self._latest is not None and self._latest.seq >= min_seq),
+                timeout,
+            )
+            latest = self._latest
+        if not ok or latest is None or latest.seq < min_seq:
+            return None
+        return latest
+
+    def wait_next(self, after_seq: Optional[int] = None,
+                  timeout: Optional[float] = 1.0) -> Optional[GrabbedFrame]:
+        """after_seq(None 이면 지금 seq) 보다 새 프레임이 들어올 때까지 대기."""
+        if after_seq is None:
+            after_seq = self.seq
+        return self.latest(min_seq=after_seq + 1, timeout=timeout)
+
+    def read(self, timeout: float = 1.0) -> Tuple[bool, Optional[np.ndarray]]:
+        """cap.read() 호환. 이 스레드가 마지막으로 받은 프레임보다 새 프레임을 반환."""
+        last = getattr(self._local, "seq", 0)
+        grabbed = self.latest(min_seq=last + 1, timeout=timeout)
+        if grabbed is None:
+            return False, None
+        self._local.seq = grabbed.seq
+        return True, grabbed.frame
+
+    def stats(self) -> Dict[str, float]:
+        latest = self._latest
+        frames = latest.seq if latest is not None else 0
+        elapsed = max(time.monotonic() - self._started_at, 1e-6)
+        return {
+            "frames": frames,
+            "failures": self._failures,
+            "fps": frames / elapsed,
+            "age_ms": (time.monotonic() - latest.timestamp) * 1000.0 if latest is not None else float("nan"),
+        }
+
+
+__all__ = [
+    'GrabbedFrame',
+    'FrameGrabber',
+]
@@ -0,0 +1,143 @@
+"""오래 걸리는 작업(턴 전환 등)을 요청 스레드 밖에서 돌리는 작업 큐.
+
+예전 /next_turn 은 요청 스레드에서 5초 sleep + 캡처/판정을 끝까지 하고 응답했다.
+그동안 서버 워커 하나가 묶이고, 브라우저는 응답이 올 때까지 아무 진행 상황도 모른다.
+
+- JobRunner.submit(kind, fn): 작업을 등록하고 바로 Job 을 돌려준다 (HTTP 202).
+  fn(progress) 는 워커 스레드 하나에서 순서대로 실행되고, progress(stage, **info) 로
+  진행 단계를 남긴다.
+- exclusive=True 이면 같은 kind 가 이미 대기/실행 중일 때 새로 만들지 않고 그 작업을 돌려준다
+  (버튼 연타로 턴 전환이 두 번 도는 것 방지).
+- 완료된 작업은 최근 max_kept 개만 보관한다 (/jobs/<id> 폴링용).
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+MAX_KEPT_JOBS = 32
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    """작업 하나의 상태. to_dict() 가 /jobs/<id> 응답 본문이 된다."""
+
+    def __init__(self, job_id: str, kind: str):
+        self.id = job_id
+        self.kind = kind
+        self.state = QUEUED
+        self.stage = "queued"
+        self.info: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.state in (QUEUED, RUNNING)
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished if self.finished is not None else time.time()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "stage": self.stage,
+            "info": self.info,
+            "result": self.result,
+            "error": self.error,
+            "elapsed": round(end - (self.started or self.created), 3),
+        }
+
+
+class JobRunner:
+    """작업을 워커 스레드(기본 1개)에서 순서대로 실행한다."""
+
+    def __init__(self, workers: int = 1, max_kept: int = MAX_KEPT_JOBS,
+                 on_change: Optional[Callable[[Job], None]] = None):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.max_kept = int(max_kept)
+        self.on_change = on_change
+
+    def _notify(self, job: Job) -> None:
+        if self.on_change is not None:
+            try:
+                self.on_change(job)
+            except Exception as e:
+                print(f"[jobs] on_change error: {e}")
+
+    def submit(self, kind: str, fn: Callable[[Callable[..., None]], Any],
+               exclusive: bool = True) -> Tuple[Job, bool]:
+        """(작업, 새로 만들었는지) 반환. exclusive 이면 진행 중인 같은 kind 작업을 재사용."""
+        with self._lock:
+            if exclusive:
+                for job in self._jobs.values():
+                    if job.kind == kind and job.active:
+                        return job, False
+            job = Job(f"{kind}-{next(self._ids)}", kind)
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job, fn)
+        return job, True
+
+    def _run(self, job: Job, fn: Callable[[Callable[..., None]], Any]) -> None:
+        def progress(stage: str, **info: Any) -> None:
+            job.stage = stage
+            job.info.update(info)
+            self._notify(job)
+
+        job.state, job.started = RUNNING, time.time()
+        progress("running")
+        try:
+            job.result = fn(progress)
+            job.state, job.stage = DONE, "done"
+        except Exception as e:
+            job.error = str(e)
+            job.state, job.stage = FAILED, "failed"
+            print(f"[jobs] {job.id} failed: {e}")
+        finally:
+            job.finished = time.time()
+            job.done.set()
+            self._notify(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active(self, kind: Optional[str] = None) -> Optional[Job]:
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                if job.active and (kind is None or job.kind == kind):
+                    return job
+        return None
+
+    def _prune(self) -> None:
+        # 끝난 작업부터 오래된 순으로 정리 (진행 중인 작업은 남긴다)
+        excess = len(self._jobs) - self.max_kept
+        for job_id in [j.id for j in self._jobs.values() if not j.active][:max(0, excess)]:
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+__all__ = [
+    'Job',
+    'JobRunner',
+    'QUEUED',
+    'RUNNING',
+    'DONE',
+    'FAILED',
+]
@@ -0,0 +1,197 @@
+"""JPEG 인코딩 풀 + 스트림별 적응형 품질/축소.
+
+예전에는 _encode_jpeg / _jpeg_bytes / cv2.imencode 를 요청/제너레이터 스레드에서 고정
+품질(45~80)로 바로 불렀다. 미리보기 스트림이 여러 개면 인코딩이 동시에 코어를 다 써서
+검출 스레드가 밀린다.
+
+- JpegEncoder: 작은 스레드 풀(cv2.imencode 는 GIL 을 풀어 실제로 병렬). 동시에 도는
+  인코딩 수가 워커 수로 묶이므로 나머지 코어는 검출 쪽에 남는다.
+  encode() 는 결과를 기다리고, submit() 은 Future 를 돌려준다.
+- StreamProfile: 스트림마다 프레임 크기(target_kb) 또는 비트레이트(target_kbps, fps)
+  목표와 인코딩 시간 예산(max_encode_ms)을 정하면, 최근 출력 크기/인코딩 시간 EMA 로
+  품질과 축소 배율을 자동 조절한다.
+    크기 초과 → 품질 먼저 낮추고, 최저 품질이면 축소
+    크기 여유 → 축소부터 되돌리고, 원본 크기면 품질 올림
+    시간 초과 → 축소
+- get_encoder(): 프로세스 공용 인코더 (첫 호출 때 생성)
+
+brain/cv, CV/, mjpg/ 에 같은 내용의 사본이 있다.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUALITY = 70
+
+_EMA = 0.2
+_QUALITY_STEP = 5
+_SCALE_STEP = 0.85
+
+
+class StreamProfile:
+    """스트림 하나의 인코딩 목표와 현재 품질/축소 상태."""
+
+    def __init__(self, name: str, *, target_kb: Optional[float] = None,
+                 target_kbps: Optional[float] = None, fps: float = 15.0,
+                 max_encode_ms: float = 20.0, quality: int = DEFAULT_QUALITY,
+                 q_min: int = 35, q_max: int = 85, min_scale: float = 0.5):
+        self.name = name
+        if target_kb is None and target_kbps is not None:
+            target_kb = target_kbps / 8.0 / max(fps, 1e-3)
+        self.target_bytes = None if target_kb is None else float(target_kb) * 1024.0
+        self.max_encode_ms = float(max_encode_ms)
+        self.q_min, self.q_max = int(q_min), int(q_max)
+        self.min_scale = float(min_scale)
+        self.quality = int(np.clip(quality, self.q_min, self.q_max))
+        self.scale = 1.0
+        self.avg_bytes: Optional[float] = None
+        self.avg_ms: Optional[float] = None
+        self.frames = 0
+        self._lock = threading.Lock()
+
+    def settings(self) -> Tuple[int, float]:
+        with self._lock:
+            return self.quality, self.scale
+
+    def observe(self, nbytes: int, encode_ms: float) -> None:
+        """인코딩 결과를 반영해 다음 프레임의 품질/축소를 정한다."""
+        with self._lock:
+            self.frames += 1
+            self.avg_bytes = nbytes if self.avg_bytes is None else (1 - _EMA) * self.avg_bytes + _EMA * nbytes
+            self.avg_ms = encode_ms if self.avg_ms is None else (1 - _EMA) * self.avg_ms + _EMA * encode_ms
+
+            if self.avg_ms > self.max_encode_ms and self.scale > self.min_scale:
+                self.scale = max(self.min_scale, self.scale * _SCALE_STEP)
+                return
+            if self.target_bytes is None:
+                return
+            if self.avg_bytes > self.target_bytes * 1.15:
+                if self.quality > self.q_min:
+                    self.quality = max(self.q_min, self.quality - _QUALITY_STEP)
+                elif self.scale > self.min_scale:
+                    self.scale = max(self.min_scale, self.scale * _SCALE_STEP)
+            elif self.avg_bytes < self.target_bytes * 0.7 and self.avg_ms < self.max_encode_ms * 0.7:
+                if self.scale < 1.0:
+                    self.scale = min(1.0, self.scale / _SCALE_STEP)
+                elif self.quality < self.q_max:
+                    self.quality = min(self.q_max, self.quality + _QUALITY_STEP)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "quality": self.quality,
+                "scale": round(self.scale, 3),
+                "avg_kb": round((self.avg_bytes or 0.0) / 1024.0, 1),
+                "avg_ms": round(self.avg_ms or 0.0, 2),
+                "target_kb": None if self.target_bytes is None else round(self.target_bytes / 1024.0, 1),
+                "frames": self.frames,
+            }
+
+
+def _encode(img: np.ndarray, quality: int, scale: float) -> Tuple[bytes, float]:
+    t0 = time.perf_counter()
+    if scale < 0.999:
+        h, w = img.shape[:2]
+        img = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))),
+                         interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    if not ok:
+        raise RuntimeError("JPEG 인코딩 실패")
+    return buf.tobytes(), (time.perf_counter() - t0) * 1000.0
+
+
+class JpegEncoder:
+    """cv2.imencode 를 작은 스레드 풀에서 돌리는 인코더."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = max(1, int(workers))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="jpeg")
+        self._profiles: Dict[str, StreamProfile] = {}
+
+    def _job(self, img: np.ndarray, profile: Optional[StreamProfile],
+             quality: Optional[int]) -> bytes:
+        if profile is None:
+            data, _ = _encode(img, DEFAULT_QUALITY if quality is None else int(np.clip(quality, 10, 95)), 1.0)
+            return data
+        q, scale = profile.settings()
+        data, ms = _encode(img, q, scale)
+        profile.observe(len(data), ms)
+        return data
+
+    def submit(self, img: np.ndarray, profile: Optional[StreamProfile] = None,
+               quality: Optional[int] = None) -> "Future[bytes]":
+        """인코딩을 풀에 넣고 Future 반환. img 는 결과가 나올 때까지 바꾸지 않는다."""
+        if profile is not None:
+            self._profiles.setdefault(profile.name, profile)
+        return self._pool.submit(self._job, img, profile, quality)
+
+    def encode(self, img: np.ndarray, profile: Optional[StreamProfile] = None,
+               quality: Optional[int] = None) -> bytes:
+        """풀에서 인코딩하고 결과를 기다린다. profile 이 없으면 quality(기본 70) 고정."""
+        return self.submit(img, profile, quality).result()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {name: p.stats() for name, p in self._profiles.items()}
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+_shared: Optional[JpegEncoder] = None
+_shared_lock = threading.Lock()
+
+
+def get_encoder() -> JpegEncoder:
+    """프로세스 공용 인코더. 워커 수는 min(DEFAULT_WORKERS, CPU 수 - 1)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = JpegEncoder(max(1, min(DEFAULT_WORKERS, (os.cpu_count() or 2) - 1)))
+        return _shared
+
+
+def benchmark_encoder(size=(1280, 720), n_frames: int = 60, streams: int = 3) -> Dict[str, float]:
+    """스트림 streams 개가 동시에 인코딩할 때: 스레드별 직접 인코딩 vs 공용 풀."""
+    w, h = size
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 255, (h, w, 3), dtype=np.uint8), (9, 9), 0)
+
+    def run(fn) -> float:
+        threads = [threading.Thread(target=lambda: [fn() for _ in range(n_frames)]) for _ in range(streams)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return (time.perf_counter() - t0) * 1000.0 / (n_frames * streams)
+
+    direct = run(lambda: _encode(img, 80, 1.0))
+    enc = JpegEncoder()
+    profile = StreamProfile("bench", target_kb=40, max_encode_ms=15)
+    pooled = run(lambda: enc.encode(img, profile))
+    enc.shutdown()
+    print(f"[jpeg_encoder] {streams} streams x {n_frames} frames {w}x{h}: "
+          f"direct q80 {direct:.2f} ms/frame, pool({enc.workers}) adaptive {pooled:.2f} ms/frame "
+          f"-> {profile.stats()}")
+    return {"direct_ms": direct, "pooled_ms": pooled, **profile.stats()}
+
+
+__all__ = [
+    'StreamProfile',
+    'JpegEncoder',
+    'get_encoder',
+    'benchmark_encoder',
+]
+
+
+if __name__ == "__main__":
+    benchmark_encoder()
@@ -0,0 +1,130 @@
+"""보드 안정(손이 빠지고 화면이 멈춤) 감지.
+
+예전 턴 처리는 고정 sleep 으로 손이 빠지기를 기다렸다 (game_loop 버튼 뒤 1초,
+cv_web /next_turn 5초). 너무 짧으면 손이 찍히고, 길면 그만큼 로봇 응답이 늦어진다.
+
+MotionMonitor.wait_settled() 는 FrameGrabber 의 새 프레임마다 칸별 LAB 평균
+(frame_lab_means, 감지용 작은 와프라 프레임당 수 ms) 을 구해
+
+- motion  : 직전 프레임과의 칸별 변화량 최대값
+- changed : 기준(background_model 칸별 모델) 대비 칸별 z 문턱을 넘은 칸 수
+
+를 본다. motion 이 MOTION_THRESHOLD 미만인 프레임이 STABLE_FRAMES 장(그리고
+MIN_STABLE_SEC 이상) 이어지고, changed 가 MAX_CHANGED 이하이면 안정으로 판정한다.
+손이 판 위에 멈춰 있으면 motion 은 작아도 여러 칸이 기준과 달라 changed 가 커지므로
+(수 하나는 최대 4칸) 가림 상태로 보고 계속 기다린다. timeout 이 지나면 그대로 진행한다.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+import numpy as np
+
+from cv import cv_manager
+from cv.background_model import get_background_model
+
+MOTION_THRESHOLD = 4.0  # 프레임 간 칸 평균 LAB 변화 (노이즈 수준 위)
+CHANGE_THRESHOLD = 9.0  # 기준 대비 '바뀐 칸' 문턱 (normalized_norms 단위, process_turn_transition 과 동일)
+MAX_CHANGED = 6         # 이보다 많은 칸이 바뀌어 있으면 손/팔이 가리고 있다고 본다
+STABLE_FRAMES = 4
+MIN_STABLE_SEC = 0.2
+SETTLE_TIMEOUT = 5.0
+
+
+class SettleResult(NamedTuple):
+    settled: bool       # False 이면 timeout (또는 프레임 없음)
+    waited: float       # 초
+    frames: int         # 본 프레임 수
+    seq: int            # 안정 판정한 프레임 순번
+    motion: float       # 마지막 프레임 간 변화량 최대값
+    changed: int        # 기준 대비 바뀐 칸 수 (-1: 기준 없음)
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = self._asdict()
+        d["waited"] = round(self.waited, 3)
+        d["motion"] = round(self.motion, 1)
+        return d
+
+
+class MotionMonitor:
+    """FrameGrabber 프레임 흐름에서 '보드가 안정됐는지' 를 판정한다."""
+
+    def __init__(self, cap, np_path=None, *, motion_threshold: float = MOTION_THRESHOLD,
+                 change_threshold: float = CHANGE_THRESHOLD, max_changed: int = MAX_CHANGED,
+                 stable_frames: int = STABLE_FRAMES, min_stable_sec: float = MIN_STABLE_SEC):
+        self._cap = cap
+        self._np_path = np_path
+        self.motion_threshold = float(motion_threshold)
+        self.change_threshold = float(change_threshold)
+        self.max_changed = int(max_changed)
+        self.stable_frames = int(stable_frames)
+        self.min_stable_sec = float(min_stable_sec)
+        self._bufs = (np.empty((8, 8, 3), np.float32), np.empty((8, 8, 3), np.float32))
+
+    @property
+    def cap(self):
+        return self._cap
+
+    def _changed(self, curr: np.ndarray, model) -> int:
+        if model is None:
+            return -1
+        return int(np.count_nonzero(model.normalized_norms(curr) >= self.change_threshold))
+
+    def wait_settled(self, timeout: float = SETTLE_TIMEOUT,
+                     progress: Optional[Callable[..., None]] = None) -> SettleResult:
+        """보드가 안정될 때까지 (최대 timeout 초) 새 프레임을 보며 기다린다.
+
+        progress 를 주면 상태가 바뀔 때 progress("settling", motion=, changed=, phase=) 를 부른다.
+        """
+        t0 = time.monotonic()
+        deadline = t0 + float(timeout)
+        model = get_background_model(self._np_path) if self._np_path is not None else None
+        prev: Optional[np.ndarray] = None
+        stable, stable_since = 0, t0
+        frames, seq, motion, changed = 0, 0, float("inf"), -1
+        last_phase = None
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            grabbed = self._cap.wait_next(seq or None, timeout=min(1.0, deadline - now))
+            if grabbed is None:
+                continue
+            seq = grabbed.seq
+            frames += 1
+            curr = cv_manager.frame_lab_means(grabbed.frame, out=self._bufs[frames % 2])
+            if prev is None:
+                prev = curr
+                continue
+            motion = float(np.sqrt(((curr - prev) ** 2).sum(axis=2).max()))
+            prev = curr
+            if motion >= self.motion_threshold:
+                stable, phase = 0, "moving"
+            else:
+                changed = self._changed(curr, model)
+                if changed > self.max_changed:
+                    stable, phase = 0, "occluded"
+                else:
+                    if stable == 0:
+                        stable_since = grabbed.timestamp
+                    stable, phase = stable + 1, "stable"
+            if progress is not None and phase != last_phase:
+                progress("settling", motion=round(motion, 1), changed=changed, phase=phase)
+            last_phase = phase
+            if stable >= self.stable_frames and grabbed.timestamp - stable_since >= self.min_stable_sec:
+                return SettleResult(True, time.monotonic() - t0, frames, seq, motion, changed)
+        print(f"[motion_monitor] not settled after {timeout:.1f}s "
+              f"(frames={frames}, motion={motion:.1f}, changed={changed})")
+        return SettleResult(False, time.monotonic() - t0, frames, seq, motion, changed)
+
+
+__all__ = [
+    'MOTION_THRESHOLD',
+    'MAX_CHANGED',
+    'STABLE_FRAMES',
+    'SETTLE_TIMEOUT',
+    'SettleResult',
+    'MotionMonitor',
+]
@@ -0,0 +1,222 @@
+"""합법 수 전체를 한 번에 점수 매기는 이동 추론.
+
+예전 흐름은 변화량 상위 2칸을 먼저 고르고(_pair_moves / 폴백), 그 다음에
+_resolve_move_from_coords 로 합법인지 확인했다. 캐슬링(4칸)/앙파상(3칸)은 2칸 쌍으로
+표현되지 않고, 쌍 순위가 한 번 틀리면 그 턴을 놓친다.
+
+여기서는 현재 국면의 합법 수마다 "바뀌어야 하는 칸" 집합을 64칸 0/1 행으로 미리 만든다
+(E: 수 x 64). 칸별 변화량 norms 가 들어오면
+
+    scores = E @ (norms - tau)
+
+행렬-벡터 곱 한 번으로 모든 후보를 점수 매긴다. 기대 칸이 문턱 tau 보다 많이 바뀔수록
+점수가 오르고, 바뀌지 않은 기대 칸은 점수를 깎는다. 그래서 캐슬링은 룩 칸까지 바뀌었을 때만
+킹 단독 이동보다 높게 나온다.
+
+- 같은 칸 집합을 바꾸는 수(프로모션 4종)는 카메라로 구분할 수 없으므로 한 행으로 묶고
+  퀸 프로모션을 대표로 쓴다.
+- margin = 1등 - 2등 점수, confidence = softmax(scores / temperature) 의 1등 확률.
+- E 는 국면(FEN)별로 캐시한다. 국면당 한 번 python-chess 로 합법 수를 만들고, 추론 자체는
+  64 길이 곱셈/argmax 뿐이다.
+
+칸 인덱스는 cv 격자 순서(k = i*8 + j, i=0 이 8랭크)이고, chess 칸 번호와는
+square = (7 - i) * 8 + j 관계다.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+import chess
+import numpy as np
+
+THRESHOLD = 9.0         # process_turn_transition 기본 문턱과 동일
+TEMPERATURE = 9.0       # softmax 온도 (문턱 하나만큼 점수 차 → e 배)
+MIN_MARGIN = 4.0        # 이보다 작으면 모호한 판정으로 표시
+CACHE_SIZE = 8
+
+
+def cell_of_square(square: int) -> int:
+    """chess 칸 번호 → cv 격자 인덱스 (i*8 + j)."""
+    return (7 - chess.square_rank(square)) * 8 + chess.square_file(square)
+
+
+def square_of_cell(k: int) -> int:
+    """cv 격자 인덱스 → chess 칸 번호."""
+    return (7 - k // 8) * 8 + k % 8
+
+
+def changed_cells(board: chess.Board, move: chess.Move) -> Tuple[int, ...]:
+    """move 로 점유 상태/기물이 바뀌는 칸 (cv 격자 인덱스, 정렬)."""
+    cells = {cell_of_square(move.from_square), cell_of_square(move.to_square)}
+    if board.is_castling(move):
+        rank = chess.square_rank(move.from_square)
+        if board.is_kingside_castling(move):
+            rook_from, rook_to = chess.square(7, rank), chess.square(5, rank)
+        else:
+            rook_from, rook_to = chess.square(0, rank), chess.square(3, rank)
+        # chess960 식 표기(킹이 룩 칸으로)까지 고려해 킹 도착 칸도 넣는다
+        king_to = chess.square(6 if board.is_kingside_castling(move) else 2, rank)
+        cells = {cell_of_square(s) for s in (move.from_square, king_to, rook_from, rook_to)}
+    elif board.is_en_passant(move):
+        captured = chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square))
+        cells.add(cell_of_square(captured))
+    return tuple(sorted(cells))
+
+
+class MoveTable(NamedTuple):
+    moves: List[chess.Move]            # 칸 집합별 대표 수
+    cells: List[Tuple[int, ...]]
+    E: np.ndarray                      # (수, 64) float32 0/1
+    sizes: np.ndarray                  # 수마다 기대 변화 칸 수
+
+
+def build_move_table(board: chess.Board) -> MoveTable:
+    """국면의 합법 수 → 기대 변화 칸 행렬 E. 칸 집합이 같은 수는 한 행으로 묶는다."""
+    seen = {}
+    for move in board.legal_moves:
+        cells = changed_cells(board, move)
+        prev = seen.get(cells)
+        # 프로모션은 퀸을 대표로 (카메라로 기물 종류는 구분하지 않음)
+        if prev is None or (move.promotion == chess.QUEEN and prev.promotion != chess.QUEEN):
+            seen[cells] = move
+    cells_list = list(seen.keys())
+    moves = [seen[c] for c in cells_list]
+    E = np.zeros((len(moves), 64), np.float32)
+    for r, cells in enumerate(cells_list):
+        E[r, list(cells)] = 1.0
+    return MoveTable(moves, cells_list, E, E.sum(axis=1))
+
+
+_tables: "OrderedDict[str, MoveTable]" = OrderedDict()
+_tables_lock = threading.Lock()
+
+
+def move_table(board: chess.Board) -> MoveTable:
+    """국면별 MoveTable (FEN 키 LRU 캐시)."""
+    key = board.fen()
+    with _tables_lock:
+        table = _tables.get(key)
+        if table is not None:
+            _tables.move_to_end(key)
+            return table
+    table = build_move_table(board)
+    with _tables_lock:
+        _tables[key] = table
+        while len(_tables) > CACHE_SIZE:
+            _tables.popitem(last=False)
+    return table
+
+
+class MoveEstimate(NamedTuple):
+    move: chess.Move
+    score: float
+    margin: float
+    confidence: float
+    cells: Tuple[int, ...]
+    ranked: List[Tuple[str, float]]     # 상위 후보 (uci, 점수)
+
+    @property
+    def ambiguous(self) -> bool:
+        return self.margin < MIN_MARGIN
+
+    def src_dst(self) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """출발/도착 칸의 cv 격자 (i, j) 좌표."""
+        a, b = cell_of_square(self.move.from_square), cell_of_square(self.move.to_square)
+        return (a // 8, a % 8), (b // 8, b % 8)
+
+
+def score_moves(table: MoveTable, norms: np.ndarray, threshold: float = THRESHOLD) -> np.ndarray:
+    """모든 후보 점수 = E @ (norms - threshold)."""
+    return table.E @ (np.asarray(norms, np.float32).reshape(64) - np.float32(threshold))
+
+
+def estimate_from_table(table: MoveTable, norms: np.ndarray, threshold: float = THRESHOLD,
+                        temperature: float = TEMPERATURE, top_k: int = 3) -> Optional[MoveEstimate]:
+    """미리 만든 MoveTable 로 추론 (국면이 같으면 이쪽이 FEN 계산 없이 수 µs)."""
+    if not table.moves:
+        return None
+    scores = score_moves(table, norms, threshold)
+    order = np.argsort(-scores)[:max(2, top_k)]
+    best = int(order[0])
+    second = float(scores[order[1]]) if len(order) > 1 else float(scores[best]) - 1e3
+    z = (scores - scores[best]) / max(temperature, 1e-6)
+    confidence = float(1.0 / np.exp(z).sum())
+    return MoveEstimate(
+        move=table.moves[best],
+        score=float(scores[best]),
+        margin=float(scores[best]) - second,
+        confidence=confidence,
+        cells=table.cells[best],
+        ranked=[(table.moves[int(r)].uci(), round(float(scores[r]), 2)) for r in order[:top_k]],
+    )
+
+
+def infer_move(board: chess.Board, norms: np.ndarray, threshold: float = THRESHOLD,
+               temperature: float = TEMPERATURE, top_k: int = 3) -> Optional[MoveEstimate]:
+    """칸별 변화량 64개로 가장 그럴듯한 합법 수를 고른다 (합법 수가 없으면 None)."""
+    return estimate_from_table(move_table(board), norms, threshold, temperature, top_k)
+
+
+def pieces_after_move(board: chess.Board, move: chess.Move) -> List[List[str]]:
+    """move 를 둔 뒤의 8x8 기물 배열 ('WP', 'BK', '' ...; 0행 = 8랭크)."""
+    after = board.copy(stack=False)
+    after.push(move)
+    pieces = [['' for _ in range(8)] for _ in range(8)]
+    for square, piece in after.piece_map().items():
+        k = cell_of_square(square)
+        pieces[k // 8][k % 8] = ('W' if piece.color == chess.WHITE else 'B') + piece.symbol().upper()
+    return pieces
+
+
+def benchmark_inference(n: int = 2000) -> dict:
+    """시작/중반 국면: 표 만들기(국면당 한 번) / 점수 곱 / 추론 전체 시간 (µs)."""
+    boards = {
+        "start": chess.Board(),
+        "middlegame": chess.Board("r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP2BPPP/R2QKB1R w KQ - 0 8"),
+    }
+    rng = np.random.default_rng(0)
+    out = {}
+    for name, board in boards.items():
+        t0 = time.perf_counter()
+        table = build_move_table(board)
+        build_us = (time.perf_counter() - t0) * 1e6
+        norms = rng.gamma(2.0, 2.0, (n, 64)).astype(np.float32)
+        t0 = time.perf_counter()
+        for k in range(n):
+            estimate_from_table(table, norms[k])
+        infer_us = (time.perf_counter() - t0) * 1e6 / n
+        t0 = time.perf_counter()
+        for k in range(n):
+            score_moves(table, norms[k])
+        score_us = (time.perf_counter() - t0) * 1e6 / n
+        out[name] = {"moves": len(table.moves), "build_us": round(build_us, 1),
+                     "score_us": round(score_us, 1), "infer_us": round(infer_us, 1)}
+        print(f"[move_inference] {name}: {len(table.moves)} moves, table {build_us:.0f} µs (once per position), "
+              f"E @ (norms - tau) {score_us:.1f} µs, full estimate {infer_us:.1f} µs")
+    return out
+
+
+__all__ = [
+    'THRESHOLD',
+    'MIN_MARGIN',
+    'cell_of_square',
+    'square_of_cell',
+    'changed_cells',
+    'MoveTable',
+    'build_move_table',
+    'move_table',
+    'MoveEstimate',
+    'score_moves',
+    'estimate_from_table',
+    'infer_move',
+    'pieces_after_move',
+    'benchmark_inference',
+]
+
+
+if __name__ == "__main__":
+    benchmark_inference()
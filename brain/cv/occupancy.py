@@ -0,0 +1,250 @@
+"""칸 점유 분류기: 와프 한 장으로 칸마다 빈칸 / 백 기물 / 흑 기물.
+
+지금까지의 감지는 모두 저장된 기준(init_board_values.npy)과의 차이다. 기준이 한 번 어긋나면
+(턴을 놓쳤거나 기물이 살짝 밀렸을 때) 다음 턴부터 계속 틀리고, 상태를 다시 맞추려면 사람이
+기준을 새로 찍어야 했다.
+
+OccupancyModel 은 기준 없이 프레임 한 장에서 칸별 특징
+    LAB 안쪽 평균(3) + L 분산(log) + 에지 밀도 (mjpg/main.py _edge_density_map 과 같은 CLAHE+Canny)
+을 뽑고, 칸 색(밝은/어두운 칸) 별로 클래스 중심 3개(빈칸/백/흑)를 둔 최근접 중심 분류를 한다
+(특징은 표준화하고, 칸 색별로 클래스 내부 분산을 합쳐 대각 마할라노비스 거리 사용).
+모델은 시작 배치가 알려진 프레임 한 장(fit_start_position)으로 맞춘다. 1·2랭크 = 백,
+7·8랭크 = 흑, 나머지 = 빈칸이라 칸 색 x 클래스마다 8~16개 표본이 있다.
+
+예측 결과(8x8, 0=빈칸 1=백 2=흑)는 board_occupancy(chess.Board) / pieces_occupancy(기물 배열)와
+배열 비교 한 번으로 맞춰 보고, resync_move() 는 합법 수(depth=2 면 상대 응수까지) 결과 점유를
+한꺼번에 만들어 예측과 가장 잘 맞는 수를 고른다 (턴을 놓친 뒤 한 프레임으로 재동기화).
+칸 인덱스는 cv 격자 순서(행 0 = 8랭크)다.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import chess
+import cv2
+import numpy as np
+
+from cv.board_stats import IntegralBoard
+
+EMPTY, WHITE, BLACK = 0, 1, 2
+CLASS_NAMES = ("empty", "white", "black")
+FEATURE_MARGIN = 0.12   # 칸 테두리(격자선/이웃 기물)를 뺀 안쪽에서만 특징을 뽑는다
+VAR_FLOOR = 0.05        # 표준화 특징 단위 분산 하한 (표본이 적어 0 에 가까워지는 것 방지)
+MIN_CONFIDENCE = 0.8
+
+# 칸 색: (i + j) 짝수 = 밝은 칸 (a8 이 밝은 칸)
+PARITY = (np.add.outer(np.arange(8), np.arange(8)) % 2).reshape(64)
+
+START_OCCUPANCY = np.zeros((8, 8), np.int8)
+START_OCCUPANCY[0:2] = BLACK
+START_OCCUPANCY[6:8] = WHITE
+
+# 특징용 적분 영상 버퍼는 재사용 (resync 때 매 프레임 호출, cv_web 스레드와 공유 → 락)
+_LAB_BOARD = IntegralBoard()
+_EDGE_BOARD = IntegralBoard(squared=False)
+_FEATURE_LOCK = threading.Lock()
+
+
+def square_features(warp_bgr: np.ndarray, margin_ratio: float = FEATURE_MARGIN) -> np.ndarray:
+    """와프(BGR) 한 장 → 칸별 특징 (64, 5): L, a, b, log1p(L 분산), 에지 밀도."""
+    lab = cv2.cvtColor(warp_bgr, cv2.COLOR_BGR2LAB)
+    eq = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(lab[:, :, 0])
+    lower = max(10, min(80, int(0.33 * np.sqrt(max(1.0, float(np.var(eq)))))))
+    edges = cv2.Canny(eq, lower, int(lower * 2.5))
+    with _FEATURE_LOCK:
+        board = _LAB_BOARD.update(lab)
+        means = board.means(margin_ratio=margin_ratio).reshape(64, 3)
+        var_l = board.variances(margin_ratio=margin_ratio)[..., 0].reshape(64)
+        edge = _EDGE_BOARD.update(edges).means(margin_ratio=margin_ratio).reshape(64) / 255.0
+    return np.column_stack([means, np.log1p(var_l), edge]).astype(np.float32)
+
+
+def board_occupancy(board: chess.Board) -> np.ndarray:
+    """python-chess 국면 → (8, 8) int8 점유 (비트보드에서 바로, 행 0 = 8랭크)."""
+    def bits(bb: int) -> np.ndarray:
+        b = np.unpackbits(np.array([bb], "<u8").view(np.uint8), bitorder="little")
+        return b.reshape(8, 8)[::-1]
+    return (bits(board.occupied_co[chess.WHITE]) * WHITE + bits(board.occupied_co[chess.BLACK]) * BLACK).astype(np.int8)
+
+
+def pieces_occupancy(chess_pieces: Sequence[Sequence[str]]) -> np.ndarray:
+    """'WP'/'BK'/'' 8x8 기물 배열 → (8, 8) int8 점유."""
+    arr = np.asarray([[(p or " ")[0] for p in row] for row in chess_pieces])
+    return ((arr == "W") * WHITE + (arr == "B") * BLACK).astype(np.int8)
+
+
+class OccupancyPrediction(NamedTuple):
+    labels: np.ndarray        # (8, 8) int8
+    confidence: np.ndarray    # (8, 8) float32, 고른 클래스의 사후확률
+    distances: np.ndarray     # (64, 3) 클래스별 거리 제곱
+
+    def mismatches(self, expected: np.ndarray, min_confidence: float = MIN_CONFIDENCE) -> List[Dict[str, Any]]:
+        """expected(8x8) 와 다르고 confidence 가 충분한 칸 목록."""
+        bad = (self.labels != expected) & (self.confidence >= min_confidence)
+        return [{"cell": [int(i), int(j)], "expected": CLASS_NAMES[int(expected[i, j])],
+                 "seen": CLASS_NAMES[int(self.labels[i, j])], "confidence": round(float(self.confidence[i, j]), 3)}
+                for i, j in zip(*np.nonzero(bad))]
+
+
+class OccupancyModel:
+    """칸 색별 3클래스 중심 + 합친 클래스 내부 분산 (표준화 특징 공간)."""
+
+    def __init__(self, shift: np.ndarray, scale: np.ndarray, centroids: np.ndarray, variances: np.ndarray):
+        self.shift = np.asarray(shift, np.float32)            # (D,)
+        self.scale = np.asarray(scale, np.float32)            # (D,)
+        self.centroids = np.asarray(centroids, np.float32)    # (2, 3, D) 칸 색 x 클래스
+        self.variances = np.asarray(variances, np.float32)    # (2, D)
+
+    @classmethod
+    def fit(cls, features: np.ndarray, occupancy: np.ndarray) -> "OccupancyModel":
+        """알려진 점유(8x8)의 프레임 특징 (64, D) 으로 맞춘다. 칸 색마다 세 클래스가 모두 있어야 한다."""
+        f = np.asarray(features, np.float32).reshape(64, -1)
+        y = np.asarray(occupancy).reshape(64)
+        shift = f.mean(axis=0)
+        scale = f.std(axis=0) + 1e-6
+        z = (f - shift) / scale
+        d = z.shape[1]
+        centroids = np.zeros((2, 3, d), np.float32)
+        variances = np.zeros((2, d), np.float32)
+        for p in (0, 1):
+            resid = []
+            for c in (EMPTY, WHITE, BLACK):
+                sel = z[(PARITY == p) & (y == c)]
+                if not len(sel):
+                    raise ValueError(f"no samples for parity={p} class={CLASS_NAMES[c]}")
+                centroids[p, c] = sel.mean(axis=0)
+                resid.append(sel - centroids[p, c])
+            variances[p] = np.maximum(np.concatenate(resid).var(axis=0), VAR_FLOOR)
+        return cls(shift, scale, centroids, variances)
+
+    @classmethod
+    def fit_start_position(cls, warp_bgr: np.ndarray) -> "OccupancyModel":
+        return cls.fit(square_features(warp_bgr), START_OCCUPANCY)
+
+    def predict_features(self, features: np.ndarray) -> OccupancyPrediction:
+        z = (np.asarray(features, np.float32).reshape(64, -1) - self.shift) / self.scale
+        diff = z[:, None, :] - self.centroids[PARITY]                         # (64, 3, D)
+        d2 = (diff * diff / self.variances[PARITY][:, None, :]).sum(axis=2)   # (64, 3)
+        labels = d2.argmin(axis=1)
+        logits = -0.5 * (d2 - d2.min(axis=1, keepdims=True))
+        post = np.exp(logits)
+        post /= post.sum(axis=1, keepdims=True)
+        conf = post[np.arange(64), labels]
+        return OccupancyPrediction(labels.reshape(8, 8).astype(np.int8),
+                                   conf.reshape(8, 8).astype(np.float32), d2.astype(np.float32))
+
+    def predict(self, warp_bgr: np.ndarray) -> OccupancyPrediction:
+        return self.predict_features(square_features(warp_bgr))
+
+    def save(self, path) -> None:
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, shift=self.shift, scale=self.scale, centroids=self.centroids, variances=self.variances)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path) -> Optional["OccupancyModel"]:
+        try:
+            with np.load(path) as z:
+                return cls(z["shift"], z["scale"], z["centroids"], z["variances"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+class ResyncResult(NamedTuple):
+    moves: List[chess.Move]   # 현재 국면에서 이어지는 수 (빈 리스트 = 그대로)
+    mismatches: int           # 예측과 다른 칸 수 (confidence 가중 전)
+    cost: float               # confidence 가중 불일치
+    runner_up: float          # 2등 후보의 cost
+
+
+def resync_move(board: chess.Board, pred: OccupancyPrediction, depth: int = 1) -> ResyncResult:
+    """현재 국면에서 0~depth 수 뒤의 점유 중 예측과 가장 잘 맞는 수열을 고른다.
+
+    후보 점유를 (N, 64) 로 쌓아 confidence 가중 불일치를 한 번에 계산한다.
+    """
+    lines: List[List[chess.Move]] = [[]]
+    occs = [board_occupancy(board).reshape(64)]
+    b = board.copy(stack=False)
+    for m1 in list(b.legal_moves):
+        b.push(m1)
+        lines.append([m1])
+        occs.append(board_occupancy(b).reshape(64))
+        if depth >= 2:
+            for m2 in list(b.legal_moves):
+                b.push(m2)
+                lines.append([m1, m2])
+                occs.append(board_occupancy(b).reshape(64))
+                b.pop()
+        b.pop()
+    occ = np.stack(occs)                                   # (N, 64)
+    wrong = occ != pred.labels.reshape(64)
+    cost = wrong @ pred.confidence.reshape(64).astype(np.float64)
+    order = np.argsort(cost, kind="stable")
+    best = int(order[0])
+    runner = float(cost[order[1]]) if len(order) > 1 else float("inf")
+    return ResyncResult(lines[best], int(wrong[best].sum()), float(cost[best]), runner)
+
+
+def benchmark_occupancy(size: int = 400, trials: int = 50, seed: int = 0) -> Dict[str, float]:
+    """합성 보드(칸 색 + 원형 기물)로 맞추기/예측/재동기화 시간과 정확도."""
+    rng = np.random.default_rng(seed)
+    cs = size // 8
+
+    def render(occ: np.ndarray) -> np.ndarray:
+        img = np.zeros((size, size, 3), np.uint8)
+        for i in range(8):
+            for j in range(8):
+                img[i * cs:(i + 1) * cs, j * cs:(j + 1) * cs] = (200, 210, 215) if (i + j) % 2 == 0 else (60, 90, 120)
+                if occ[i, j]:
+                    color = (235, 235, 235) if occ[i, j] == WHITE else (25, 25, 25)
+                    cv2.circle(img, (j * cs + cs // 2, i * cs + cs // 2), cs // 3, color, -1, cv2.LINE_AA)
+                    cv2.circle(img, (j * cs + cs // 2, i * cs + cs // 2), cs // 3, (90, 90, 90), 1, cv2.LINE_AA)
+        noise = rng.normal(0, 6, img.shape)
+        return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+    t0 = time.perf_counter()
+    model = OccupancyModel.fit_start_position(render(START_OCCUPANCY))
+    fit_ms = (time.perf_counter() - t0) * 1000.0
+    board = chess.Board()
+    correct, pred_ms, resync_ok = 0, 0.0, 0
+    for _ in range(trials):
+        move = list(board.legal_moves)[int(rng.integers(board.legal_moves.count()))]
+        after = board.copy(stack=False)
+        after.push(move)
+        img = render(board_occupancy(after))
+        t0 = time.perf_counter()
+        pred = model.predict(img)
+        pred_ms += (time.perf_counter() - t0) * 1000.0
+        correct += int((pred.labels == board_occupancy(after)).sum())
+        resync_ok += int(resync_move(board, pred).moves == [move])
+    out = {"fit_ms": round(fit_ms, 2), "predict_ms": round(pred_ms / trials, 2),
+           "square_accuracy": round(correct / (64 * trials), 4), "resync_accuracy": round(resync_ok / trials, 3)}
+    print(f"[occupancy] {out}")
+    return out
+
+
+__all__ = [
+    'EMPTY',
+    'WHITE',
+    'BLACK',
+    'START_OCCUPANCY',
+    'square_features',
+    'board_occupancy',
+    'pieces_occupancy',
+    'OccupancyPrediction',
+    'OccupancyModel',
+    'ResyncResult',
+    'resync_move',
+    'benchmark_occupancy',
+]
+
+
+if __name__ == "__main__":
+    benchmark_occupancy()
@@ -9,10 +9,32 @@ import numpy as np
 import os
 from pathlib import Path
 
+try:
+    from cv.board_stats import cell_diff_norms, cell_geometry, cell_means
+except ImportError:
+    from board_stats import cell_diff_norms, cell_geometry, cell_means
+
+# 공용 JPEG 인코딩 풀
+try:
+    from cv.jpeg_encoder import StreamProfile, get_encoder
+except ImportError:
+    from jpeg_encoder import StreamProfile, get_encoder
+
+# 마커 검출 / ROI 추적기
+try:
+    from cv.marker_detection import MarkerTracker, find_green_corners
+except ImportError:
+    from marker_detection import MarkerTracker, find_green_corners
+
+# 칸 샘플링(전체 와핑 없이 칸 통계) — picam_stable 과 동일 구현
+try:
+    from cv.picam_stable import build_square_sample_maps, sample_board
+except ImportError:
+    from warp_cam_picam2_stable_v2 import build_square_sample_maps, sample_board
+
 # warp_cam_picam2_v2에서 필요한 함수들 import
 try:
     from warp_cam_picam2_v2 import (
-    find_green_corners,
     warp_chessboard,
     FRAME_SIZE, FPS, HFLIP, VFLIP,
     USE_AUTO_EXPOSURE, EXPOSURE_TIME, ANALOG_GAIN,
@@ -24,32 +46,6 @@ except ImportError:
     Smin, Smax = 50, 255
     Vmin, Vmax = 50, 255
     
-    def find_green_corners(frame, lower=None, upper=None, min_area=60):
-        """기본 코너 검출 함수 (fallback)"""
-        # 간단한 녹색 마커 검출
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        if lower is None:
-            lower = np.array([Hmin, Smin, Vmin], dtype=np.uint8)
-        if upper is None:
-            upper = np.array([Hmax, Smax, Vmax], dtype=np.uint8)
-        
-        mask = cv2.inRange(hsv, lower, upper)
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # 가장 큰 4개의 컨투어를 코너로 사용
-        if len(contours) >= 4:
-            contours = sorted(contours, key=cv2.contourArea, reverse=True)[:4]
-            corners = []
-            for cnt in contours:
-                M = cv2.moments(cnt)
-                if M["m00"] != 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    corners.append([cx, cy])
-            if len(corners) == 4:
-                return np.array(corners, dtype=np.float32)
-        return None
-    
     def warp_chessboard(frame, corners, size=400):
         """기본 와핑 함수 (fallback)"""
         if corners is None or len(corners) != 4:
@@ -75,24 +71,8 @@ DEFAULT_TOP_K = 4
 # ==================================================
 
 def _split_sizes(h: int, w: int, grid: int):
-    """셀 크기, 마진 계산"""
-    cs_h, cs_w = h // grid, w // grid
-    my = int(cs_h * CELL_MARGIN_RATIO)
-    mx = int(cs_w * CELL_MARGIN_RATIO)
-    return cs_h, cs_w, my, mx
-
-def _cell_region(i, j, cs_h, cs_w, my, mx, H, W):
-    """셀 내부 마진까지 고려한 안전한 ROI"""
-    y1 = i * cs_h + my
-    y2 = (i + 1) * cs_h - my
-    x1 = j * cs_w + mx
-    x2 = (j + 1) * cs_w - mx
-    # 경계 보정
-    y1 = max(0, min(y1, H - 1))
-    y2 = max(y1 + 1, min(y2, H))
-    x1 = max(0, min(x1, W - 1))
-    x2 = max(x1 + 1, min(x2, W))
-    return y1, y2, x1, x2
+    """셀 크기, 마진 계산 (board_stats 와 같은 규칙: 칸 안쪽 최소 1픽셀 보장)"""
+    return cell_geometry(h, w, grid, CELL_MARGIN_RATIO)
 
 def coord_to_chess_notation(i, j):
     """(0,0)=a8, (7,7)=h1 체스 표기로 변환"""
@@ -102,17 +82,7 @@ def coord_to_chess_notation(i, j):
 
 def compute_board_means_BGR(image_bgr, grid=GRID, margin_ratio=CELL_MARGIN_RATIO):
     """BGR 평균값을 계산하여 반환 (8x8x3 float32)"""
-    H, W = image_bgr.shape[:2]
-    cs_h, cs_w, my, mx = _split_sizes(H, W, grid)
-    means = np.zeros((grid, grid, 3), np.float32)
-    
-    for i in range(grid):
-        for j in range(grid):
-            y1, y2, x1, x2 = _cell_region(i, j, cs_h, cs_w, my, mx, H, W)
-            cell = image_bgr[y1:y2, x1:x2]
-            means[i, j] = cell.reshape(-1, 3).mean(axis=0).astype(np.float32)
-    
-    return means
+    return cell_means(image_bgr, grid=grid, margin_ratio=margin_ratio)
 
 def initialize_board(cap, save_path='init_board_values.npy'):
     """
@@ -252,21 +222,12 @@ def detect_piece_changes(cap, base_board_path='init_board_values.npy', threshold
         print("[WARNING] 체스판 코너를 찾을 수 없습니다.")
         return []
     
-    warp = warp_chessboard(frame, corners, size=WARP_SIZE)
+    # 코너가 프레임마다 달라지므로 고정소수점 변환 없이 샘플 좌표만 만들어 remap
+    maps = build_square_sample_maps(corners, warp_size=WARP_SIZE, grid=GRID, fixed_point=False)
+    samples = sample_board(frame, maps)
     
     # 변화 감지
-    H, W = warp.shape[:2]
-    cs_h, cs_w = H // GRID, W // GRID
-    diffs = np.zeros((GRID, GRID), np.float32)
-    
-    for i in range(GRID):
-        for j in range(GRID):
-            y1, y2 = i * cs_h, (i + 1) * cs_h
-            x1, x2 = j * cs_w, (j + 1) * cs_w
-            cell = warp[y1:y2, x1:x2]
-            mean_bgr = np.mean(cell.reshape(-1, 3), axis=0)
-            diff = np.linalg.norm(mean_bgr - base_board_values[i, j])
-            diffs[i, j] = diff
+    diffs = cell_diff_norms(cell_means(samples, grid=GRID), base_board_values)
     
     # 상위 변화 칸들 찾기
     flat_diffs = diffs.flatten()
@@ -415,6 +376,8 @@ def detect_move_and_update(threshold=None, top_k=None, max_attempts=50):
         if cap is not None:
             cap.release()
 
+EDGES_PROFILE = StreamProfile("edges", target_kb=30, max_encode_ms=10)
+
 def gen_edges_frames(cap, base_board_path='init_board_values.npy', threshold=None, top_k=None):
     """
     기물 변화를 시각화하는 MJPEG 스트리밍 제너레이터 (기준값 고정)
@@ -452,6 +415,9 @@ def gen_edges_frames(cap, base_board_path='init_board_values.npy', threshold=Non
     prev_warp = None
     lower = np.array([Hmin, Smin, Vmin], dtype=np.uint8)
     upper = np.array([Hmax, Smax, Vmax], dtype=np.uint8)
+    means = np.empty((GRID, GRID, 3), np.float32)
+    # 잠금 이후에는 마커 주변 창만 검색, 연속 실패 시 전체 프레임 검색
+    tracker = MarkerTracker(lower, upper, min_area=60)
     
     while True:
         change_coords = []  # 매 프레임마다 초기화
@@ -460,7 +426,7 @@ def gen_edges_frames(cap, base_board_path='init_board_values.npy', threshold=Non
             break
         
         # 코너 검출 & 와핑
-        corners = find_green_corners(frame.copy(), lower, upper, min_area=60)
+        corners = tracker.update(frame)
         if corners is not None and len(corners) == 4:
             warp = warp_chessboard(frame, corners, size=WARP_SIZE)
             prev_warp = warp
@@ -473,19 +439,12 @@ def gen_edges_frames(cap, base_board_path='init_board_values.npy', threshold=Non
         if base_board_values is not None and base_board_values.shape == (GRID, GRID, 3):
             H, W = warp.shape[:2]
             cs_h, cs_w = H // GRID, W // GRID
-            diffs = np.zeros((GRID, GRID), np.float32)
+            diffs = cell_diff_norms(cell_means(warp, grid=GRID, out=means), base_board_values)
             
             for i in range(GRID):
                 for j in range(GRID):
-                    y1, y2 = i * cs_h, (i + 1) * cs_h
-                    x1, x2 = j * cs_w, (j + 1) * cs_w
-                    cell = warp[y1:y2, x1:x2]
-                    mean_bgr = np.mean(cell.reshape(-1, 3), axis=0)
-                    diff = np.linalg.norm(mean_bgr - base_board_values[i, j])
-                    diffs[i, j] = diff
-                    
                     # 차이값 표시
-                    cv2.putText(vis, str(int(diff)), (x1 + 2, y1 + cs_h // 2),
+                    cv2.putText(vis, str(int(diffs[i, j])), (j * cs_w + 2, i * cs_h + cs_h // 2),
                                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1, cv2.LINE_AA)
             
             # 상위 변화 칸들에 박스 표시 및 체스 좌표 표시
@@ -528,10 +487,10 @@ def gen_edges_frames(cap, base_board_path='init_board_values.npy', threshold=Non
             cv2.putText(vis, "NO BASE FILE: Use initialize_board() first",
                         (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2, cv2.LINE_AA)
         
-        # JPEG로 인코딩하여 MJPEG 스트리밍
-        _, buffer = cv2.imencode('.jpg', vis)
+        # 공용 풀에서 JPEG 인코딩하여 MJPEG 스트리밍
+        jpeg = get_encoder().encode(vis, profile=EDGES_PROFILE)
         frame_data = (b'--frame\r\n'
-                     b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+                     b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
         
         # 체스 좌표 문자열 생성
         if len(change_coords) >= 2:
@@ -0,0 +1,107 @@
+"""스냅샷 라우트용 응답 캐시 (single-flight + 프레임 순번 키 + ETag).
+
+같은 100ms 안에 탭 세 개가 /snapshot_original 을 부르면 예전에는 캡처/인코딩을 세 번
+했다. 키를 (라우트, 파라미터, 프레임 seq) 로 잡으면 같은 프레임에 대한 요청은 결과가
+같으므로,
+- 이미 계산된 키는 캐시에서 바로 돌려주고
+- 계산 중인 키에 들어온 요청은 새로 계산하지 않고 그 결과를 기다린다 (single-flight)
+ETag 는 키에서 만들어지므로, 클라이언트가 If-None-Match 로 같은 값을 보내면
+계산 없이 304 를 돌려줄 수 있다 (프레임이 안 바뀌었으면 서버 비용 0).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+MAX_ENTRIES = 32
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def etag_for(key: Hashable) -> str:
+    """키에서 만든 강한 ETag 값 (따옴표 없음, Response.set_etag 에 그대로 넘긴다)."""
+    return hashlib.blake2b(repr(key).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class ResponseCache:
+    """키별로 한 번만 계산하는 LRU 캐시. 예외는 캐시하지 않고 기다리던 요청에 전달한다."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = int(max_entries)
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.not_modified = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any],
+                       timeout: Optional[float] = 10.0) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                raise TimeoutError(f"response cache: computation for {key!r} timed out")
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = compute()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+            raise
+        flight.value = value
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+            self._flights.pop(key, None)
+        flight.done.set()
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "not_modified": self.not_modified,
+        }
+
+
+__all__ = [
+    'ResponseCache',
+    'etag_for',
+]
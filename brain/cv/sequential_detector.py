@@ -0,0 +1,177 @@
+"""프레임마다 증거를 쌓다가 확신이 서면 바로 멈추는 이동 감지 (순차 확률비 검정).
+
+capture_avg_lab_board 는 늘 정해진 n_frames 를 평균한다 (CV/main.py 8장,
+process_turn_transition 1장, /snapshot_board 4장). 1장은 노이즈에 약하고 8장은
+분명한 수에도 매번 8장을 기다린다.
+
+SequentialMoveDetector 는 move_inference 의 합법 수 표 E 를 그대로 쓰고, 프레임 t 의
+칸별 변화량 n_t 에 대해 칸마다
+
+    "바뀜" N(mu1, sigma) 대 "그대로" N(mu0, sigma) 로그우도비 = LLR_SCALE * (n_t - tau)
+    (tau = (mu0 + mu1) / 2 = threshold, LLR_SCALE = (mu1 - mu0) / sigma^2)
+
+를 더한다. 수 m 의 누적 로그우도 S_m = LLR_SCALE * sum_t E[m] @ (n_t - tau) 이고,
+균등 사전확률에서 사후확률은 softmax(S) 다. 1등 사후확률이 1 - alpha 를 넘으면
+(다가설 SPRT 의 정지 규칙) min_frames 이후 바로 멈추고, max_frames 까지 가도 못 넘으면
+그때까지의 증거로 판정하되 decided=False 로 표시한다. process_turn_transition 은 이런 결과를
+확정하지 않고(flight record 기록) 점유 분류 확인에 넘긴다.
+
+프레임당 추가 비용은 E @ v 한 번 (수 µs) 이라 캡처 루프 안에서 돌린다.
+
+evidence 를 주면 n_t 대신 그 함수의 값을 쓴다 (예: BackgroundModel.normalized_norms —
+칸 노이즈로 정규화한 변화량이라 같은 threshold/LLR_SCALE 이 칸별 z 문턱이 된다).
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+import chess
+import numpy as np
+
+from cv import cv_manager
+from cv.move_inference import THRESHOLD, MoveEstimate, estimate_from_table, move_table
+
+LLR_SCALE = 1.0 / 3.0   # (mu1 - mu0) / sigma^2, mu0≈3, mu1≈15, sigma≈6 (칸 평균 LAB 거리)
+ALPHA = 0.01            # 1등 사후확률이 1 - ALPHA 를 넘으면 멈춤
+MIN_FRAMES = 1
+MAX_FRAMES = 8
+
+
+class SequentialResult(NamedTuple):
+    estimate: Optional[MoveEstimate]   # 평균 변화량 기준 추정 (move_inference 와 같은 점수 단위)
+    frames: int                        # 사용한 프레임 수
+    decided: bool                      # max_frames 전에 정지 규칙을 만족했는지
+    posterior: float                   # 누적 증거 기준 1등 사후확률
+    llr_margin: float                  # 1등 - 2등 누적 로그우도
+    norms: Optional[np.ndarray]        # 사용한 프레임의 평균 변화량 (8, 8)
+    elapsed: float                     # 초
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "move": self.estimate.move.uci() if self.estimate is not None else None,
+            "frames": self.frames,
+            "decided": self.decided,
+            "posterior": round(self.posterior, 4),
+            "llr_margin": round(self.llr_margin, 2),
+            "elapsed": round(self.elapsed, 3),
+        }
+
+
+class SequentialMoveDetector:
+    """프레임별 칸 LAB 평균을 받아 합법 수마다 로그우도를 누적한다."""
+
+    def __init__(self, board: chess.Board, prev_lab: Optional[np.ndarray], *, threshold: float = THRESHOLD,
+                 llr_scale: float = LLR_SCALE, alpha: float = ALPHA,
+                 min_frames: int = MIN_FRAMES, max_frames: int = MAX_FRAMES,
+                 evidence: Optional[Callable[[np.ndarray], np.ndarray]] = None):
+        self.table = move_table(board)
+        self.prev_lab = prev_lab
+        self.evidence = evidence
+        self.threshold = float(threshold)
+        self.llr_scale = float(llr_scale)
+        self.alpha = float(alpha)
+        self.min_frames = max(1, int(min_frames))
+        self.max_frames = max(self.min_frames, int(max_frames))
+        self._llr = np.zeros(len(self.table.moves), np.float64)
+        self._norm_sum = np.zeros(64, np.float64)
+        self.frames = 0
+        self.decided = False
+        self._t0 = time.monotonic()
+
+    def posterior(self) -> np.ndarray:
+        if not len(self._llr):
+            return self._llr
+        p = np.exp(self._llr - self._llr.max())
+        return p / p.sum()
+
+    def update(self, lab: np.ndarray) -> bool:
+        """프레임 하나의 칸 LAB 평균 (8, 8, 3) 을 더한다. 멈춰도 되면 True."""
+        if self.evidence is not None:
+            norms = self.evidence(lab)
+        else:
+            _, norms = cv_manager.detrended_lab_deltas(lab, self.prev_lab)
+        v = np.asarray(norms, np.float32).reshape(64)
+        self._norm_sum += v
+        self.frames += 1
+        if len(self._llr):
+            self._llr += self.llr_scale * (self.table.E @ (v - np.float32(self.threshold)))
+        if self.frames >= self.min_frames and len(self._llr):
+            self.decided = float(self.posterior().max()) >= 1.0 - self.alpha
+        return self.decided or self.frames >= self.max_frames
+
+    def result(self) -> SequentialResult:
+        if self.frames == 0:
+            return SequentialResult(None, 0, False, 0.0, 0.0, None, time.monotonic() - self._t0)
+        mean_norms = (self._norm_sum / self.frames).astype(np.float32)
+        estimate = estimate_from_table(self.table, mean_norms, self.threshold)
+        posterior, margin = 0.0, 0.0
+        if len(self._llr):
+            posterior = float(self.posterior().max())
+            top = np.sort(self._llr)[::-1]
+            margin = float(top[0] - top[1]) if len(top) > 1 else float("inf")
+        return SequentialResult(estimate, self.frames, self.decided, posterior, margin,
+                                mean_norms.reshape(8, 8), time.monotonic() - self._t0)
+
+
+def detect_move_sequential(cap, board: chess.Board, prev_lab: Optional[np.ndarray], *,
+                           threshold: float = THRESHOLD, llr_scale: float = LLR_SCALE, alpha: float = ALPHA,
+                           min_frames: int = MIN_FRAMES, max_frames: int = MAX_FRAMES,
+                           evidence: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                           warp_size: int = 400, sparse: bool = True, record: bool = False):
+    """확신이 설 때까지(최대 max_frames) 캡처하며 판정한다.
+
+    반환: (SequentialResult, 사용한 프레임의 LAB 평균, 마지막 와프). 캡처 실패 시 LAB/와프는 None.
+    """
+    det = SequentialMoveDetector(board, prev_lab, threshold=threshold, llr_scale=llr_scale, alpha=alpha,
+                                 min_frames=min_frames, max_frames=max_frames, evidence=evidence)
+    curr_lab, warp = cv_manager.capture_avg_lab_board(cap, n_frames=det.max_frames, warp_size=warp_size,
+                                                      sparse=sparse, record=record, stop=det.update)
+    result = det.result()
+    print(f"[sequential_detector] {result.to_dict()}")
+    return result, curr_lab, warp
+
+
+def benchmark_sequential(noise: float = 4.0, trials: int = 200, seed: int = 0) -> Dict[str, Any]:
+    """합성 변화량으로 (노이즈 크기별) 평균 사용 프레임 수와 정확도를 잰다."""
+    rng = np.random.default_rng(seed)
+    board = chess.Board("r3k2r/pppq1ppp/2n2n2/3pp3/3PP3/2N2N2/PPPQ1PPP/R3K2R w KQkq - 0 1")
+    table = move_table(board)
+    prev = np.zeros((8, 8, 3), np.float32)
+    out: Dict[str, Any] = {}
+    for sigma in (noise / 2, noise, noise * 2):
+        frames, correct = [], 0
+        for _ in range(trials):
+            r = int(rng.integers(len(table.moves)))
+            truth = np.zeros(64, np.float32)
+            truth[list(table.cells[r])] = 15.0
+            det = SequentialMoveDetector(board, prev)
+            while True:
+                lab = np.zeros((8, 8, 3), np.float32)
+                lab[..., 0] = (truth + rng.normal(0, sigma, 64) + 3.0).reshape(8, 8)
+                if det.update(lab):
+                    break
+            res = det.result()
+            frames.append(res.frames)
+            correct += int(res.estimate is not None and res.estimate.move == table.moves[r])
+        out[f"sigma={sigma:g}"] = {"mean_frames": round(float(np.mean(frames)), 2),
+                                   "accuracy": round(correct / trials, 3)}
+        print(f"[sequential_detector] sigma={sigma:g}: {np.mean(frames):.2f} frames, "
+              f"accuracy {correct / trials:.3f}")
+    return out
+
+
+__all__ = [
+    'LLR_SCALE',
+    'ALPHA',
+    'MAX_FRAMES',
+    'SequentialResult',
+    'SequentialMoveDetector',
+    'detect_move_sequential',
+    'benchmark_sequential',
+]
+
+
+if __name__ == "__main__":
+    benchmark_sequential()
@@ -0,0 +1,293 @@
+"""수동 코너 와핑 캐시.
+
+수동 코너가 지정되면 프레임마다 코너가 바뀌지 않으므로, 호모그래피와
+고정소수점(CV_16SC2) remap 테이블을 한 번만 만들어 두고 이후 와핑은
+`cv2.remap` 한 번으로 끝낸다. 칸 샘플링(`build_square_sample_maps`) 테이블도
+같은 키 규칙으로 캐시한다.
+
+카메라 내부 파라미터(`calibrate_camera.py`로 만든 npz)가 있으면 렌즈 왜곡 보정을
+같은 remap 테이블에 접어 넣는다. 코너를 왜곡 보정 좌표로 옮겨 호모그래피를 만들고,
+테이블의 각 점을 다시 왜곡시켜 원본 프레임 좌표로 되돌리므로 별도 undistort 패스가 없다.
+
+`WarpPyramid`는 프레임 한 장에 대해 감지용 작은 와프(칸당 정수 픽셀)와
+표시용 큰 와프를 나눠, 큰 와프는 미리보기/스냅샷이 요청할 때만 만든다.
+
+키: (종류, 코너 바이트, 프레임 크기, 출력 크기, 추가 파라미터)
+코너가 바뀌면 키가 달라지므로 자동으로 새로 만들고, `invalidate()`로 명시적으로 비울 수도 있다.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    from cv.picam_stable import (
+        SAMPLES_PER_SQUARE,
+        build_square_sample_maps,
+        compute_warp_transform,
+        sample_board,
+        warp_chessboard,
+    )
+except ImportError:
+    from picam_stable import (  # type: ignore
+        SAMPLES_PER_SQUARE,
+        build_square_sample_maps,
+        compute_warp_transform,
+        sample_board,
+        warp_chessboard,
+    )
+
+MAX_ENTRIES = 8
+GRID = 8
+
+
+Camera = Tuple[np.ndarray, np.ndarray]  # (K 3x3, dist)
+
+
+def camera_for_frame(intrinsics: Optional[dict], frame_shape) -> Optional[Camera]:
+    """보정 해상도와 프레임 해상도가 다르면 K 를 비율대로 스케일한 (K, dist).
+    같은 센서 영역을 리사이즈한 경우에만 유효하다(크롭된 모드는 다시 보정할 것)."""
+    if not intrinsics:
+        return None
+    K = np.array(intrinsics["K"], dtype=np.float64).reshape(3, 3)
+    dist = np.array(intrinsics["dist"], dtype=np.float64).reshape(-1)
+    cal_w, cal_h = intrinsics.get("image_size", (frame_shape[1], frame_shape[0]))
+    h, w = frame_shape[:2]
+    if (w, h) != (cal_w, cal_h):
+        K[0, :] *= w / float(cal_w)
+        K[1, :] *= h / float(cal_h)
+        K[2, :] = (0.0, 0.0, 1.0)
+    return K, dist
+
+
+def undistort_corners(corners, camera: Optional[Camera]) -> np.ndarray:
+    """원본(왜곡) 프레임에서 찍은 코너를 왜곡 보정된 픽셀 좌표로 옮긴다."""
+    pts = np.asarray(corners, dtype=np.float32).reshape(-1, 2)
+    if camera is None:
+        return pts
+    K, dist = camera
+    out = cv2.undistortPoints(pts.reshape(-1, 1, 2).astype(np.float64), K, dist, P=K)
+    return out.reshape(-1, 2).astype(np.float32)
+
+
+def distort_map(map_x: np.ndarray, map_y: np.ndarray, camera: Camera) -> Tuple[np.ndarray, np.ndarray]:
+    """왜곡 보정 좌표로 된 remap 테이블을 원본(왜곡) 프레임 좌표로 바꾼다."""
+    K, dist = camera
+    shape = map_x.shape
+    x = (map_x.astype(np.float64) - K[0, 2]) / K[0, 0]
+    y = (map_y.astype(np.float64) - K[1, 2]) / K[1, 1]
+    obj = np.stack([x, y, np.ones_like(x)], axis=-1).reshape(-1, 1, 3)
+    img, _ = cv2.projectPoints(obj, np.zeros(3), np.zeros(3), K, dist)
+    img = img.reshape(shape + (2,)).astype(np.float32)
+    return np.ascontiguousarray(img[..., 0]), np.ascontiguousarray(img[..., 1])
+
+
+def _finish_maps(map_x: np.ndarray, map_y: np.ndarray, camera: Optional[Camera]):
+    if camera is not None:
+        map_x, map_y = distort_map(map_x, map_y, camera)
+    return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+
+def build_warp_maps(corners: np.ndarray, size: int = 400,
+                    camera: Optional[Camera] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """warp_chessboard 와 같은 결과를 내는 (map1, map2) 고정소수점 remap 테이블.
+    camera=(K, dist) 를 주면 렌즈 왜곡 보정까지 포함한다."""
+    _, Minv = compute_warp_transform(undistort_corners(corners, camera), size=size)
+    if Minv is None:
+        return None
+    xs, ys = np.meshgrid(np.arange(size, dtype=np.float32), np.arange(size, dtype=np.float32))
+    pts = np.stack([xs, ys], axis=-1).reshape(-1, 1, 2)
+    src = cv2.perspectiveTransform(pts, Minv).reshape(size, size, 2)
+    return _finish_maps(np.ascontiguousarray(src[..., 0]), np.ascontiguousarray(src[..., 1]), camera)
+
+
+def build_sample_maps(corners: np.ndarray, size: int = 400,
+                      samples_per_square: int = SAMPLES_PER_SQUARE,
+                      camera: Optional[Camera] = None):
+    """build_square_sample_maps 의 고정소수점 테이블 (렌즈 왜곡 보정 포함 가능)."""
+    maps = build_square_sample_maps(undistort_corners(corners, camera), warp_size=size,
+                                    samples_per_square=samples_per_square, fixed_point=False)
+    if maps is None:
+        return None
+    return _finish_maps(maps[0], maps[1], camera)
+
+
+class WarpCache:
+    """코너 집합 + 출력 크기별 remap 테이블 캐시 (스레드 안전).
+    intrinsics 가 있으면 모든 테이블에 렌즈 왜곡 보정이 포함된다."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, intrinsics: Optional[dict] = None):
+        self.max_entries = max_entries
+        self.intrinsics = intrinsics
+        self._entries: Dict[tuple, Optional[Tuple[np.ndarray, np.ndarray]]] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def set_intrinsics(self, intrinsics: Optional[dict]) -> None:
+        """카메라 내부 파라미터 교체(None 이면 보정 해제). 기존 테이블은 버린다."""
+        with self._lock:
+            self.intrinsics = intrinsics
+            self._entries.clear()
+
+    def _get(self, key: tuple, build):
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            maps = build()
+            self._entries[key] = maps
+            self.builds += 1
+            return maps
+
+    @staticmethod
+    def _corner_key(corners) -> bytes:
+        return np.ascontiguousarray(corners, dtype=np.float32).tobytes()
+
+    def warp_maps(self, frame_shape, corners, size: int = 400):
+        key = ("warp", self._corner_key(corners), tuple(frame_shape[:2]), size)
+        return self._get(key, lambda: build_warp_maps(
+            corners, size=size, camera=camera_for_frame(self.intrinsics, frame_shape)))
+
+    def sample_maps(self, frame_shape, corners, size: int = 400,
+                    samples_per_square: int = SAMPLES_PER_SQUARE):
+        key = ("sample", self._corner_key(corners), tuple(frame_shape[:2]), size, samples_per_square)
+        return self._get(key, lambda: build_sample_maps(
+            corners, size=size, samples_per_square=samples_per_square,
+            camera=camera_for_frame(self.intrinsics, frame_shape)))
+
+    def warp(self, frame: np.ndarray, corners, size: int = 400,
+             dst: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """캐시된 테이블로 와핑. warp_chessboard(frame, corners, size) 와 동일한 출력."""
+        maps = self.warp_maps(frame.shape, corners, size)
+        if maps is None:
+            return None
+        return cv2.remap(frame, maps[0], maps[1], cv2.INTER_LINEAR, dst=dst,
+                         borderMode=cv2.BORDER_CONSTANT)
+
+
+class WarpPyramid:
+    """프레임 한 장의 다해상도 와프.
+
+    - detect: detect_size x detect_size (칸당 detect_size/8 픽셀) 감지용 와프.
+      칸 안의 샘플 점만 remap 하므로 비용이 표시 해상도와 무관하다.
+    - display(size): 미리보기/스냅샷용 와프. 처음 요청될 때 한 번만 만든다.
+    """
+
+    def __init__(self, frame: np.ndarray, corners, cache: WarpCache,
+                 detect_size: int = GRID * SAMPLES_PER_SQUARE,
+                 display_size: int = 400):
+        if detect_size <= 0 or detect_size % GRID:
+            raise ValueError(f"detect_size must be a positive multiple of {GRID}: {detect_size}")
+        self.frame = frame
+        self.corners = corners
+        self.cache = cache
+        self.detect_size = detect_size
+        self.display_size = display_size
+        self._detect: Optional[np.ndarray] = None
+        self._display: Dict[int, np.ndarray] = {}
+
+    @property
+    def detect(self) -> Optional[np.ndarray]:
+        if self._detect is None:
+            maps = self.cache.sample_maps(self.frame.shape, self.corners, self.display_size,
+                                          samples_per_square=self.detect_size // GRID)
+            self._detect = sample_board(self.frame, maps)
+        return self._detect
+
+    def display(self, size: Optional[int] = None) -> Optional[np.ndarray]:
+        size = int(size or self.display_size)
+        img = self._display.get(size)
+        if img is None:
+            img = self.cache.warp(self.frame, self.corners, size=size)
+            self._display[size] = img
+        return img
+
+
+def benchmark_warp(frame_size: Tuple[int, int] = (1280, 720),
+                   size: int = 400,
+                   n: int = 200) -> Dict[str, float]:
+    """warp_chessboard(매 프레임 getPerspectiveTransform + warpPerspective) 대비
+    캐시된 remap 의 프레임당 비용(ms)을 측정한다."""
+    w, h = frame_size
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    corners = np.array([[0.25 * w, 0.12 * h], [0.78 * w, 0.15 * h],
+                        [0.82 * w, 0.9 * h], [0.2 * w, 0.88 * h]], dtype=np.float32)
+    cache = WarpCache()
+    out = np.empty((size, size, 3), np.uint8)
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        ref = warp_chessboard(frame, corners, size=size)
+    t_before = (time.perf_counter() - t0) * 1000.0 / n
+
+    cache.warp(frame, corners, size=size, dst=out)  # 테이블 생성
+    t0 = time.perf_counter()
+    for _ in range(n):
+        cache.warp(frame, corners, size=size, dst=out)
+    t_after = (time.perf_counter() - t0) * 1000.0 / n
+
+    max_err = int(np.abs(ref.astype(np.int16) - out.astype(np.int16))[2:-2, 2:-2].max())
+    result = {"warp_chessboard_ms": t_before, "cached_remap_ms": t_after, "max_abs_diff": max_err}
+    print(f"[warp_cache] {w}x{h} -> {size}x{size}: warp_chessboard {t_before:.3f} ms/frame, "
+          f"cached remap {t_after:.3f} ms/frame (x{t_before / max(t_after, 1e-9):.1f}), "
+          f"max |diff| {max_err}")
+    return result
+
+
+def benchmark_pyramid(frame_size: Tuple[int, int] = (1280, 720),
+                      detect_sizes: Tuple[int, ...] = (64, 128),
+                      display_size: int = 400,
+                      n: int = 200) -> Dict[str, float]:
+    """감지 경로(와프 + 칸 평균)의 프레임당 비용을 감지 해상도별로 측정한다."""
+    try:
+        from cv.board_stats import cell_means
+    except ImportError:
+        from board_stats import cell_means  # type: ignore
+    w, h = frame_size
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    corners = np.array([[0.25 * w, 0.12 * h], [0.78 * w, 0.15 * h],
+                        [0.82 * w, 0.9 * h], [0.2 * w, 0.88 * h]], dtype=np.float32)
+    cache = WarpCache()
+    result: Dict[str, float] = {}
+
+    cases = [(f"detect_{d}", d, False) for d in detect_sizes] + [(f"display_{display_size}", GRID, True)]
+    for name, d, use_display in cases:
+        WarpPyramid(frame, corners, cache, detect_size=d, display_size=display_size).detect
+        t0 = time.perf_counter()
+        for _ in range(n):
+            pyr = WarpPyramid(frame, corners, cache, detect_size=d, display_size=display_size)
+            cell_means(pyr.display() if use_display else pyr.detect)
+        result[name + "_ms"] = (time.perf_counter() - t0) * 1000.0 / n
+    print("[warp_cache] inference path per frame: " +
+          ", ".join(f"{k} {v:.3f}" for k, v in result.items()))
+    return result
+
+
+__all__ = [
+    'WarpCache',
+    'WarpPyramid',
+    'build_warp_maps',
+    'build_sample_maps',
+    'camera_for_frame',
+    'undistort_corners',
+    'distort_map',
+    'benchmark_warp',
+    'benchmark_pyramid',
+]
+
+
+if __name__ == "__main__":
+    benchmark_warp()
+    benchmark_pyramid()
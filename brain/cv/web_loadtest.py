@@ -0,0 +1,246 @@
+"""cv_web 부하 테스트: /events 스트림 클라이언트 N 개 + 제어 요청 루프.
+
+    python -m cv.web_loadtest --url http://raspberrypi:5003 --streams 20 --duration 30
+    python -m cv.web_loadtest --self-host --pin-core 0          # 합성 카메라로 이 프로세스에서 서버 실행
+
+--self-host 는 합성 프레임 캡처로 start_cv_web_server 를 띄우고(임시 기준/기물 파일),
+--pin-core 를 주면 프로세스 전체(서버 포함)를 CPU 코어 하나에 묶어 Pi 한 코어 상황을 흉내 낸다.
+
+측정:
+- 스트림: 클라이언트별 이벤트 수/초, 이벤트 간격 최대값, 연결 실패(503 포함)
+- 제어: 라우트별 지연 p50/p95/max, 오류 수
+- 턴 전환 작업: /next_turn 202 응답 시간과 /jobs/<id> 로 본 완료까지 시간
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+CONTROL_ROUTES = ["/get_corners", "/cache_stats", "/encode_stats", "/snapshot_original"]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+class _StreamClient(threading.Thread):
+    def __init__(self, host: str, port: int, stop: threading.Event):
+        super().__init__(daemon=True)
+        self.host, self.port, self.stop = host, port, stop
+        self.events = 0
+        self.max_gap = 0.0
+        self.error: Optional[str] = None
+
+    def run(self) -> None:
+        try:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=20)
+            conn.request("GET", "/events")
+            resp = conn.getresponse()
+            if resp.status != 200:
+                self.error = f"HTTP {resp.status}"
+                return
+            last = time.monotonic()
+            while not self.stop.is_set():
+                line = resp.fp.readline()
+                if not line:
+                    self.error = "closed"
+                    return
+                if line.startswith(b"data:"):
+                    now = time.monotonic()
+                    if self.events:
+                        self.max_gap = max(self.max_gap, now - last)
+                    last = now
+                    self.events += 1
+            conn.close()
+        except Exception as e:
+            self.error = str(e)
+
+
+def _request(host: str, port: int, method: str, path: str, timeout: float = 10.0):
+    t0 = time.perf_counter()
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request(method, path)
+        resp = conn.getresponse()
+        body = resp.read()
+        return resp.status, body, (time.perf_counter() - t0) * 1000.0
+    finally:
+        conn.close()
+
+
+def run_load_test(url: str, streams: int = 20, duration: float = 20.0,
+                  control_interval: float = 0.25, next_turn: bool = True) -> Dict[str, Any]:
+    u = urlparse(url)
+    host, port = u.hostname or "127.0.0.1", u.port or 80
+    stop = threading.Event()
+    clients = [_StreamClient(host, port, stop) for _ in range(streams)]
+    for c in clients:
+        c.start()
+    time.sleep(0.5)
+
+    latencies: Dict[str, List[float]] = {r: [] for r in CONTROL_ROUTES}
+    errors: Dict[str, int] = {r: 0 for r in CONTROL_ROUTES}
+    job_report: Dict[str, Any] = {}
+
+    def turn_job() -> None:
+        try:
+            status, body, ms = _request(host, port, "POST", "/next_turn")
+            job_report["submit_ms"] = round(ms, 1)
+            job_report["submit_status"] = status
+            if status != 202:
+                return
+            status_url = json.loads(body)["status_url"]
+            t0 = time.monotonic()
+            poll_ms: List[float] = []
+            while time.monotonic() - t0 < 60:
+                _, body, ms = _request(host, port, "GET", status_url)
+                poll_ms.append(ms)
+                job = json.loads(body)
+                if job["state"] in ("done", "failed"):
+                    job_report.update(state=job["state"], error=job.get("error"),
+                                      total_sec=round(time.monotonic() - t0, 2))
+                    break
+                time.sleep(0.5)
+            job_report["poll_p95_ms"] = round(_percentile(poll_ms, 95), 1)
+        except Exception as e:
+            job_report["error"] = str(e)
+
+    job_thread = threading.Thread(target=turn_job, daemon=True) if next_turn else None
+    if job_thread is not None:
+        job_thread.start()
+
+    t_end = time.monotonic() + duration
+    k = 0
+    while time.monotonic() < t_end:
+        route = CONTROL_ROUTES[k % len(CONTROL_ROUTES)]
+        k += 1
+        try:
+            status, _, ms = _request(host, port, "GET", route)
+            if status >= 400:
+                errors[route] += 1
+            else:
+                latencies[route].append(ms)
+        except Exception:
+            errors[route] += 1
+        time.sleep(control_interval)
+
+    stop.set()
+    if job_thread is not None:
+        job_thread.join(5.0)
+    elapsed = duration
+    rates = [c.events / elapsed for c in clients]
+    report = {
+        "streams": {
+            "clients": streams,
+            "failed": sum(1 for c in clients if c.error and c.error != "closed"),
+            "errors": sorted({c.error for c in clients if c.error}),
+            "events_per_sec_min": round(min(rates), 2) if rates else 0.0,
+            "events_per_sec_mean": round(float(np.mean(rates)), 2) if rates else 0.0,
+            "max_gap_sec": round(max((c.max_gap for c in clients), default=0.0), 2),
+        },
+        "control": {
+            r: {
+                "n": len(v),
+                "errors": errors[r],
+                "p50_ms": round(_percentile(v, 50), 1),
+                "p95_ms": round(_percentile(v, 95), 1),
+                "max_ms": round(max(v), 1) if v else 0.0,
+            } for r, v in latencies.items()
+        },
+        "next_turn": job_report,
+    }
+    return report
+
+
+class _SyntheticCapture:
+    """--self-host 용 합성 카메라 (판 무늬 + 노이즈, fps 로 속도 제한)."""
+
+    def __init__(self, size=(640, 480), fps: float = 15.0):
+        w, h = size
+        yy, xx = np.mgrid[0:h, 0:w]
+        board = (((yy * 8 // h) + (xx * 8 // w)) % 2).astype(np.uint8)
+        self._base = np.dstack([board * 140 + 50] * 3).astype(np.uint8)
+        self._rng = np.random.default_rng(0)
+        self._dt = 1.0 / fps
+        self._next = time.monotonic()
+
+    def read(self):
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next) + self._dt
+        noise = self._rng.integers(0, 6, self._base.shape, dtype=np.uint8)
+        return True, self._base + noise
+
+    def release(self):
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def self_host(server: Optional[str] = None, workers: Optional[int] = None) -> str:
+    """합성 캡처로 cv_web 을 이 프로세스에서 띄우고 URL 을 돌려준다."""
+    from cv.cv_web import start_cv_web_server
+
+    tmp = tempfile.mkdtemp(prefix="cv_web_load_")
+    port = _free_port()
+    start_cv_web_server(np_path=os.path.join(tmp, "init_board_values.npy"),
+                        pkl_path=os.path.join(tmp, "chess_pieces.pkl"),
+                        host="127.0.0.1", port=port, use_thread=True,
+                        cap=_SyntheticCapture(), server=server, workers=workers)
+    for _ in range(100):
+        try:
+            _request("127.0.0.1", port, "GET", "/get_corners", timeout=1.0)
+            break
+        except OSError:
+            time.sleep(0.1)
+    _request("127.0.0.1", port, "POST", "/set_init_board")
+    return f"http://127.0.0.1:{port}"
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://127.0.0.1:5001")
+    ap.add_argument("--streams", type=int, default=20)
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--control-interval", type=float, default=0.25)
+    ap.add_argument("--no-next-turn", action="store_true", help="턴 전환 작업은 보내지 않음")
+    ap.add_argument("--self-host", action="store_true", help="합성 카메라로 서버를 이 프로세스에서 실행")
+    ap.add_argument("--server", choices=["dev", "production"], default=None)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--pin-core", type=int, default=None, help="프로세스를 이 CPU 코어 하나에 고정")
+    args = ap.parse_args(argv)
+
+    if args.pin_core is not None:
+        os.sched_setaffinity(0, {args.pin_core})
+        print(f"[web_loadtest] pinned to core {args.pin_core}")
+    url = self_host(args.server, args.workers) if args.self_host else args.url
+    print(f"[web_loadtest] {url}: {args.streams} streams, {args.duration:.0f}s")
+    report = run_load_test(url, args.streams, args.duration, args.control_interval,
+                           next_turn=not args.no_next_turn)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+__all__ = [
+    'run_load_test',
+    'self_host',
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""cv_web 서버 실행 모드.
+
+예전에는 Flask 개발 서버(app.run, threaded=True)를 데몬 스레드에서 돌렸다. 개발 서버는 요청마다
+스레드를 새로 만들고 상한이 없어서, 스트림 클라이언트가 몰리면 스레드가 끝없이 늘고
+제어 요청(/next_turn, /set_init_board 등)과 CPU 를 다툰다.
+
+- mode="production" (기본):
+    waitress 가 설치되어 있으면 waitress(threads=workers) 로 서빙하고,
+    없으면 werkzeug 서버에 고정 크기 워커 풀을 붙인 BoundedWSGIServer 를 쓴다.
+    워커가 모두 바쁘면 backlog 개까지 대기시키고, 그 이상은 바로 503 을 돌려준다.
+- mode="dev": 예전과 같은 app.run (디버깅용).
+
+스트림(/events) 이 워커를 전부 차지하지 않도록 cv_web 은 stream_slots() 로
+동시 스트림 수를 workers - RESERVED_WORKERS 로 제한한다.
+환경 변수 CHESS_WEB_SERVER=dev|production, CHESS_WEB_WORKERS=<n> 로 바꿀 수 있다.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+DEFAULT_WORKERS = 32
+RESERVED_WORKERS = 4     # 스트림이 가득 차도 제어 요청용으로 남겨 두는 워커 수
+DEFAULT_BACKLOG = 64
+KEEPALIVE_TIMEOUT = 5.0  # 유휴 keep-alive 연결이 워커를 붙잡는 최대 시간(초)
+
+_BUSY_RESPONSE = (b"HTTP/1.1 503 Service Unavailable\r\n"
+                  b"Content-Type: text/plain; charset=utf-8\r\n"
+                  b"Retry-After: 1\r\nContent-Length: 11\r\nConnection: close\r\n\r\n"
+                  b"server busy")
+
+
+def server_mode(mode: Optional[str] = None) -> str:
+    mode = (mode or os.environ.get("CHESS_WEB_SERVER") or "production").lower()
+    if mode not in ("dev", "production"):
+        raise ValueError(f"unknown server mode: {mode}")
+    return mode
+
+
+def worker_count(workers: Optional[int] = None) -> int:
+    if workers is None:
+        workers = int(os.environ.get("CHESS_WEB_WORKERS", DEFAULT_WORKERS))
+    return max(RESERVED_WORKERS + 1, int(workers))
+
+
+def stream_slots(workers: Optional[int] = None) -> threading.BoundedSemaphore:
+    """동시 스트림 상한 세마포어 (워커 수 - RESERVED_WORKERS)."""
+    return threading.BoundedSemaphore(worker_count(workers) - RESERVED_WORKERS)
+
+
+class _KeepAliveHandler(WSGIRequestHandler):
+    # 연결 하나가 워커 하나를 쓰므로, 요청 없이 열려 있는 연결은 timeout 뒤에 닫는다
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+
+
+class BoundedWSGIServer(BaseWSGIServer):
+    """요청을 고정 크기 스레드 풀에서 처리하는 werkzeug 서버."""
+
+    multithread = True
+
+    def __init__(self, host: str, port: int, app, workers: int = DEFAULT_WORKERS,
+                 backlog: int = DEFAULT_BACKLOG):
+        super().__init__(host, port, app, handler=_KeepAliveHandler)
+        self.workers = int(workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="http")
+        self._slots = threading.BoundedSemaphore(self.workers + int(backlog))
+        self.rejected = 0
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            try:
+                request.sendall(_BUSY_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._pool.submit(self._work, request, client_address)
+
+    def _work(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+def serve(app, host: str = "0.0.0.0", port: int = 5001, *, mode: Optional[str] = None,
+          workers: Optional[int] = None, backlog: int = DEFAULT_BACKLOG) -> None:
+    """app 을 선택한 모드로 서빙한다 (반환하지 않음)."""
+    mode = server_mode(mode)
+    workers = worker_count(workers)
+    if mode == "dev":
+        print(f"[web_server] dev server (werkzeug threaded) on {host}:{port}")
+        app.run(host=host, port=port, debug=False, use_reloader=False, threaded=True)
+        return
+    try:
+        import waitress
+    except ImportError:
+        waitress = None
+    if waitress is not None:
+        print(f"[web_server] waitress on {host}:{port} (threads={workers})")
+        waitress.serve(app, host=host, port=port, threads=workers,
+                       connection_limit=workers + backlog, ident="chess-cv")
+        return
+    server = BoundedWSGIServer(host, port, app, workers=workers, backlog=backlog)
+    print(f"[web_server] bounded werkzeug on {host}:{port} (workers={workers}, backlog={backlog})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+__all__ = [
+    'DEFAULT_WORKERS',
+    'RESERVED_WORKERS',
+    'server_mode',
+    'worker_count',
+    'stream_slots',
+    'BoundedWSGIServer',
+    'serve',
+]
@@ -8,8 +8,15 @@ import chess
 
 from game import game_state
 from game.board_display import display_board
-from cv.cv_detection import detect_move_via_cv, initialize_board_reference, load_chess_pieces
-from cv.cv_web import USBCapture, ThreadSafeCapture, start_cv_web_server
+from cv.cv_detection import (
+    detect_move_via_cv,
+    initialize_board_reference,
+    load_chess_pieces,
+    refresh_baseline_for_move,
+    wait_for_board_settle,
+)
+from cv.cv_web import USBCapture, start_cv_web_server
+from cv.frame_grabber import FrameGrabber
 from engine.engine_control import get_stockfish_response_move, make_stockfish_move
 from engine.engine_manager import init_engine, shutdown_engine
 from game.game_utils import describe_game_end
@@ -77,7 +84,7 @@ def initialize_game(stockfish_path: str) -> bool:
     try:
         # USB 카메라 기준 캡처 초기화 (자동으로 사용 가능한 장치를 탐색)
         game_state.cv_capture = USBCapture(rotate_90_cw=False, rotate_90_ccw=False, rotate_180=True)
-        game_state.cv_capture_wrapper = ThreadSafeCapture(game_state.cv_capture)
+        game_state.cv_capture_wrapper = FrameGrabber(game_state.cv_capture)
         print(f"[✓] USB 카메라 캡처 초기화 완료 (/dev/video{game_state.cv_capture.index})")
     except Exception as exc:
         game_state.cv_capture = None
@@ -97,6 +104,7 @@ def initialize_game(stockfish_path: str) -> bool:
             use_thread=True,
             cap=game_state.cv_capture_wrapper,
             port=5003,
+            board_provider=lambda: game_state.current_board,
         )
         print("[✓] CV 웹 모니터링 서버 시작 (http://0.0.0.0:5003)")
     except Exception as exc:
@@ -138,8 +146,8 @@ def game_loop() -> None:
         )
 
         if button_signal == "white_turn_end":
-            print("🔘 플레이어 버튼 감지 - 1초 후 CV 작동 시작")
-            time.sleep(1.0)  # 상대방 착수 후 1초 대기
+            print("🔘 플레이어 버튼 감지 - 보드가 안정되면 CV 작동 시작")
+            wait_for_board_settle()  # 고정 1초 대신 손이 빠지고 화면이 멈출 때까지만 대기
             print("🔘 CV 작동 시작")
             handle_player_turn()
         else:
@@ -196,6 +204,8 @@ def handle_player_turn() -> None:
     else:
         print("⚠️ 타이머 이동 명령 전송 실패 (계속 진행)")
 
+    # 로봇이 옮긴 칸만 기준을 다시 잡는다 (다음 사람 수 감지에 로봇 수가 섞이지 않도록)
+    refresh_baseline_for_move(engine_move)
     apply_detected_move(engine_move)
     press_timer_button("P1")
 
@@ -8,6 +8,7 @@ import chess
 BASE_DIR = Path(__file__).resolve().parent
 BOARD_VALUES_PATH = BASE_DIR / "init_board_values.npy"
 CHESS_PIECES_PATH = BASE_DIR / "chess_pieces.pkl"
+OCCUPANCY_MODEL_PATH = BASE_DIR / "occupancy_model.npz"
 
 current_board: chess.Board = chess.Board()
 player_color: str = "white"
@@ -20,13 +21,14 @@ cv_capture: Optional[object] = None
 cv_capture_wrapper: Optional[object] = None
 cv_turn_color: str = "white"
 chess_pieces_state: Optional[list[list[str]]] = None
+occupancy_model: Optional[object] = None
 
 
 def reset_game_state() -> None:
     """게임 전역 상태를 초기값으로 재설정."""
     global current_board, player_color, difficulty, game_over, move_count
     global init_board_values, cv_capture, cv_capture_wrapper, cv_turn_color
-    global chess_pieces_state
+    global chess_pieces_state, occupancy_model
 
     current_board = chess.Board()
     player_color = "white"
@@ -39,4 +41,5 @@ def reset_game_state() -> None:
     cv_capture_wrapper = None
     cv_turn_color = "white"
     chess_pieces_state = None
+    occupancy_model = None
 
@@ -0,0 +1,292 @@
+"""8x8 칸 통계 커널.
+
+와핑된 보드 이미지에서 64칸의 평균/분산/안쪽 마진 평균을
+파이썬 이중 루프 없이 reshape + reduce 한 번으로 계산한다.
+여러 특징(마진별 평균, 분산, 칸의 위쪽 절반 등)을 같은 이미지에서 뽑을 때는
+적분 영상을 한 번 만들고 O(1)로 읽는 `IntegralBoard`를 쓴다.
+brain/cv, CV/, mjpg/ 에서 칸 단위 통계를 쓰는 곳은 모두 이 모듈(같은 내용의 사본)을 사용한다.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+GRID = 8
+CELL_MARGIN_RATIO = 0.08
+
+# 칸 내부 부분영역 (y0, y1, x0, x1) — 칸 크기 대비 비율
+FULL_RECT = (0.0, 1.0, 0.0, 1.0)
+TOP_HALF = (0.0, 0.5, 0.0, 1.0)     # 키 큰 기물(킹/퀸) 머리가 걸리는 영역
+BOTTOM_HALF = (0.5, 1.0, 0.0, 1.0)
+
+
+class BoardStats(NamedTuple):
+    mean: np.ndarray        # (grid, grid, C) 칸 전체 평균
+    var: np.ndarray         # (grid, grid, C) 칸 전체 분산
+    inset_mean: np.ndarray  # (grid, grid, C) 마진을 뺀 안쪽 평균
+
+
+# ---------------------------------------------------------------------------
+# 칸 크기/마진
+# ---------------------------------------------------------------------------
+def cell_geometry(h: int, w: int, grid: int = GRID, margin_ratio: float = 0.0) -> Tuple[int, int, int, int]:
+    """칸 크기(cs_h, cs_w)와 마진(my, mx)을 반환. 마진은 칸 안쪽에 최소 1픽셀을 남긴다."""
+    cs_h, cs_w = h // grid, w // grid
+    if cs_h <= 0 or cs_w <= 0:
+        raise ValueError(f"image too small for {grid}x{grid} grid: {(h, w)}")
+    my = min(int(cs_h * margin_ratio), (cs_h - 1) // 2)
+    mx = min(int(cs_w * margin_ratio), (cs_w - 1) // 2)
+    return cs_h, cs_w, my, mx
+
+
+def alloc_stats(grid: int = GRID, channels: int = 3) -> np.ndarray:
+    """`cell_stats(out=...)`에 넘길 수 있는 (3, grid, grid, C) float32 버퍼."""
+    return np.empty((3, grid, grid, channels), np.float32)
+
+
+def _as_cells(img: np.ndarray, grid: int) -> Tuple[np.ndarray, int, int, int]:
+    """이미지를 (grid, cs_h, grid*cs_w*C) 행 블록 뷰로 바꾼다. 나머지 픽셀은 버린다."""
+    if img.ndim == 2:
+        img = img[:, :, None]
+    h, w, c = img.shape
+    cs_h, cs_w = h // grid, w // grid
+    img = img[:grid * cs_h, :grid * cs_w]
+    if not img.flags.c_contiguous:
+        img = np.ascontiguousarray(img)
+    return img.reshape(grid, cs_h, grid * cs_w * c), cs_h, cs_w, c
+
+
+def _acc_dtype(img: np.ndarray, n_pixels: int, squared: bool):
+    if img.dtype.kind == "f":
+        return np.float64
+    peak = 255 * 255 if squared else 255
+    return np.uint32 if n_pixels * peak < 2 ** 32 else np.uint64
+
+
+def _cell_sums(rows: np.ndarray, grid: int, cs_w: int, c: int,
+               my: int, mx: int, dtype) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """행 방향 → 열 방향 2단계 합. 반환: (칸 전체 합, 안쪽 합 또는 None)."""
+    cs_h = rows.shape[1]
+    if my == 0 and mx == 0:
+        full = rows.sum(axis=1, dtype=dtype).reshape(grid, grid, cs_w, c).sum(axis=2)
+        return full, None
+
+    inner_rows = rows[:, my:cs_h - my].sum(axis=1, dtype=dtype)
+    full_rows = inner_rows.copy()
+    if my:
+        full_rows += rows[:, :my].sum(axis=1, dtype=dtype)
+        full_rows += rows[:, cs_h - my:].sum(axis=1, dtype=dtype)
+    inner = inner_rows.reshape(grid, grid, cs_w, c)[:, :, mx:cs_w - mx].sum(axis=2)
+    full = full_rows.reshape(grid, grid, cs_w, c).sum(axis=2)
+    return full, inner
+
+
+# ---------------------------------------------------------------------------
+# 공개 API
+# ---------------------------------------------------------------------------
+def cell_means(img: np.ndarray,
+               grid: int = GRID,
+               margin_ratio: float = 0.0,
+               out: Optional[np.ndarray] = None) -> np.ndarray:
+    """칸별 평균 (grid, grid, C) float32. 2D 입력이면 (grid, grid).
+
+    margin_ratio > 0 이면 각 칸 가장자리를 잘라낸 안쪽 영역만 평균한다.
+    out 을 주면 그 버퍼에 결과를 채워 반환한다.
+    """
+    rows, cs_h, cs_w, c = _as_cells(img, grid)
+    _, _, my, mx = cell_geometry(cs_h * grid, cs_w * grid, grid, margin_ratio)
+    inner_h, inner_w = cs_h - 2 * my, cs_w - 2 * mx
+    dtype = _acc_dtype(rows, inner_h * inner_w, squared=False)
+
+    if my == 0 and mx == 0:
+        sums, _ = _cell_sums(rows, grid, cs_w, c, 0, 0, dtype)
+    else:
+        sums = rows[:, my:cs_h - my].sum(axis=1, dtype=dtype)
+        sums = sums.reshape(grid, grid, cs_w, c)[:, :, mx:cs_w - mx].sum(axis=2)
+
+    shape = (grid, grid) if img.ndim == 2 else (grid, grid, c)
+    if out is None:
+        out = np.empty(shape, np.float32)
+    np.multiply(sums.reshape(shape), 1.0 / (inner_h * inner_w), out=out, casting="unsafe")
+    return out
+
+
+def cell_stats(img: np.ndarray,
+               grid: int = GRID,
+               margin_ratio: float = CELL_MARGIN_RATIO,
+               out: Optional[np.ndarray] = None) -> BoardStats:
+    """칸별 평균/분산/안쪽 평균을 한 번의 reduce 패스로 계산.
+
+    out 은 `alloc_stats()`로 만든 (3, grid, grid, C) float32 버퍼. 주지 않으면 새로 할당한다.
+    2D 입력이면 C=1 채널로 취급한다.
+    """
+    rows, cs_h, cs_w, c = _as_cells(img, grid)
+    _, _, my, mx = cell_geometry(cs_h * grid, cs_w * grid, grid, margin_ratio)
+    n_full = cs_h * cs_w
+    n_inner = (cs_h - 2 * my) * (cs_w - 2 * mx)
+
+    full, inner = _cell_sums(rows, grid, cs_w, c, my, mx, _acc_dtype(rows, n_full, False))
+    if inner is None:
+        inner = full
+
+    if rows.dtype.kind == "f":
+        sq_rows = np.square(rows, dtype=np.float64)
+    else:
+        sq_rows = np.square(rows, dtype=np.uint16 if rows.dtype.itemsize == 1 else np.uint64)
+    sq_full, _ = _cell_sums(sq_rows, grid, cs_w, c, 0, 0, _acc_dtype(rows, n_full, True))
+
+    if out is None:
+        out = alloc_stats(grid, c)
+    mean, var, inset = out[0], out[1], out[2]
+    mean64 = full / n_full
+    mean[...] = mean64
+    np.maximum(sq_full / n_full - mean64 * mean64, 0.0, out=var, casting="unsafe")
+    np.multiply(inner, 1.0 / n_inner, out=inset, casting="unsafe")
+    return BoardStats(mean, var, inset)
+
+
+def cell_variances(img: np.ndarray, grid: int = GRID, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """칸별 분산 (grid, grid, C) float32. 2D 입력이면 (grid, grid)."""
+    stats = cell_stats(img, grid=grid, margin_ratio=0.0)
+    var = stats.var[:, :, 0] if img.ndim == 2 else stats.var
+    if out is None:
+        return var.copy()
+    out[...] = var
+    return out
+
+
+def cell_diff_norms(means: np.ndarray, base: np.ndarray) -> np.ndarray:
+    """칸별 평균과 기준값의 유클리드 거리 (grid, grid) float32."""
+    return np.linalg.norm(np.asarray(means, np.float32) - np.asarray(base, np.float32), axis=2).astype(np.float32)
+
+
+def bgr_grid_to_lab(board_vals: np.ndarray) -> np.ndarray:
+    """(grid, grid, 3) BGR 평균 격자를 LAB 격자로 변환 (칸마다 cvtColor 하지 않음)."""
+    bgr = np.asarray(board_vals).astype(np.uint8)
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB).astype(np.float32)
+
+
+# ---------------------------------------------------------------------------
+# 적분 영상(summed-area table) 기반 칸 특징
+# ---------------------------------------------------------------------------
+def _span(cs: int, m: int, f0: float, f1: float) -> Tuple[int, int]:
+    """칸 하나(길이 cs, 마진 m) 안에서 비율 [f0, f1) 구간의 오프셋. 최소 1픽셀."""
+    inner = cs - 2 * m
+    a = m + int(round(f0 * inner))
+    b = m + int(round(f1 * inner))
+    a = max(m, min(a, cs - m - 1))
+    b = max(a + 1, min(b, cs - m))
+    return a, b
+
+
+def square_bounds(h: int, w: int,
+                  grid: int = GRID,
+                  rect: Tuple[float, float, float, float] = FULL_RECT,
+                  margin_ratio: float = 0.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """모든 칸의 부분영역 경계 (y1, y2, x1, x2). 각각 shape (grid,) int 배열.
+
+    i행 j열 칸의 영역은 img[y1[i]:y2[i], x1[j]:x2[j]].
+    margin_ratio 만큼 칸 가장자리를 먼저 잘라낸 뒤 rect 비율을 적용한다.
+    """
+    cs_h, cs_w, my, mx = cell_geometry(h, w, grid, margin_ratio)
+    fy0, fy1, fx0, fx1 = rect
+    oy0, oy1 = _span(cs_h, my, fy0, fy1)
+    ox0, ox1 = _span(cs_w, mx, fx0, fx1)
+    base_y = np.arange(grid) * cs_h
+    base_x = np.arange(grid) * cs_w
+    return base_y + oy0, base_y + oy1, base_x + ox0, base_x + ox1
+
+
+class IntegralBoard:
+    """보드 이미지 한 장의 적분 영상(합, 제곱합).
+
+    `update()`로 cv2.integral2 를 한 번 돌린 뒤에는 어떤 마진/부분영역이든
+    칸별 합·평균·분산을 칸당 4번의 조회로 얻는다. 특징을 늘려도 이미지 재스캔이 없다.
+    적분 버퍼와 경계 인덱스는 이미지 크기가 같으면 재사용한다.
+    """
+
+    def __init__(self, grid: int = GRID, squared: bool = True):
+        self.grid = grid
+        self.squared = squared
+        self.shape: Optional[Tuple[int, ...]] = None
+        self._sum: Optional[np.ndarray] = None
+        self._sqsum: Optional[np.ndarray] = None
+        self._index: dict = {}
+
+    def update(self, img: np.ndarray) -> "IntegralBoard":
+        """적분 영상을 새 이미지로 갱신. 8비트면 합은 int32, 그 외엔 float64."""
+        sdepth = cv2.CV_32S if img.dtype == np.uint8 else cv2.CV_64F
+        if img.shape != self.shape or self._sum is None or self._sum.dtype != (
+                np.int32 if sdepth == cv2.CV_32S else np.float64):
+            self.shape = img.shape
+            self._index.clear()
+            self._sum = None
+            self._sqsum = None
+        if self.squared:
+            self._sum, self._sqsum = cv2.integral2(img, sum=self._sum, sqsum=self._sqsum,
+                                                   sdepth=sdepth, sqdepth=cv2.CV_64F)
+        else:
+            self._sum = cv2.integral(img, sum=self._sum, sdepth=sdepth)
+        return self
+
+    def _ix(self, rect, margin_ratio):
+        key = (tuple(rect), float(margin_ratio))
+        ix = self._index.get(key)
+        if ix is None:
+            if self.shape is None:
+                raise RuntimeError("IntegralBoard.update() must be called first")
+            y1, y2, x1, x2 = square_bounds(self.shape[0], self.shape[1], self.grid, rect, margin_ratio)
+            area = float((y2[0] - y1[0]) * (x2[0] - x1[0]))
+            ix = (np.ix_(y2, x2), np.ix_(y1, x2), np.ix_(y2, x1), np.ix_(y1, x1), area)
+            self._index[key] = ix
+        return ix
+
+    @staticmethod
+    def _box(table: np.ndarray, ix) -> np.ndarray:
+        br, tr, bl, tl, _ = ix
+        return table[br].astype(np.float64) - table[tr] - table[bl] + table[tl]
+
+    def _shape_out(self, v: np.ndarray) -> np.ndarray:
+        if len(self.shape) == 3 and v.ndim == 2:
+            v = v[:, :, None]
+        return v.astype(np.float32)
+
+    def sums(self, rect=FULL_RECT, margin_ratio: float = 0.0) -> np.ndarray:
+        """칸별 합 (grid, grid[, C]) float32."""
+        return self._shape_out(self._box(self._sum, self._ix(rect, margin_ratio)))
+
+    def means(self, rect=FULL_RECT, margin_ratio: float = 0.0) -> np.ndarray:
+        """칸별 평균 (grid, grid[, C]) float32."""
+        ix = self._ix(rect, margin_ratio)
+        return self._shape_out(self._box(self._sum, ix) / ix[4])
+
+    def variances(self, rect=FULL_RECT, margin_ratio: float = 0.0) -> np.ndarray:
+        """칸별 분산 (grid, grid[, C]) float32. squared=True 로 만든 경우에만 사용 가능."""
+        if self._sqsum is None:
+            raise RuntimeError("IntegralBoard was built with squared=False")
+        ix = self._ix(rect, margin_ratio)
+        mean = self._box(self._sum, ix) / ix[4]
+        var = self._box(self._sqsum, ix) / ix[4] - mean * mean
+        return self._shape_out(np.maximum(var, 0.0))
+
+
+__all__ = [
+    'GRID',
+    'CELL_MARGIN_RATIO',
+    'FULL_RECT',
+    'TOP_HALF',
+    'BOTTOM_HALF',
+    'BoardStats',
+    'IntegralBoard',
+    'cell_geometry',
+    'alloc_stats',
+    'cell_means',
+    'cell_stats',
+    'cell_variances',
+    'cell_diff_norms',
+    'bgr_grid_to_lab',
+    'square_bounds',
+]
@@ -1,8 +1,10 @@
 from flask import Flask, render_template, Response
 from picamera2 import Picamera2
-import cv2
+
+from jpeg_encoder import StreamProfile, get_encoder
 
 app = Flask(__name__)
+CAM_PROFILE = StreamProfile("cam", target_kb=30, max_encode_ms=10)
 camera = Picamera2()
 camera.configure(camera.create_video_configuration(main={"size": (640, 480)}))
 camera.start()
@@ -10,8 +12,7 @@ camera.start()
 def gen_frames():
     while True:
         frame = camera.capture_array()
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
+        frame = get_encoder().encode(frame, profile=CAM_PROFILE)
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
 
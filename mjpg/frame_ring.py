@@ -0,0 +1,243 @@
+"""캡처 래퍼용 미리 할당한 프레임 버퍼 링과 방향 보정.
+
+USBCapture / PiCam2Capture 의 read() 가 프레임마다 새 배열을 만들지 않도록
+- FrameRing: 같은 크기의 버퍼 N 개를 돌려 쓴다. read() 가 반환한 배열은 N 번
+  뒤의 read() 에서 덮어써지므로, 그보다 오래 들고 있을 소비자는 copy() 한다.
+- orient_into(src, dst, rotate_deg, flip): 회전/좌우/상하 반전을 합쳐
+  cv2.flip 또는 cv2.rotate 한 번으로 dst 에 쓴다 (180도 = flip(-1)).
+- read_picam_bgr(picam2, dst): Picamera2 요청 버퍼를 복사 없이 매핑해
+  RGB→BGR 변환 결과를 바로 dst 에 쓴다.
+- measure_read_allocations(cap): tracemalloc 으로 read() 한 번당 새로 잡히는
+  메모리를 잰다 (python -m cv.frame_ring 으로 예전 방식과 비교).
+
+brain/cv, CV/, mjpg/ 에 같은 내용의 사본이 있다.
+"""
+
+from __future__ import annotations
+
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+RING_SIZE = 6   # 30fps 기준 약 200ms 동안 프레임이 유지된다
+
+_ROTATE_CODES = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+class FrameRing:
+    """미리 할당한 프레임 버퍼 size 개를 차례로 돌려 주는 링."""
+
+    def __init__(self, size: int = RING_SIZE):
+        if size < 1:
+            raise ValueError("ring size must be >= 1")
+        self.size = int(size)
+        self._bufs: List[np.ndarray] = []
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._idx = 0
+        self.allocations = 0
+
+    def next(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """다음 버퍼. 프레임 크기가 바뀌었을 때만 링 전체를 다시 할당한다."""
+        shape = tuple(int(v) for v in shape)
+        if shape != self._shape or self._bufs[0].dtype != dtype:
+            self._bufs = [np.empty(shape, dtype) for _ in range(self.size)]
+            self._shape = shape
+            self._idx = 0
+            self.allocations += 1
+        buf = self._bufs[self._idx]
+        self._idx = (self._idx + 1) % self.size
+        return buf
+
+
+def flip_code(hflip: bool, vflip: bool) -> Optional[int]:
+    """cv2.flip 코드. 둘 다면 -1, 좌우 1, 상하 0, 없으면 None."""
+    if hflip and vflip:
+        return -1
+    if hflip:
+        return 1
+    if vflip:
+        return 0
+    return None
+
+
+def net_rotation(rotate_180: bool = False, rotate_90_ccw: bool = False,
+                 rotate_90_cw: bool = False) -> int:
+    """USBCapture 회전 옵션(180 다음 90)을 시계 방향 각도 하나로 합친다."""
+    deg = 180 if rotate_180 else 0
+    if rotate_90_ccw:
+        deg += 270
+    elif rotate_90_cw:
+        deg += 90
+    return deg % 360
+
+
+def oriented_shape(shape: Tuple[int, ...], rotate_deg: int) -> Tuple[int, ...]:
+    if rotate_deg in (90, 270):
+        return (shape[1], shape[0]) + tuple(shape[2:])
+    return tuple(shape)
+
+
+def orient_into(src: np.ndarray, dst: np.ndarray, rotate_deg: int = 0,
+                flip: Optional[int] = None) -> np.ndarray:
+    """src 를 시계 방향 rotate_deg 회전 후 flip 코드로 반전한 결과를 dst 에 쓴다.
+
+    180도 회전은 flip(-1) 과 같으므로 반전 코드와 합쳐 flip 한 번으로 처리한다.
+    90/270 도는 cv2.rotate 한 번 + (필요하면) 제자리 flip 한 번.
+    dst 가 src 와 같은 배열이어도 된다(90/270 도 제외).
+    """
+    if rotate_deg == 180:
+        # 180 = flip(-1). 추가 반전과 합치면: -1∘1 = 0, -1∘0 = 1, -1∘-1 = 없음
+        flip = {None: -1, 1: 0, 0: 1, -1: None}[flip]
+        rotate_deg = 0
+    if rotate_deg == 0:
+        if flip is None:
+            if dst is not src:
+                np.copyto(dst, src)
+            return dst
+        return cv2.flip(src, flip, dst=dst)
+    cv2.rotate(src, _ROTATE_CODES[rotate_deg], dst=dst)
+    if flip is not None:
+        cv2.flip(dst, flip, dst=dst)
+    return dst
+
+
+_mapped_array = None  # picamera2.MappedArray (없으면 False). 첫 호출 때 한 번만 import
+
+
+def read_picam_bgr(picam2, dst: Optional[np.ndarray] = None) -> np.ndarray:
+    """Picamera2 한 프레임을 dst 에 BGR 로 쓴다 (dst 가 None/크기 불일치면 새로 할당).
+
+    MappedArray 로 요청 버퍼를 직접 매핑하므로 capture_array() 의 복사가 없다.
+    MappedArray 가 없는 구버전 picamera2 면 capture_array() 로 대신한다.
+    """
+    global _mapped_array
+    if _mapped_array is None:
+        try:
+            from picamera2 import MappedArray as _ma
+        except ImportError:
+            _ma = False
+        _mapped_array = _ma
+    MappedArray = _mapped_array
+
+    if not MappedArray:
+        rgb = picam2.capture_array()
+        if dst is None or dst.shape != rgb.shape:
+            dst = np.empty_like(rgb)
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=dst)
+
+    request = picam2.capture_request()
+    try:
+        with MappedArray(request, "main") as m:
+            rgb = m.array
+            if dst is None or dst.shape != rgb.shape:
+                dst = np.empty(rgb.shape, np.uint8)
+            cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=dst)
+    finally:
+        request.release()
+    return dst
+
+
+def measure_read_allocations(cap, n_frames: int = 60, warmup: int = 10) -> Dict[str, float]:
+    """tracemalloc 으로 정상 상태 read() 한 번당 할당량(바이트)을 잰다.
+
+    warmup 프레임 동안 링/스크래치 버퍼가 자리잡게 한 뒤 측정한다.
+    반환: 프레임 수, 프레임당 할당 바이트 합계/최대 피크, 프레임당 시간(ms).
+    """
+    for _ in range(warmup):
+        cap.read()
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    total = 0
+    worst = 0
+    t0 = time.perf_counter()
+    try:
+        for _ in range(n_frames):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            ret, frame = cap.read()
+            peak = tracemalloc.get_traced_memory()[1] - before
+            total += max(peak, 0)
+            worst = max(worst, peak)
+            del frame
+    finally:
+        elapsed = time.perf_counter() - t0
+        if not was_tracing:
+            tracemalloc.stop()
+    return {
+        "frames": n_frames,
+        "bytes_per_frame": total / max(n_frames, 1),
+        "max_bytes": float(worst),
+        "ms_per_frame": elapsed * 1000.0 / max(n_frames, 1),
+    }
+
+
+class _SyntheticSource:
+    """카메라 없이 측정할 때 쓰는 RGB 프레임 소스 (capture_array 흉내)."""
+
+    def __init__(self, size=(1280, 720)):
+        w, h = size
+        self.frame = np.random.default_rng(0).integers(0, 255, (h, w, 3), dtype=np.uint8)
+
+    def capture_array(self) -> np.ndarray:
+        return self.frame
+
+
+class _AllocatingCapture:
+    """예전 방식: 프레임마다 cvtColor + rotate 새 배열."""
+
+    def __init__(self, src: _SyntheticSource):
+        self.src = src
+
+    def read(self):
+        bgr = cv2.cvtColor(self.src.capture_array(), cv2.COLOR_RGB2BGR)
+        return True, cv2.rotate(bgr, cv2.ROTATE_180)
+
+
+class _RingCapture:
+    """링 방식: 링 버퍼에 변환 후 제자리 flip(-1)."""
+
+    def __init__(self, src: _SyntheticSource, ring_size: int = RING_SIZE):
+        self.src = src
+        self.ring = FrameRing(ring_size)
+
+    def read(self):
+        rgb = self.src.capture_array()
+        buf = self.ring.next(rgb.shape)
+        cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=buf)
+        return True, orient_into(buf, buf, rotate_deg=180)
+
+
+def benchmark_ring(size=(1280, 720), n_frames: int = 60) -> Dict[str, Dict[str, float]]:
+    src = _SyntheticSource(size)
+    report = {
+        "allocating": measure_read_allocations(_AllocatingCapture(src), n_frames),
+        "ring": measure_read_allocations(_RingCapture(src), n_frames),
+    }
+    for name, r in report.items():
+        print(f"[frame_ring] {name:10s} {r['bytes_per_frame'] / 1024:10.1f} KiB/frame "
+              f"(max {r['max_bytes'] / 1024:.1f} KiB), {r['ms_per_frame']:.2f} ms/frame")
+    return report
+
+
+__all__ = [
+    'RING_SIZE',
+    'FrameRing',
+    'flip_code',
+    'net_rotation',
+    'oriented_shape',
+    'orient_into',
+    'read_picam_bgr',
+    'measure_read_allocations',
+    'benchmark_ring',
+]
+
+
+if __name__ == "__main__":
+    benchmark_ring()
@@ -17,10 +17,16 @@ from piece_auto_update import update_chess_pieces
 #   - 초록마커(find_green_corners) 대신 베이지칸 기반 + 안정화
 from warp_cam_picam2_stable_v2 import (
     warp_chessboard,
+    build_square_sample_maps,
+    sample_board,
 )
 
 # ▶▶ 추가: 쌍 매칭(pairing)로 이동칸 추정
 from piece_recognition import _pair_moves
+from board_stats import IntegralBoard, bgr_grid_to_lab, cell_diff_norms, cell_means
+from file_capture import capture_from_env
+from stream_hub import MULTIPART_MIMETYPE, StreamHub
+from jpeg_encoder import StreamProfile, get_encoder
 
 # ==== 경로(절대) ====
 BASE_DIR = Path(__file__).resolve().parent
@@ -35,10 +41,15 @@ USE_PICAM2 = True  # CSI 카메라(PiCam2)면 True, USB 웹캠이면 False
 if USE_PICAM2:
     # Picamera2를 VideoCapture처럼 쓰기 위한 간단 래퍼
     class PiCam2Capture:
+        """read() 는 미리 할당한 링 버퍼에 BGR 로 바로 쓰고 반전은 제자리 flip 한 번."""
         def __init__(self, size=(1280, 720), fps=30, hflip=False, vflip=False):
             from picamera2 import Picamera2
+            from frame_ring import FrameRing, flip_code
             self.hflip = hflip
             self.vflip = vflip
+            self._ring = FrameRing()
+            self._flip = flip_code(hflip, vflip)
+            self._shape = None
             self.picam2 = Picamera2()
             cfg = self.picam2.create_preview_configuration(
                 main={"size": size, "format": "RGB888"},
@@ -48,14 +59,11 @@ if USE_PICAM2:
             self.picam2.start()
 
         def read(self):
-            import cv2
-            rgb = self.picam2.capture_array()
-            bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
-            if self.hflip:
-                bgr = cv2.flip(bgr, 1)
-            if self.vflip:
-                bgr = cv2.flip(bgr, 0)
-            return True, bgr
+            from frame_ring import orient_into, read_picam_bgr
+            buf = self._ring.next(self._shape) if self._shape is not None else None
+            bgr = read_picam_bgr(self.picam2, buf)
+            self._shape = bgr.shape
+            return True, orient_into(bgr, bgr, 0, self._flip)
 
         def release(self):
             try:
@@ -63,14 +71,17 @@ if USE_PICAM2:
             except Exception:
                 pass
 
-    cap = PiCam2Capture()  # <-- CSI 카메라
+    # CHESS_REPLAY=<영상|이미지 폴더|npz> 이면 카메라 대신 녹화 프레임을 재생
+    cap = capture_from_env(PiCam2Capture)  # <-- CSI 카메라
 else:
     import cv2
-    cap = cv2.VideoCapture(0, cv2.CAP_V4L2)  # <-- USB 웹캠
-    # 필요 시 해상도/FPS 세팅
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-    cap.set(cv2.CAP_PROP_FPS, 30)
+    cap = capture_from_env()
+    if cap is None:
+        cap = cv2.VideoCapture(0, cv2.CAP_V4L2)  # <-- USB 웹캠
+        # 필요 시 해상도/FPS 세팅
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        cap.set(cv2.CAP_PROP_FPS, 30)
 
 latest_frame = None
 # 수동 와핑 모드 상태
@@ -122,11 +133,13 @@ def _set_manual_corners(points):
     ordered = _order_corners_tl_tr_br_bl(arr)
     manual_corners = ordered
     manual_mode = True
+    _invalidate_sample_maps()
 
 def _clear_manual_corners():
     global manual_corners, manual_mode
     manual_corners = None
     manual_mode = False
+    _invalidate_sample_maps()
 
 def _get_corners_for_frame(frame):
     """수동 코너만 사용. 없으면 None."""
@@ -182,24 +195,38 @@ def _is_color_piece(code, color):
 # =======================
 # 노이즈 억제 도우미 (LAB + 다중 프레임 평균)
 # =======================
-def _mean_lab_board_from_warp(warp):
-    h, w = warp.shape[:2]
-    cell_h = h // 8
-    cell_w = w // 8
+def _mean_lab_board_from_warp(warp, out=None):
     lab = cv2.cvtColor(warp, cv2.COLOR_BGR2LAB)
-    out = np.zeros((8, 8, 3), np.float32)
-    for i in range(8):
-        for j in range(8):
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            x1, x2 = j * cell_w, (j + 1) * cell_w
-            cell = lab[y1:y2, x1:x2]
-            out[i, j] = cell.reshape(-1, 3).mean(axis=0)
-    return out
+    return cell_means(lab, out=out)
 
 # 자동 코너 탐지는 제거됨
 
-def _capture_avg_lab_board(cap, n_frames=8, sleep_sec=0.02):
+# 감지용 칸 샘플 remap 테이블 (수동 코너가 바뀔 때만 재생성)
+_sample_maps_key = None
+_sample_maps = None
+
+def _invalidate_sample_maps():
+    global _sample_maps_key
+    _sample_maps_key = None
+
+def _sample_board_for_frame(frame, size=400):
+    """전체 와핑 없이 칸당 샘플만 모은 모자이크(64x64). 칸 평균 계산 전용."""
+    global _sample_maps_key, _sample_maps
+    corners = _get_corners_for_frame(frame)
+    if corners is None or len(corners) != 4:
+        h, w = frame.shape[:2]
+        corners = np.array([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]], dtype=np.float32)
+    corners = np.asarray(corners, dtype=np.float32)
+    key = (corners.tobytes(), frame.shape[:2], size)
+    if key != _sample_maps_key:
+        _sample_maps = build_square_sample_maps(corners, warp_size=size)
+        _sample_maps_key = key
+    return sample_board(frame, _sample_maps)
+
+def _capture_avg_lab_board(cap, n_frames=8, sleep_sec=0.02, sparse=False):
+    """sparse=True 면 와프 대신 칸 샘플 모자이크로 계산하고 그것을 두 번째 값으로 반환"""
     acc = np.zeros((8, 8, 3), np.float32)
+    means = np.empty((8, 8, 3), np.float32)
     cnt = 0
     last_warp = None
 
@@ -208,14 +235,17 @@ def _capture_avg_lab_board(cap, n_frames=8, sleep_sec=0.02):
         if not ret:
             break
 
-        corners = _get_corners_for_frame(frame)
-        if corners is not None and len(corners) == 4:
-            warp = warp_chessboard(frame, corners, size=400)
+        if sparse:
+            warp = _sample_board_for_frame(frame, size=400)
         else:
-            warp = cv2.resize(frame, (400, 400))
+            corners = _get_corners_for_frame(frame)
+            if corners is not None and len(corners) == 4:
+                warp = warp_chessboard(frame, corners, size=400)
+            else:
+                warp = cv2.resize(frame, (400, 400))
 
         last_warp = warp
-        acc += _mean_lab_board_from_warp(warp)
+        acc += _mean_lab_board_from_warp(warp, out=means)
         cnt += 1
         time.sleep(sleep_sec)
 
@@ -226,6 +256,11 @@ def _capture_avg_lab_board(cap, n_frames=8, sleep_sec=0.02):
 # =======================
 # 견고성 향상: 에지/텍스처 맵 (원본 유지 - /base_board_img용)
 # =======================
+# 맵마다 IntegralBoard 하나를 두고 update()로 적분 버퍼를 재사용 (Flask 스레드 간 공유 → 락)
+_EDGE_BOARD = IntegralBoard(squared=False)
+_LVAR_BOARD = IntegralBoard()
+_MAP_LOCK = threading.Lock()
+
 def _edge_density_map(warp_img):
     try:
         gray = cv2.cvtColor(warp_img, cv2.COLOR_BGR2GRAY)
@@ -237,33 +272,17 @@ def _edge_density_map(warp_img):
     lower = max(10, min(80, int(0.33 * np.sqrt(max(1.0, v)))))
     upper = int(lower * 2.5)
     edges = cv2.Canny(eq, lower, upper)
-    h, w = edges.shape[:2]
-    cell_h, cell_w = h // 8, w // 8
-    out = np.zeros((8, 8), np.float32)
-    for i in range(8):
-        for j in range(8):
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            x1, x2 = j * cell_w, (j + 1) * cell_w
-            cell = edges[y1:y2, x1:x2]
-            total = cell.size
-            out[i, j] = 0.0 if total == 0 else float(np.count_nonzero(cell)) / float(total)
-    return out
+    # 엣지는 0/255 이므로 칸 평균/255 = 엣지 픽셀 비율
+    with _MAP_LOCK:
+        return _EDGE_BOARD.update(edges).means() / 255.0
 
-def _l_variance_map(warp_img):
+def _l_variance_map(warp_img, margin_ratio=0.0):
     lab = cv2.cvtColor(warp_img, cv2.COLOR_BGR2LAB)
     L = lab[:, :, 0]
     clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
     L_eq = clahe.apply(L)
-    h, w = L_eq.shape[:2]
-    cell_h, cell_w = h // 8, w // 8
-    out = np.zeros((8, 8), np.float32)
-    for i in range(8):
-        for j in range(8):
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            x1, x2 = j * cell_w, (j + 1) * cell_w
-            cell = L_eq[y1:y2, x1:x2]
-            out[i, j] = float(np.var(cell))
-    return out
+    with _MAP_LOCK:
+        return _LVAR_BOARD.update(L_eq).variances(margin_ratio=margin_ratio)
 
 # =======================
 # 부팅 시 보드/기준 로드
@@ -325,9 +344,16 @@ def gen_original_frames_with_hsv():
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
-def _encode_jpeg(img):
-    ret, buf = cv2.imencode('.jpg', img)
-    return buf.tobytes() if ret else b''
+# 스트림별 프레임 크기 목표 (품질/축소는 jpeg_encoder 가 자동 조절)
+WARP_PROFILE = StreamProfile("warp_manual", target_kb=30, max_encode_ms=10)
+PIECE_PROFILE = StreamProfile("piece", target_kb=30, max_encode_ms=10)
+
+def _encode_jpeg(img, profile=None):
+    # 공용 인코더 풀에서 인코딩. profile 이 없으면 예전 imencode 기본값(95) 고정
+    try:
+        return get_encoder().encode(img, profile=profile, quality=95)
+    except RuntimeError:
+        return b''
 
 def _draw_corners_on_image(img, corners, color=(0, 255, 255)):
     out = img.copy()
@@ -347,25 +373,26 @@ def gen_warped_frames_manual(cap, size=400):
             continue
         corners = _get_corners_for_frame(frame)
         warp = warp_chessboard(frame, corners, size=size) if corners is not None else cv2.resize(frame, (size, size))
-        frame_bytes = _encode_jpeg(warp)
+        frame_bytes = _encode_jpeg(warp, WARP_PROFILE)
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
 # ---------- 스트림 라우트 ----------
+# 스트림마다 프로듀서 하나가 렌더링/인코딩하고 접속한 클라이언트 모두에게 나눠준다
+stream_hub = StreamHub()
+
 @app.route('/warp')
 def warp_feed():
     # 항상 수동 코너 기반 와핑 제네레이터 사용
-    return Response(gen_warped_frames_manual(cap), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(stream_hub.stream('warp'), mimetype=MULTIPART_MIMETYPE)
 
 @app.route('/original')
 def original_feed():
-    return Response(gen_original_frames_with_hsv(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(stream_hub.stream('original'), mimetype=MULTIPART_MIMETYPE)
 
 @app.route('/edges')
 def edges_feed():
-    # 항상 WarpedCapture 사용
-    local_cap = WarpedCapture(cap)
-    return Response(gen_edges_frames(local_cap), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(stream_hub.stream('edges'), mimetype=MULTIPART_MIMETYPE)
 
 # 차이 시각화
 def _draw_piece_diff(warp_img, top_k=2):
@@ -375,19 +402,11 @@ def _draw_piece_diff(warp_img, top_k=2):
     canvas = warp_img.copy()
     if init_board_values is None:
         return canvas
-    diffs = []
-    for i in range(8):
-        for j in range(8):
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            x1, x2 = j * cell_w, (j + 1) * cell_w
-            cell = warp_img[y1:y2, x1:x2]
-            mean_bgr = np.mean(cell.reshape(-1, 3), axis=0)
-            diff = float(np.linalg.norm(mean_bgr - init_board_values[i, j]))
-            diffs.append((diff, i, j))
-    diffs.sort(reverse=True)
-    k = max(0, min(top_k, len(diffs)))
+    diffs = cell_diff_norms(cell_means(warp_img), init_board_values).reshape(-1)
+    order = np.argsort(-diffs, kind='stable')
+    k = max(0, min(top_k, len(order)))
     for n in range(k):
-        _, i, j = diffs[n]
+        i, j = divmod(int(order[n]), 8)
         y1, y2 = i * cell_h, (i + 1) * cell_h
         x1, x2 = j * cell_w, (j + 1) * cell_w
         cv2.rectangle(canvas, (x1, y1), (x2, y2), (0, 0, 255), 3)
@@ -407,16 +426,28 @@ def gen_piece_frames_local(cap, size=400, top_k=2):
         except Exception:
             pass
         vis = _draw_piece_diff(warp, top_k=top_k)
-        frame_bytes = _encode_jpeg(vis)
+        frame_bytes = _encode_jpeg(vis, PIECE_PROFILE)
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
 @app.route('/piece')
 def piece_feed():
-    # 로컬 제너레이터로 교체하여 400x400 기준으로만 렌더링 (검정 여백 방지)
-    local_cap = WarpedCapture(cap)
-    return Response(gen_piece_frames_local(local_cap, size=400, top_k=2),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(stream_hub.stream('piece'), mimetype=MULTIPART_MIMETYPE)
+
+stream_hub.register('warp', lambda: gen_warped_frames_manual(cap))
+stream_hub.register('original', gen_original_frames_with_hsv)
+# edges/piece 는 항상 WarpedCapture 사용.
+# piece 는 로컬 제너레이터로 400x400 기준으로만 렌더링 (검정 여백 방지)
+stream_hub.register('edges', lambda: gen_edges_frames(WarpedCapture(cap)))
+stream_hub.register('piece', lambda: gen_piece_frames_local(WarpedCapture(cap), size=400, top_k=2))
+
+@app.route('/stream_stats')
+def stream_stats():
+    return jsonify(stream_hub.stats())
+
+@app.route('/encode_stats')
+def encode_stats():
+    return jsonify(get_encoder().stats())
 
 # ---------- 상태 라우트 ----------
 @app.route('/turn_status')
@@ -461,17 +492,8 @@ def base_board_img():
         else:
             warp = cv2.resize(frame, (400, 400))
 
-        diff_vals = np.zeros((8, 8), dtype=np.float32)
-        diff_list = []
-        for i in range(8):
-            for j in range(8):
-                y1, y2 = i * cell_h, (i + 1) * cell_h
-                x1, x2 = j * cell_w, (j + 1) * cell_w
-                cell = warp[y1:y2, x1:x2]
-                mean_bgr = np.mean(cell.reshape(-1, 3), axis=0)
-                diff = np.linalg.norm(mean_bgr - init_board_values[i, j])
-                diff_vals[i, j] = diff
-                diff_list.append((diff, i, j))
+        diff_vals = cell_diff_norms(cell_means(warp), init_board_values)
+        diff_list = [(float(diff_vals[i, j]), i, j) for i in range(8) for j in range(8)]
 
         for i in range(8):
             for j in range(8):
@@ -495,8 +517,7 @@ def base_board_img():
             if shown == 2:
                 break
 
-    _, buffer = cv2.imencode('.jpg', base_img)
-    return Response(buffer.tobytes(), mimetype='image/jpeg')
+    return Response(_encode_jpeg(base_img), mimetype='image/jpeg')
 
 # ---------- 디버그: 코너/와프 확인 ----------
 @app.route('/debug_original')
@@ -536,8 +557,7 @@ def snapshot_original():
         latest_frame = frame
     # 원본 해상도/비율 그대로 반환
     img = latest_frame.copy()
-    _, buf = cv2.imencode('.jpg', img)
-    return Response(buf.tobytes(), mimetype='image/jpeg')
+    return Response(_encode_jpeg(img), mimetype='image/jpeg')
 
 # ---------- 기준값 저장 ----------
 @app.route('/set_init_board', methods=['POST'])
@@ -554,16 +574,7 @@ def set_init_board():
     corners = _get_corners_for_frame(frame)
     warp = warp_chessboard(frame, corners, size=400) if corners is not None else cv2.resize(frame, (400, 400))
 
-    h, w = warp.shape[:2]
-    cell_h = h // 8
-    cell_w = w // 8
-    board_vals = np.zeros((8, 8, 3), dtype=np.float32)
-    for i in range(8):
-        for j in range(8):
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            x1, x2 = j * cell_w, (j + 1) * cell_w
-            cell = warp[y1:y2, x1:x2]
-            board_vals[i, j] = np.mean(cell.reshape(-1, 3), axis=0)
+    board_vals = cell_means(warp)
 
     np.save(NPPATH, board_vals)
     init_board_values = board_vals
@@ -596,19 +607,14 @@ def next_turn():
     prev_board_values = np.load(NPPATH) if os.path.exists(NPPATH) else None
 
     # --- 현재 보드 LAB 평균 (다중 프레임 평균) ---
-    curr_lab, warp = _capture_avg_lab_board(cap, n_frames=8, sleep_sec=0.02)
+    curr_lab, warp = _capture_avg_lab_board(cap, n_frames=8, sleep_sec=0.02, sparse=True)
     if curr_lab is None:
         return '현재 보드 캡처 실패', 500
     prev_warp = warp.copy()
 
     # --- 이전 기준 BGR -> LAB ---
     if prev_board_values is not None:
-        prev_lab = np.zeros((8, 8, 3), np.float32)
-        for i in range(8):
-            for j in range(8):
-                bgr = np.array(prev_board_values[i, j], dtype=np.uint8)[None, None, :]
-                lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB).astype(np.float32)
-                prev_lab[i, j] = lab[0, 0]
+        prev_lab = bgr_grid_to_lab(prev_board_values)
     else:
         prev_lab = curr_lab.copy()
 
@@ -634,16 +640,7 @@ def next_turn():
         print(f"[WARN] pair 없음 → fallback src/dst={src}->{dst}")
 
     # --- 다음 턴 기준 저장용 BGR 평균 ---
-    h, w = warp.shape[:2]
-    cell_h = h // 8
-    cell_w = w // 8
-    board_vals = np.zeros((8, 8, 3), np.float32)
-    for i in range(8):
-        for j in range(8):
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            x1, x2 = j * cell_w, (j + 1) * cell_w
-            cell = warp[y1:y2, x1:x2]
-            board_vals[i, j] = cell.reshape(-1, 3).mean(axis=0)
+    board_vals = cell_means(warp)
 
     # ---- 이동 반영 ----
     try:
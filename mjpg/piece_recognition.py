@@ -3,6 +3,8 @@ import cv2
 import numpy as np
 import os
 
+from board_stats import cell_means
+from jpeg_encoder import StreamProfile, get_encoder
 from warp_cam_picam2_stable_v2 import (
     find_chessboard_by_first_last_squares as find_corners,
     warp_chessboard,
@@ -36,17 +38,9 @@ def _safe_find_corners(frame):
     return use
 
 # ==== 이동 감지 도우미 ====
-def _compute_lab_means(warp, grid=8):
-    h, w = warp.shape[:2]
-    cell_h, cell_w = h // grid, w // grid
+def _compute_lab_means(warp, grid=8, out=None):
     lab = cv2.cvtColor(warp, cv2.COLOR_BGR2LAB)
-    out = np.zeros((grid, grid, 3), np.float32)
-    for i in range(grid):
-        for j in range(grid):
-            y1,y2 = i*cell_h,(i+1)*cell_h
-            x1,x2 = j*cell_w,(j+1)*cell_w
-            out[i,j] = lab[y1:y2,x1:x2].reshape(-1,3).mean(axis=0)
-    return out
+    return cell_means(lab, grid=grid, out=out)
 
 def _detrend_deltas(deltas):
     mean_shift = deltas.reshape(-1, 3).mean(axis=0, dtype=np.float32)
@@ -60,6 +54,8 @@ def _pair_moves(deltas_flat, norms_flat, threshold=9.0):
     return [(candidates[0], candidates[1])]
 
 # ==== 스트리머 ====
+EDGES_PROFILE = StreamProfile("edges", target_kb=30, max_encode_ms=10)
+
 def gen_edges_frames(cap, base_board_path, threshold=9.0, top_k=2):
     prev_warp = None
     last_corners = None
@@ -75,14 +71,15 @@ def gen_edges_frames(cap, base_board_path, threshold=9.0, top_k=2):
             ret, frame = cap.read()
             if not ret:
                 continue
-            _, jpeg = cv2.imencode('.jpg', frame)
-            yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
+            jpeg = get_encoder().encode(frame, profile=EDGES_PROFILE)
+            yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
         return
 
     base_bgr = np.load(base_board_path)
     base_lab = cv2.cvtColor(base_bgr.astype(np.uint8), cv2.COLOR_BGR2LAB).astype(np.float32)
 
     ema_means = None
+    means = np.empty((8, 8, 3), np.float32)
 
     while True:
         ret, frame = cap.read()
@@ -107,7 +104,7 @@ def gen_edges_frames(cap, base_board_path, threshold=9.0, top_k=2):
         else:
             warp = prev_warp if prev_warp is not None else cv2.resize(frame, (400, 400))
 
-        means = _compute_lab_means(warp, grid=8)
+        _compute_lab_means(warp, grid=8, out=means)
         if ema_means is None:
             ema_means = means.copy()
         else:
@@ -126,5 +123,5 @@ def gen_edges_frames(cap, base_board_path, threshold=9.0, top_k=2):
                 x2,y2 = (j+1)*cs_w,(i+1)*cs_h
                 cv2.rectangle(vis, (x1,y1),(x2,y2), (0,0,255), 2)
 
-        _, jpeg = cv2.imencode('.jpg', vis)
-        yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
+        jpeg = get_encoder().encode(vis, profile=EDGES_PROFILE)
+        yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
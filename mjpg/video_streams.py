@@ -4,6 +4,9 @@ import cv2
 import numpy as np
 import os, time
 
+from jpeg_encoder import StreamProfile, get_encoder
+from overlay import grid_layer, text_layer
+
 # v2 모듈에서 혼합 corner 검출/warp 재사용
 from warp_cam_picam2_stable_v2 import (
     find_chessboard_by_first_last_squares as find_corners,
@@ -16,22 +19,18 @@ GRID = 8
 WARP_SIZE = 400
 JPEG_QUALITY = 80
 
-def _jpeg_bytes_from_rgb(img_rgb):
+# 스트림별 프레임 크기 목표: 품질/축소는 jpeg_encoder 가 최근 크기/시간을 보고 맞춘다
+ORIGINAL_PROFILE = StreamProfile("original", target_kb=45, quality=JPEG_QUALITY, max_encode_ms=20)
+WARP_PROFILE = StreamProfile("warp", target_kb=30, quality=JPEG_QUALITY, max_encode_ms=10)
+
+def _jpeg_bytes_from_rgb(img_rgb, profile=None):
     bgr = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR)
-    ok, buf = cv2.imencode('.jpg', bgr, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
-    if not ok:
-        ok, buf = cv2.imencode('.jpg', bgr)
-    return buf.tobytes()
+    # 공용 인코더 풀에서 인코딩 (profile 이 없으면 JPEG_QUALITY 고정)
+    return get_encoder().encode(bgr, profile=profile, quality=JPEG_QUALITY)
 
 def _draw_grid(vis_rgb):
-    h, w = vis_rgb.shape[:2]
-    cs_h, cs_w = h // GRID, w // GRID
-    for j in range(1, GRID):
-        x = j * cs_w
-        cv2.line(vis_rgb, (x, 0), (x, h), (100, 100, 100), 1, cv2.LINE_AA)
-    for i in range(1, GRID):
-        y = i * cs_h
-        cv2.line(vis_rgb, (0, y), (w, y), (100, 100, 100), 1, cv2.LINE_AA)
+    # 와프 크기별로 한 번 그려 둔 격자 레이어를 마스크 복사
+    grid_layer(vis_rgb.shape, GRID, color=(100, 100, 100)).apply(vis_rgb)
 
 def gen_original_frames(cap):
     """원본 스트림"""
@@ -41,7 +40,7 @@ def gen_original_frames(cap):
             time.sleep(0.01)
             continue
         frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        yield _jpeg_bytes_from_rgb(frame_rgb), []
+        yield _jpeg_bytes_from_rgb(frame_rgb, ORIGINAL_PROFILE), []
 
 def gen_warped_frames(cap):
     """체스판 와핑 스트림"""
@@ -104,11 +103,10 @@ def gen_warped_frames(cap):
 
         _draw_grid(vis)
         h, w = vis.shape[:2]
-        cv2.putText(vis, status, (10, h - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2, cv2.LINE_AA)
+        text_layer(vis.shape, status, (10, h - 10), 0.6, (255, 255, 0), 2).apply(vis)
 
         yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + _jpeg_bytes_from_rgb(vis) + b'\r\n')
+               b'Content-Type: image/jpeg\r\n\r\n' + _jpeg_bytes_from_rgb(vis, WARP_PROFILE) + b'\r\n')
 
 def gen_edges_frames(cap):
     """디버그 스트림 (piece_recognition에서 가져옴)"""
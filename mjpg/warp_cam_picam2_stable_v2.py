@@ -4,6 +4,13 @@ import time, collections
 import numpy as np
 import cv2
 
+try:
+    from cv.frame_ring import RING_SIZE, FrameRing, flip_code, orient_into, oriented_shape, read_picam_bgr
+    from cv.overlay import cached_layer
+except ImportError:
+    from frame_ring import RING_SIZE, FrameRing, flip_code, orient_into, oriented_shape, read_picam_bgr
+    from overlay import cached_layer
+
 # ==== 기본 설정 ====
 Hmin, Hmax = 35, 85    # 초록 마커 HSV 범위
 Smin, Smax = 60, 255
@@ -188,6 +195,42 @@ def compute_warp_transform(corners, size=600):
     Minv = np.linalg.inv(M)
     return M, Minv
 
+# ---------------- Sparse Square Sampling ----------------
+SAMPLES_PER_SQUARE = 8   # 칸당 8x8 샘플 → 전체 64x64 모자이크
+
+def build_square_sample_maps(corners, warp_size=400, samples_per_square=SAMPLES_PER_SQUARE,
+                             margin_ratio=0.0, grid=8, fixed_point=True):
+    """
+    와핑 없이 칸 통계를 내기 위한 remap 테이블.
+    각 칸 안의 s x s 격자점(와프 좌표)을 Minv 로 원본 프레임 좌표로 되돌려 둔다.
+    반환: (map1, map2) — sample_board()에 그대로 넘긴다. 출력 모자이크는 (grid*s, grid*s).
+    코너가 고정(수동 코너)이면 fixed_point=True 로 한 번 만들어 재사용하고,
+    매 프레임 코너가 바뀌면 fixed_point=False 로 convertMaps 를 생략한다.
+    """
+    _, Minv = compute_warp_transform(corners, size=warp_size)
+    if Minv is None:
+        return None
+    s = int(samples_per_square)
+    cell = warp_size / float(grid)
+    inner = cell * (1.0 - 2.0 * margin_ratio)
+    offs = margin_ratio * cell + (np.arange(s) + 0.5) * (inner / s) - 0.5
+    coords = (np.arange(grid)[:, None] * cell + offs[None, :]).reshape(-1)
+    xs, ys = np.meshgrid(coords, coords)
+    pts = np.stack([xs, ys], axis=-1).reshape(-1, 1, 2).astype(np.float32)
+    src = cv2.perspectiveTransform(pts, Minv).reshape(grid * s, grid * s, 2)
+    map_x = np.ascontiguousarray(src[..., 0])
+    map_y = np.ascontiguousarray(src[..., 1])
+    if fixed_point:
+        return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+    return map_x, map_y
+
+def sample_board(frame, maps, dst=None):
+    """remap 한 번으로 칸별 샘플 모자이크 생성. board_stats.cell_means 로 바로 칸 평균을 얻는다."""
+    if maps is None:
+        return None
+    map1, map2 = maps
+    return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR, dst=dst, borderMode=cv2.BORDER_REPLICATE)
+
 def generate_playable_square_centers(size=600, grid_size=8, playable_parity=1):
     cell = size // grid_size
     centers = []  # list of (idx1to32, (cx, cy)) in warp space
@@ -210,19 +253,21 @@ def draw_numbers_on_image(image, labeled_points, font_scale=0.6, thickness=2, co
 def overlay_grid_and_numbers_on_warp(warp_image, size=600, playable_parity=1):
     if warp_image is None:
         return None, []
-    img = warp_image.copy()
     grid = 8
     cell = size // grid
-    # draw grid
-    for i in range(1, grid):
-        x = i * cell
-        y = i * cell
-        cv2.line(img, (x, 0), (x, size), (128, 128, 128), 1)
-        cv2.line(img, (0, y), (size, y), (128, 128, 128), 1)
-    # label playable squares
     centers = generate_playable_square_centers(size=size, grid_size=grid, playable_parity=playable_parity)
     labeled = [(idx, (cx, cy)) for idx, (cx, cy), r, c in centers]
-    img = draw_numbers_on_image(img, labeled, font_scale=0.7, thickness=2, color=(0,255,255))
+
+    def build(layer):
+        # 격자 + 놓을 수 있는 칸 번호 (크기/패리티별로 한 번만 그림)
+        for i in range(1, grid):
+            layer.line((i * cell, 0), (i * cell, size), (128, 128, 128), 1, cv2.LINE_8)
+            layer.line((0, i * cell), (size, i * cell), (128, 128, 128), 1, cv2.LINE_8)
+        for idx, (x, y) in labeled:
+            layer.text(str(idx), (int(x) - 10, int(y) + 10), 0.7, (0, 255, 255), 2)
+
+    img = warp_image.copy()
+    cached_layer(("playable_numbers", size, playable_parity), img.shape, build).apply(img)
     return img, labeled
 
 def warp_points_to_original(labeled_points_in_warp, Minv):
@@ -240,9 +285,18 @@ def warp_points_to_original(labeled_points_in_warp, Minv):
 
 # ---------------- Camera Wrapper ----------------
 class PiCam2Capture:
-    def __init__(self,size=(1280,720),fps=30,hflip=False,vflip=False):
+    """Picamera2 캡처 래퍼. read() 는 ring_size 개 버퍼를 돌려 쓴다.
+
+    RGB→BGR 변환은 요청 버퍼에서 링 버퍼로 바로 쓰고, 세로 프레임 회전과
+    좌우/상하 반전은 rotate/flip 한 번으로 합친다. 반환 프레임은 ring_size 번 뒤
+    read() 에서 덮어써진다.
+    """
+    def __init__(self,size=(1280,720),fps=30,hflip=False,vflip=False,ring_size=RING_SIZE):
         from picamera2 import Picamera2
         self.hflip=hflip; self.vflip=vflip
+        self._flip=flip_code(hflip,vflip)
+        self._ring=FrameRing(ring_size)
+        self._raw=None   # 세로 프레임 회전용 스크래치
         self.picam2=Picamera2()
         cfg=self.picam2.create_preview_configuration(
             main={"size":size,"format":"RGB888"},
@@ -252,13 +306,19 @@ class PiCam2Capture:
         self.picam2.start()
         time.sleep(0.7)
     def read(self):
-        rgb=self.picam2.capture_array()
-        bgr=cv2.cvtColor(rgb,cv2.COLOR_RGB2BGR)
-        if bgr.shape[0]>bgr.shape[1]:
-            bgr=cv2.rotate(bgr,cv2.ROTATE_90_CLOCKWISE)
-        if self.hflip: bgr=cv2.flip(bgr,1)
-        if self.vflip: bgr=cv2.flip(bgr,0)
-        return True,bgr
+        if self._raw is None:
+            # 첫 프레임으로 방향(세로면 90도 회전)을 정한다
+            self._raw=read_picam_bgr(self.picam2)
+            raw=self._raw
+        elif self._raw.shape[0]>self._raw.shape[1]:
+            raw=read_picam_bgr(self.picam2,self._raw)
+        else:
+            # 가로 프레임: 링 버퍼에 바로 변환하고 제자리 flip
+            buf=read_picam_bgr(self.picam2,self._ring.next(self._raw.shape))
+            return True,orient_into(buf,buf,0,self._flip)
+        rot=90 if raw.shape[0]>raw.shape[1] else 0
+        dst=self._ring.next(oriented_shape(raw.shape,rot))
+        return True,orient_into(raw,dst,rot,self._flip)
     def release(self):
         try: self.picam2.stop()
         except Exception: pass
@@ -277,32 +337,30 @@ def overlay_grid_and_dark_square_numbers(image, start_dark_top_left=True, draw_g
     size = min(h, w)
     cell = size // 8
 
-    if draw_grid:
-        for i in range(9):
-            x = i * cell
-            y = i * cell
-            cv2.line(img, (0, y), (cell*8, y), (200,200,200), 1)
-            cv2.line(img, (x, 0), (x, cell*8), (200,200,200), 1)
-
-    number = 1
-    for r in range(8):
-        for c in range(8):
-            dark = ((r + c) % 2 == 0) if start_dark_top_left else ((r + c) % 2 == 1)
-            if not dark:
-                continue
-            cx = c * cell + cell // 2
-            cy = r * cell + cell // 2
-            text = str(number)
-            (tw, th), bl = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
-            tx = int(cx - tw / 2)
-            ty = int(cy + th / 2)
-            # 외곽선 가독성 향상
-            cv2.putText(img, text, (tx, ty), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0,0,0), thickness+2, cv2.LINE_AA)
-            cv2.putText(img, text, (tx, ty), cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, thickness, cv2.LINE_AA)
-            number += 1
-            if number > 32:
-                break
-        if number > 32:
-            break
+    def build(layer):
+        # 격자/번호는 이미지 크기와 인자가 같으면 매번 같으므로 레이어로 한 번만 그린다
+        if draw_grid:
+            for i in range(9):
+                x = i * cell
+                y = i * cell
+                layer.line((0, y), (cell*8, y), (200,200,200), 1, cv2.LINE_8)
+                layer.line((x, 0), (x, cell*8), (200,200,200), 1, cv2.LINE_8)
 
-    return img
+        number = 1
+        for r in range(8):
+            for c in range(8):
+                dark = ((r + c) % 2 == 0) if start_dark_top_left else ((r + c) % 2 == 1)
+                if not dark:
+                    continue
+                cx = c * cell + cell // 2
+                cy = r * cell + cell // 2
+                text = str(number)
+                (tw, th), bl = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+                tx = int(cx - tw / 2)
+                ty = int(cy + th / 2)
+                # 외곽선 가독성 향상
+                layer.text(text, (tx, ty), font_scale, color, thickness, outline=(0,0,0))
+                number += 1
+
+    key = ("dark_square_numbers", start_dark_top_left, draw_grid, font_scale, thickness, tuple(color))
+    return cached_layer(key, img.shape, build).apply(img)
\ No newline at end of file